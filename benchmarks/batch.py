@@ -0,0 +1,83 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Frames-per-second throughput of the batch API against a per-frame loop.
+#
+#     $ python benchmarks/batch.py --beams 64 --frames 200
+
+import argparse
+import time
+from math import radians
+
+import numpy as np
+
+from depth_clustering import (
+    DepthGroundRemover,
+    compute_labels,
+    compute_labels_batch,
+    remove_ground_batch,
+)
+from scenes import SENSORS, create_scene, create_sensor_params
+
+
+def fps(func, num_frames):
+    start = time.perf_counter()
+    func()
+    return num_frames / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch API throughput")
+    parser.add_argument("--beams", type=int, default=64, choices=sorted(SENSORS))
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    params = create_sensor_params(args.beams)
+    depth_stack = np.stack(
+        [create_scene(params, seed=i) for i in range(args.frames)]
+    )
+    angle_threshold = radians(10.0)
+    remover = DepthGroundRemover(params, 5, radians(5.0))
+
+    # compile
+    compute_labels(depth_stack[0], params, angle_threshold)
+    compute_labels_batch(depth_stack[:2], params, angle_threshold)
+    remove_ground_batch(depth_stack[:2], params, 5, radians(5.0))
+
+    results = [
+        ("compute_labels loop", lambda: [
+            compute_labels(d, params, angle_threshold) for d in depth_stack]),
+        ("compute_labels_batch", lambda: compute_labels_batch(
+            depth_stack, params, angle_threshold)),
+        ("ground removal loop", lambda: [
+            remover.on_new_object_received(d) for d in depth_stack]),
+        ("remove_ground_batch", lambda: remove_ground_batch(
+            depth_stack, params, 5, radians(5.0))),
+    ]
+    print("{}x{}, {} frames".format(params.rows, params.cols, args.frames))
+    for name, func in results:
+        print("{:<24}{:>10.1f} fps".format(name, fps(func, args.frames)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Compare the ground removal engines of DepthGroundRemover on synthetic
+# scenes.
+#
+#     $ python benchmarks/ground.py --repeat 20
+
+import argparse
+import time
+from math import radians
+
+import numpy as np
+
+from depth_clustering import DepthGroundRemover
+from scenes import SENSORS, create_scene, create_sensor_params
+
+
+def best_of(func, repeat):
+    func()  # compile
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Original vs fused ground removal"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--window-size", type=int, default=5)
+    args = parser.parse_args()
+
+    print("{:<12}{:>12}{:>12}{:>10}".format("shape", "bfs", "fused", "speedup"))
+    for beams in sorted(SENSORS):
+        params = create_sensor_params(beams)
+        depth_image = create_scene(params, seed=0)
+
+        bfs = DepthGroundRemover(params, args.window_size, radians(5.0))
+        fused = DepthGroundRemover(
+            params, args.window_size, radians(5.0), engine="fused"
+        )
+        assert np.array_equal(
+            bfs.on_new_object_received(depth_image),
+            fused.on_new_object_received(depth_image),
+        )
+
+        t_bfs = best_of(
+            lambda: bfs.on_new_object_received(depth_image), args.repeat)
+        t_fused = best_of(
+            lambda: fused.on_new_object_received(depth_image), args.repeat)
+
+        print("{:<12}{:>10.2f}ms{:>10.2f}ms{:>9.1f}x".format(
+            "{}x{}".format(params.rows, params.cols),
+            t_bfs * 1e3, t_fused * 1e3, t_bfs / t_fused))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Compare the labeling engines of compute_labels on synthetic scenes.
+#
+#     $ python benchmarks/labelers.py --repeat 20
+
+import argparse
+import time
+from math import radians
+
+import numpy as np
+
+from depth_clustering import AngleDiff, LinearImageLabeler, compute_labels
+from depth_clustering.union_find_labeler import label_union_find
+from scenes import create_params, create_scene
+
+SHAPES = [(64, 870), (128, 2048)]
+
+
+def best_of(func, repeat):
+    func()  # compile
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="BFS vs union-find labeling engines"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--angle-threshold", type=float, default=10.0,
+                        help="in degrees")
+    args = parser.parse_args()
+    angle_threshold = radians(args.angle_threshold)
+
+    print("{:<12}{:>12}{:>12}{:>10}{:>14}{:>14}{:>10}".format(
+        "shape", "bfs", "union_find", "speedup",
+        "bfs (total)", "uf (total)", "speedup"))
+    for rows, cols in SHAPES:
+        params = create_params(rows, cols)
+        depth_image = create_scene(params, seed=0)
+
+        bfs = compute_labels(depth_image, params, angle_threshold)
+        union_find = compute_labels(
+            depth_image, params, angle_threshold, "union_find"
+        )
+        assert np.array_equal(bfs, union_find)
+
+        angle_diff = AngleDiff(depth_image, params)
+        labeler = LinearImageLabeler(rows, cols, angle_threshold, angle_diff)
+        beta_rows = angle_diff._beta_rows
+        beta_cols = angle_diff._beta_cols
+
+        t_bfs = best_of(
+            lambda: labeler.compute_labels(depth_image), args.repeat)
+        t_uf = best_of(
+            lambda: label_union_find(
+                depth_image, beta_rows, beta_cols, angle_threshold),
+            args.repeat)
+        t_bfs_total = best_of(
+            lambda: compute_labels(depth_image, params, angle_threshold),
+            args.repeat)
+        t_uf_total = best_of(
+            lambda: compute_labels(
+                depth_image, params, angle_threshold, "union_find"),
+            args.repeat)
+
+        print("{:<12}{:>10.2f}ms{:>10.2f}ms{:>9.1f}x{:>12.2f}ms{:>12.2f}ms{:>9.1f}x".format(
+            "{}x{}".format(rows, cols),
+            t_bfs * 1e3, t_uf * 1e3, t_bfs / t_uf,
+            t_bfs_total * 1e3, t_uf_total * 1e3, t_bfs_total / t_uf_total))
+
+
+if __name__ == "__main__":
+    main()
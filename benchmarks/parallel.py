@@ -0,0 +1,80 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Scaling of the parallel labeling engine with the number of Numba threads.
+#
+#     $ python benchmarks/parallel.py --beams 128
+
+import argparse
+import time
+from math import radians
+
+import numba
+import numpy as np
+
+from depth_clustering import compute_labels
+from scenes import SENSORS, create_scene, create_sensor_params
+
+
+def best_of(func, repeat):
+    func()  # compile
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scaling of compute_labels(engine='parallel')"
+    )
+    parser.add_argument("--beams", type=int, default=128, choices=sorted(SENSORS))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    params = create_sensor_params(args.beams)
+    depth_image = create_scene(params, seed=0)
+    angle_threshold = radians(10.0)
+
+    expected = compute_labels(depth_image, params, angle_threshold, "union_find")
+    t_serial = best_of(
+        lambda: compute_labels(depth_image, params, angle_threshold, "union_find"),
+        args.repeat)
+    print("{}x{}, union_find: {:.2f}ms".format(
+        params.rows, params.cols, t_serial * 1e3))
+
+    print("{:>8}{:>12}{:>10}".format("threads", "parallel", "speedup"))
+    for threads in range(1, numba.config.NUMBA_NUM_THREADS + 1):
+        numba.set_num_threads(threads)
+        labels = compute_labels(depth_image, params, angle_threshold, "parallel")
+        assert np.array_equal(labels, expected)
+        t = best_of(
+            lambda: compute_labels(depth_image, params, angle_threshold, "parallel"),
+            args.repeat)
+        print("{:>8}{:>10.2f}ms{:>9.1f}x".format(threads, t * 1e3, t_serial / t))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Synthetic range images with fixed seeds, shared by the benchmarks.
+
+from math import radians
+
+import numpy as np
+
+from depth_clustering import ProjectionParams, SpanParams
+
+# (rows, cols, lowest beam, highest beam) in degrees
+SENSORS = {
+    16: (16, 1024, -15.0, 15.0),
+    32: (32, 1024, -30.67, 10.67),
+    64: (64, 870, -24.0, 2.0),
+    128: (128, 2048, -25.0, 15.0),
+}
+
+
+def create_params(rows, cols, v_start=-24.0, v_end=2.0):
+    h_span_params = SpanParams(radians(-180), radians(180), num_beams=cols)
+    v_span_params = SpanParams(radians(v_start), radians(v_end), num_beams=rows)
+    return ProjectionParams(h_span_params, v_span_params)
+
+
+def create_sensor_params(beams):
+    rows, cols, v_start, v_end = SENSORS[beams]
+    return create_params(rows, cols, v_start, v_end)
+
+
+def create_scene(params, seed=0, num_objects=40, sensor_height=1.7,
+                 max_range=80.0, dropout=0.02, noise=0.01):
+    """
+    Render a flat ground plane with box-like obstacles into a range image.
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = params.rows, params.cols
+    elevations = np.asarray(params.row_angles, dtype=np.float64)
+    azimuths = np.asarray(params.col_angles, dtype=np.float64)
+
+    depth = np.full((rows, cols), np.inf)
+
+    # ground plane, hit by the beams pointing downwards
+    down = elevations < 0
+    ground = sensor_height / np.sin(-elevations[down])
+    depth[down, :] = ground[:, None]
+
+    # vertical boxes: azimuth interval, horizontal distance and height
+    for _ in range(num_objects):
+        center = rng.uniform(-np.pi, np.pi)
+        distance = rng.uniform(3.0, 40.0)
+        width = rng.uniform(0.5, 4.0)
+        height = rng.uniform(0.5, 3.0)
+
+        half = np.arctan2(width / 2, distance)
+        diff = np.angle(np.exp(1j * (azimuths - center)))
+        hit_cols = np.abs(diff) < half
+
+        y = distance * np.tan(elevations)
+        hit_rows = (y > -sensor_height) & (y < height - sensor_height)
+
+        box = distance / np.cos(elevations)
+        candidate = np.where(hit_rows[:, None] & hit_cols[None, :],
+                             box[:, None], np.inf)
+        depth = np.minimum(depth, candidate)
+
+    depth += rng.normal(0.0, noise, depth.shape)
+    depth[(depth > max_range) | (rng.random(depth.shape) < dropout)] = 0.0
+    return depth.astype(np.float32)
@@ -0,0 +1,122 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Measure the start-up latency of the pipeline, i.e. the time from
+# ``import depth_clustering`` to the first label image.
+#
+# Each measurement runs in a fresh interpreter. The "cold" run uses an empty
+# Numba cache directory, the "warm" runs reuse the cache written by it.
+#
+#     $ python benchmarks/startup.py --runs 3
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import json
+import time
+
+t0 = time.perf_counter()
+from math import radians
+
+import numpy as np
+
+from depth_clustering import (
+    DepthGroundRemover,
+    ProjectionParams,
+    SpanParams,
+    compute_labels,
+)
+t1 = time.perf_counter()
+
+h_span_params = SpanParams(radians(-180), radians(180), num_beams={cols})
+v_span_params = SpanParams(radians(-24), radians(2), num_beams={rows})
+params = ProjectionParams(h_span_params, v_span_params)
+t2 = time.perf_counter()
+
+rng = np.random.default_rng(0)
+depth_image = rng.uniform(1.0, 50.0, ({rows}, {cols})).astype(np.float32)
+remover = DepthGroundRemover(params, window_size=5, ground_remove_angle=radians(5))
+no_ground_image = remover.on_new_object_received(depth_image)
+t3 = time.perf_counter()
+
+compute_labels(no_ground_image, params, radians(10.0))
+t4 = time.perf_counter()
+
+print(json.dumps({{
+    "import": t1 - t0,
+    "params": t2 - t1,
+    "ground_removal": t3 - t2,
+    "labels": t4 - t3,
+    "total": t4 - t0,
+}}))
+"""
+
+
+def run_child(rows, cols, cache_dir):
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(rows=rows, cols=cols)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cold and warm import-to-first-label times"
+    )
+    parser.add_argument("--rows", type=int, default=64)
+    parser.add_argument("--cols", type=int, default=870)
+    parser.add_argument("--runs", type=int, default=3,
+                        help="number of warm runs")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = run_child(args.rows, args.cols, cache_dir)
+        warm = [run_child(args.rows, args.cols, cache_dir)
+                for _ in range(args.runs)]
+
+    if args.json:
+        print(json.dumps({"cold": cold, "warm": warm}, indent=2))
+        return
+
+    keys = ["import", "params", "ground_removal", "labels", "total"]
+    print("{:<8}".format("run") + "".join("{:>16}".format(k) for k in keys))
+    rows = [("cold", cold)] + [("warm", w) for w in warm]
+    for name, result in rows:
+        print("{:<8}".format(name) +
+              "".join("{:>15.3f}s".format(result[k]) for k in keys))
+
+
+if __name__ == "__main__":
+    main()
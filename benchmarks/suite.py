@@ -0,0 +1,218 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# Time every stage of the pipeline on the synthetic scenes of all sensor
+# configurations, optionally comparing with the results of a previous run.
+#
+#     $ python benchmarks/suite.py --output before.json
+#     ... change the code ...
+#     $ python benchmarks/suite.py --baseline before.json --threshold 0.2
+#
+# The second run exits with status 1 if a stage became more than 20% slower.
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from math import radians
+
+import numba
+import numpy as np
+
+from depth_clustering import (
+    AngleDiff,
+    DepthGroundRemover,
+    calculate_segmented_point_clouds,
+    compute_labels,
+    convert_spherical_to_cartesian,
+    filter_clusters,
+)
+from depth_clustering.depth_ground_remover import (
+    compute_angle_image,
+    repair_depth,
+    repair_depth_linear,
+)
+from scenes import SENSORS, create_scene, create_sensor_params
+
+ANGLE_THRESHOLD = radians(10.0)
+GROUND_REMOVE_ANGLE = radians(5.0)
+WINDOW_SIZE = 5
+
+WARMUP = """
+import sys
+import time
+
+sys.path.insert(0, {path!r})
+start = time.perf_counter()
+from depth_clustering import warmup
+from scenes import create_sensor_params
+
+warmup(create_sensor_params({beams}))
+print(time.perf_counter() - start)
+"""
+
+
+def best_of(func, repeat):
+    func()  # compile
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def get_stages(params, depth_image):
+    """
+    (name, function) of every stage, each function taking the output of
+    the stages before it from the same scene.
+    """
+    remover = DepthGroundRemover(params, WINDOW_SIZE, GROUND_REMOVE_ANGLE)
+    repaired = repair_depth_linear(depth_image, 5, 1.0)
+    angle_image = remover.create_angle_image(repaired)
+    smoothed = remover.apply_savitsky_golay_smoothing(angle_image, WINDOW_SIZE)
+    no_ground_image = remover.on_new_object_received(depth_image)
+    label_image = compute_labels(no_ground_image, params, ANGLE_THRESHOLD, "union_find")
+    pc_image = convert_spherical_to_cartesian(no_ground_image, params)
+    fused = DepthGroundRemover(params, WINDOW_SIZE, GROUND_REMOVE_ANGLE, "fused")
+
+    return [
+        ("ground.repair_linear", lambda: repair_depth_linear(depth_image, 5, 1.0)),
+        ("ground.repair_legacy", lambda: repair_depth(depth_image, 5, 1.0)),
+        ("ground.angle_image", lambda: compute_angle_image(
+            repaired, params.row_angles_sines, params.row_angles_cosines)),
+        ("ground.smoothing", lambda: remover.apply_savitsky_golay_smoothing(
+            angle_image, WINDOW_SIZE)),
+        ("ground.zero_out", lambda: remover.zero_out_ground_bfs(
+            repaired, smoothed, GROUND_REMOVE_ANGLE, WINDOW_SIZE)),
+        ("ground.total_bfs", lambda: remover.on_new_object_received(depth_image)),
+        ("ground.total_fused", lambda: fused.on_new_object_received(depth_image)),
+        ("angle_diff", lambda: AngleDiff(no_ground_image, params)),
+        ("labels.bfs", lambda: compute_labels(no_ground_image, params, ANGLE_THRESHOLD)),
+        ("labels.union_find", lambda: compute_labels(
+            no_ground_image, params, ANGLE_THRESHOLD, "union_find")),
+        ("labels.parallel", lambda: compute_labels(
+            no_ground_image, params, ANGLE_THRESHOLD, "parallel")),
+        ("filter_clusters", lambda: filter_clusters(label_image)),
+        ("convert_spherical_to_cartesian", lambda: convert_spherical_to_cartesian(
+            no_ground_image, params)),
+        ("segmented_point_clouds", lambda: calculate_segmented_point_clouds(
+            label_image, pc_image)),
+    ]
+
+
+def time_warmup(beams):
+    """
+    Seconds from the import to the end of ``warmup()`` in a fresh
+    interpreter, using the on-disk cache as it is.
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", WARMUP.format(path=sys.path[0], beams=beams)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, threshold, min_difference):
+    """
+    Return the (beams, stage, baseline, time) of the stages more than
+    ``threshold`` and ``min_difference`` seconds slower than in
+    ``baseline``. The latter keeps the timer noise of the fastest stages
+    from being reported.
+    """
+    regressions = []
+    for beams, stages in results.items():
+        for stage, seconds in stages.items():
+            before = baseline.get(beams, {}).get(stage)
+            if before is None or seconds - before <= min_difference:
+                continue
+            if seconds > before * (1 + threshold):
+                regressions.append((beams, stage, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time every stage of the pipeline for all sensors"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--beams", type=int, nargs="+", default=sorted(SENSORS),
+                        choices=sorted(SENSORS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="skip timing warmup() in a fresh interpreter")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown against the baseline, 0.2 = 20%%")
+    parser.add_argument("--min-difference", type=float, default=0.1,
+                        help="slowdowns below this many ms are ignored")
+    args = parser.parse_args()
+
+    results = {}
+    for beams in args.beams:
+        params = create_sensor_params(beams)
+        depth_image = create_scene(params, seed=args.seed)
+        stages = {}
+        for name, func in get_stages(params, depth_image):
+            stages[name] = best_of(func, args.repeat)
+        if not args.no_warmup:
+            stages["warmup"] = time_warmup(beams)
+        results[str(beams)] = stages
+
+        print("{} beams ({}x{})".format(beams, params.rows, params.cols))
+        for name, seconds in stages.items():
+            print("  {:<34}{:>10.3f} ms".format(name, seconds * 1e3))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "numba": numba.__version__,
+                "threads": numba.get_num_threads(),
+                "repeat": args.repeat,
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(
+            results, baseline, args.threshold, args.min_difference * 1e-3
+        )
+        for beams, stage, before, seconds in regressions:
+            print("slower: {} beams {}: {:.3f} ms -> {:.3f} ms".format(
+                beams, stage, before * 1e3, seconds * 1e3))
+        if regressions:
+            sys.exit(1)
+        print("no stage is more than {:.0%} slower".format(args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,13 +24,41 @@ DEALINGS IN THE SOFTWARE.
 # flake8: noqa F401
 
 from .angle_diff import AngleDiff
+from .cluster_features import ClusterFeatures
 from .clusterer import (
+    SegmentedPointCloud,
     calculate_segmented_point_clouds,
     compute_labels,
+    compute_labels_batch,
+    compute_labels_jit,
     compute_labels_with_filtering,
     filter_clusters,
+    get_label_dtype,
+    segment_points,
+)
+from .frame_ring import FrameRing
+from .instrumentation import Stats
+from .label_codec import (
+    LabelArchive,
+    LabelArchiveWriter,
+    decode_labels,
+    encode_labels,
 )
 from .linear_image_labeler import LinearImageLabeler, PixelCoord
-from .projections import ProjectionParams, SpanParams
-from .utils import convert_spherical_to_cartesian
-from .depth_ground_remover import DepthGroundRemover
+from .multi_sensor import MultiSensorExecutor
+from .pipeline import ClusteringPipeline
+from .projections import (
+    ProjectionParams,
+    SpanParams,
+    create_projection_params_from_row_angles,
+)
+from .utils import (
+    convert_spherical_to_cartesian,
+    convert_spherical_to_cartesian_into,
+    project_point_cloud,
+)
+from .depth_ground_remover import DepthGroundRemover, remove_ground_batch
+from .recording import Recording, RecordingWriter, convert_png_folder
+from .roi import RegionOfInterest
+from .tracker import ClusterTracker
+from .warmup import warmup
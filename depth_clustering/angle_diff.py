@@ -24,10 +24,77 @@ DEALINGS IN THE SOFTWARE.
 from math import degrees
 
 import numpy as np
-from numba import deferred_type, float32
+from numba import deferred_type, float32, njit
 from numba.experimental import jitclass
 
-from .projections import ProjectionParamsType
+from .projections import (
+    ProjectionParamsType,
+    fill_col_alphas,
+    fill_row_alphas,
+)
+
+
+@njit(cache=True, fastmath=False)
+def compute_beta(alpha, current_depth, neighbor_depth):
+    d1 = max(current_depth, neighbor_depth)
+    d2 = min(current_depth, neighbor_depth)
+    beta = np.arctan2(d2 * np.sin(alpha), d1 - d2 * np.cos(alpha))
+    return abs(beta)
+
+
+@njit(nogil=True, cache=True, fastmath=False)
+def compute_beta_from_trig(sin_alpha, cos_alpha, current_depth, neighbor_depth):
+    # compute_beta with precomputed float32 sine and cosine: the same
+    # float32 operations, so the beta angles stay the same.  fastmath is
+    # pinned off because numba otherwise inherits it from fastmath callers
+    # (compute_labels_jit), and the cached, contracted build would then
+    # round differently depending on which caller compiled it first.
+    d1 = max(current_depth, neighbor_depth)
+    d2 = min(current_depth, neighbor_depth)
+    beta = np.arctan2(d2 * sin_alpha, d1 - d2 * cos_alpha)
+    return abs(beta)
+
+
+@njit(nogil=True, cache=True, fastmath=False)
+def compute_beta_angles(
+    depth_image,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    beta_rows,
+    beta_cols,
+):
+    """
+    Fill ``beta_rows`` / ``beta_cols`` with the beta angles between every
+    pixel and its lower / right neighbor, overwriting the whole buffers.
+    """
+    rows, cols = depth_image.shape
+    for r in range(rows):
+        for c in range(cols):
+            curr = depth_image[r, c]
+            if curr < 0.001:
+                beta_rows[r, c] = 0.0
+                beta_cols[r, c] = 0.0
+                continue
+
+            next_c = c + 1 if c + 1 < cols else 0
+            beta_cols[r, c] = compute_beta_from_trig(
+                col_alphas_sines[c],
+                col_alphas_cosines[c],
+                curr,
+                depth_image[r, next_c],
+            )
+
+            if r + 1 < rows:
+                beta_rows[r, c] = compute_beta_from_trig(
+                    row_alphas_sines[r],
+                    row_alphas_cosines[r],
+                    curr,
+                    depth_image[r + 1, c],
+                )
+            else:
+                beta_rows[r, c] = 0.0
 
 
 @jitclass(
@@ -47,63 +114,39 @@ class AngleDiff:
         self.params = params
 
         # --- PreComputeAlphaVecs()
-        self._row_alphas = np.empty(params.rows, dtype=float32)
-        for r in range(params.rows - 1):
-            self._row_alphas[r] = np.fabs(
-                params.angle_from_row(r + 1) - params.angle_from_row(r)
-            )
-        self._row_alphas[-1] = 0.0
-
-        self._col_alphas = np.empty(params.cols, dtype=float32)
-        for c in range(params.cols - 1):
-            self._col_alphas[c] = np.fabs(
-                params.angle_from_col(c + 1) - params.angle_from_col(c)
-            )
-        last_alpha = np.fabs(
-            (params.angle_from_col(0) - params.angle_from_col(params.cols - 1))
-        )
-        last_alpha -= params.h_span
-        self._col_alphas[-1] = last_alpha
+        self._row_alphas = fill_row_alphas(params.row_angles)
+        self._col_alphas = fill_col_alphas(params.col_angles, params.h_span)
 
         # --- PreComputeBetaAngles()
-        _beta_rows = np.zeros((params.rows, params.cols), dtype=np.float32)
-        _beta_cols = np.zeros((params.rows, params.cols), dtype=np.float32)
+        self._beta_rows = np.empty((params.rows, params.cols), dtype=float32)
+        self._beta_cols = np.empty((params.rows, params.cols), dtype=float32)
+        self.update(depth_image)
 
-        for r in range(params.rows):
-            angle_rows = self._row_alphas[r]
-            for c in range(params.cols):
-                if depth_image[r][c] < 0.001:
-                    continue
-                angle_cols = self._col_alphas[c]
-                curr = depth_image[r][c]
-
-                next_c = (c + 1) % params.cols
-                _beta_cols[r][c] = self.get_beta(
-                    angle_cols, curr, depth_image[r][next_c]
-                )
-
-                next_r = r + 1
-                if next_r >= params.rows:
-                    continue
-                _beta_rows[r][c] = self.get_beta(
-                    angle_rows, curr, depth_image[next_r][c]
-                )
-
-        self._beta_rows = _beta_rows
-        self._beta_cols = _beta_cols
+    def update(self, depth_image):
+        """
+        Recompute the beta angles for a new frame of the same sensor,
+        reusing the buffers of the previous one.
+        """
+        self.depth_image = depth_image
+        compute_beta_angles(
+            depth_image,
+            self.params.row_alphas_sines,
+            self.params.row_alphas_cosines,
+            self.params.col_alphas_sines,
+            self.params.col_alphas_cosines,
+            self._beta_rows,
+            self._beta_cols,
+        )
 
     @staticmethod
     def get_beta(alpha, current_depth, neighbor_depth):
-        d1 = max(current_depth, neighbor_depth)
-        d2 = min(current_depth, neighbor_depth)
-        beta = np.arctan2(d2 * np.sin(alpha), d1 - d2 * np.cos(alpha))
-        return abs(beta)
+        return compute_beta(alpha, current_depth, neighbor_depth)
 
     def compute_alpha(self, current, neighbor):
         if current.col == 0 and neighbor.col == self.params.cols - 1:
-            return self._cols_alphas[-1]
+            return self._col_alphas[-1]
         if neighbor.col == 0 and current.col == self.params.cols - 1:
-            return self._cols_alphas[-1]
+            return self._col_alphas[-1]
 
         if current.row < neighbor.row:
             return self._row_alphas[current.row]
@@ -0,0 +1,214 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(nogil=True, cache=True)
+def compute_cluster_features(label_mat, pc_image, oriented):
+    """
+    Per label statistics of the points of ``pc_image``, skipping label 0,
+    in one pass over the label image. See ``ClusterFeatures`` for the
+    returned arrays. The oriented boxes take a second pass and are only
+    computed when ``oriented`` is true, otherwise they are empty.
+    """
+    rows, cols = label_mat.shape
+    max_label = 0
+    for r in range(rows):
+        for c in range(cols):
+            if label_mat[r, c] > max_label:
+                max_label = label_mat[r, c]
+
+    index = np.full(np.int64(max_label) + 1, -1, dtype=np.int64)
+    for r in range(rows):
+        for c in range(cols):
+            index[label_mat[r, c]] = 0
+    num_labels = 0
+    for label in range(1, max_label + 1):
+        if index[label] == 0:
+            index[label] = num_labels
+            num_labels += 1
+    labels = np.empty(num_labels, dtype=label_mat.dtype)
+    for label in range(1, max_label + 1):
+        if index[label] >= 0:
+            labels[index[label]] = label
+
+    counts = np.zeros(num_labels, dtype=np.int64)
+    sums = np.zeros((num_labels, 3))
+    sums_of_squares = np.zeros((num_labels, 3))
+    sums_xz = np.zeros(num_labels)
+    mins = np.full((num_labels, 3), np.inf)
+    maxs = np.full((num_labels, 3), -np.inf)
+    min_depths = np.full(num_labels, np.inf)
+    max_depths = np.zeros(num_labels)
+    for r in range(rows):
+        for c in range(cols):
+            label = label_mat[r, c]
+            if label == 0:
+                continue
+            i = index[label]
+            counts[i] += 1
+            depth = 0.0
+            for d in range(3):
+                value = np.float64(pc_image[r, c, d])
+                sums[i, d] += value
+                sums_of_squares[i, d] += value * value
+                if value < mins[i, d]:
+                    mins[i, d] = value
+                if value > maxs[i, d]:
+                    maxs[i, d] = value
+                depth += value * value
+            sums_xz[i] += np.float64(pc_image[r, c, 0]) * pc_image[r, c, 2]
+            depth = np.sqrt(depth)
+            if depth < min_depths[i]:
+                min_depths[i] = depth
+            if depth > max_depths[i]:
+                max_depths[i] = depth
+
+    num_boxes = num_labels if oriented else 0
+    box_centers = np.zeros((num_boxes, 2))
+    box_sizes = np.zeros((num_boxes, 2))
+    box_angles = np.zeros(num_boxes)
+    if oriented:
+        # the major axis of the x-z covariance, then the bounds of the
+        # points along it and across it
+        axes = np.zeros((num_labels, 2))
+        bounds = np.zeros((num_labels, 4))
+        for i in range(num_labels):
+            n = counts[i]
+            mean_x = sums[i, 0] / n
+            mean_z = sums[i, 2] / n
+            var_x = sums_of_squares[i, 0] / n - mean_x * mean_x
+            var_z = sums_of_squares[i, 2] / n - mean_z * mean_z
+            cov_xz = sums_xz[i] / n - mean_x * mean_z
+            angle = 0.5 * np.arctan2(2.0 * cov_xz, var_x - var_z)
+            box_angles[i] = angle
+            axes[i, 0] = np.cos(angle)
+            axes[i, 1] = np.sin(angle)
+            bounds[i, 0] = np.inf
+            bounds[i, 1] = -np.inf
+            bounds[i, 2] = np.inf
+            bounds[i, 3] = -np.inf
+        for r in range(rows):
+            for c in range(cols):
+                label = label_mat[r, c]
+                if label == 0:
+                    continue
+                i = index[label]
+                x = np.float64(pc_image[r, c, 0])
+                z = np.float64(pc_image[r, c, 2])
+                along = x * axes[i, 0] + z * axes[i, 1]
+                across = z * axes[i, 0] - x * axes[i, 1]
+                bounds[i, 0] = min(bounds[i, 0], along)
+                bounds[i, 1] = max(bounds[i, 1], along)
+                bounds[i, 2] = min(bounds[i, 2], across)
+                bounds[i, 3] = max(bounds[i, 3], across)
+        for i in range(num_labels):
+            along = 0.5 * (bounds[i, 0] + bounds[i, 1])
+            across = 0.5 * (bounds[i, 2] + bounds[i, 3])
+            box_centers[i, 0] = along * axes[i, 0] - across * axes[i, 1]
+            box_centers[i, 1] = along * axes[i, 1] + across * axes[i, 0]
+            box_sizes[i, 0] = bounds[i, 1] - bounds[i, 0]
+            box_sizes[i, 1] = bounds[i, 3] - bounds[i, 2]
+
+    return (
+        labels,
+        counts,
+        sums,
+        sums_of_squares,
+        sums_xz,
+        mins,
+        maxs,
+        min_depths,
+        max_depths,
+        box_centers,
+        box_sizes,
+        box_angles,
+    )
+
+
+class ClusterFeatures:
+    """
+    Per cluster statistics as a struct of arrays, row ``i`` describing the
+    cluster ``labels[i]``, labels in increasing order.
+
+    counts: number of points
+    sums, sums_of_squares: sum of x, y, z and of their squares
+    sums_xz: sum of x * z
+    mins, maxs: axis aligned bounding box
+    min_depths, max_depths: range of the distance to the sensor
+    box_centers, box_sizes, box_angles: with ``oriented=True``, the
+        bounding box on the ground (x-z) plane aligned with the major axis
+        of the covariance: center (x, z), length along and across the
+        major axis, and angle of the major axis from x towards z. Empty
+        otherwise.
+    """
+
+    def __init__(
+        self,
+        labels,
+        counts,
+        sums,
+        sums_of_squares,
+        sums_xz,
+        mins,
+        maxs,
+        min_depths,
+        max_depths,
+        box_centers,
+        box_sizes,
+        box_angles,
+    ):
+        self.labels = labels
+        self.counts = counts
+        self.sums = sums
+        self.sums_of_squares = sums_of_squares
+        self.sums_xz = sums_xz
+        self.mins = mins
+        self.maxs = maxs
+        self.min_depths = min_depths
+        self.max_depths = max_depths
+        self.box_centers = box_centers
+        self.box_sizes = box_sizes
+        self.box_angles = box_angles
+
+    @classmethod
+    def from_label_image(cls, label_mat, pc_image, oriented=False):
+        return cls(*compute_cluster_features(label_mat, pc_image, oriented))
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def centroids(self):
+        return self.sums / self.counts[:, None]
+
+    @property
+    def extents(self):
+        return self.maxs - self.mins
+
+    @property
+    def variances(self):
+        centroids = self.centroids
+        return self.sums_of_squares / self.counts[:, None] - centroids**2
@@ -0,0 +1,83 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from numba import njit
+
+# extent limit meaning "no limit"
+NO_LIMIT = 1 << 30
+
+
+@njit(cache=True)
+def add_to_cluster_stats(counts, bounds, i, r, c, cols):
+    """
+    Add pixel ``(r, c)`` to cluster ``i``. ``bounds[i]`` holds the first /
+    last row, column and column shifted by half a turn, the latter gives
+    the width of clusters crossing the last column.
+    """
+    shifted_c = (c + cols // 2) % cols
+    if counts[i] == 0:
+        bounds[i, 0] = r
+        bounds[i, 1] = r
+        bounds[i, 2] = c
+        bounds[i, 3] = c
+        bounds[i, 4] = shifted_c
+        bounds[i, 5] = shifted_c
+    else:
+        bounds[i, 0] = min(bounds[i, 0], r)
+        bounds[i, 1] = max(bounds[i, 1], r)
+        bounds[i, 2] = min(bounds[i, 2], c)
+        bounds[i, 3] = max(bounds[i, 3], c)
+        bounds[i, 4] = min(bounds[i, 4], shifted_c)
+        bounds[i, 5] = max(bounds[i, 5], shifted_c)
+    counts[i] += 1
+
+
+@njit(cache=True)
+def keep_cluster(counts, bounds, i, limits):
+    """
+    limits: (min_size, max_size, min_rows, max_rows, min_cols, max_cols),
+        the number of pixels and the extent of the bounding box in rows
+        and columns
+    """
+    min_size, max_size, min_rows, max_rows, min_cols, max_cols = limits
+    if counts[i] < min_size or counts[i] > max_size:
+        return False
+    height = bounds[i, 1] - bounds[i, 0] + 1
+    width = min(
+        bounds[i, 3] - bounds[i, 2] + 1,
+        bounds[i, 5] - bounds[i, 4] + 1,
+    )
+    return min_rows <= height <= max_rows and min_cols <= width <= max_cols
+
+
+@njit(cache=True)
+def renumber_densely(new_labels):
+    """
+    Replace the non-zero entries of the label table ``new_labels`` with
+    1, 2, ... in order.
+    """
+    label = 0
+    for i in range(len(new_labels)):
+        if new_labels[i] > 0:
+            label += 1
+            new_labels[i] = label
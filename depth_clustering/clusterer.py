@@ -22,69 +22,418 @@ DEALINGS IN THE SOFTWARE.
 """
 
 from collections import defaultdict
+from collections.abc import Mapping
 
 import numpy as np
-from numba import int64, njit
-from numba.typed import dictobject
+from numba import get_num_threads, njit
 
 from .angle_diff import AngleDiff
-from .linear_image_labeler import LinearImageLabeler
+from .cluster_filter import (
+    NO_LIMIT,
+    add_to_cluster_stats,
+    keep_cluster,
+    renumber_densely,
+)
+from .linear_image_labeler import (
+    InstrumentedLinearImageLabeler,
+    LinearImageLabeler,
+)
+from .union_find_labeler import (
+    label_frame_into,
+    label_union_find,
+    label_union_find_batch,
+    label_union_find_filtered,
+    label_union_find_parallel,
+)
+
+
+def get_label_dtype(rows, cols):
+    """
+    Smallest label type which cannot overflow for an image of the given
+    size: there are at most ``rows * cols`` components.
+    """
+    if rows * cols <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def compute_labels(
+    input_image,
+    params,
+    angle_threshold,
+    engine="bfs",
+    label_dtype=None,
+    roi=None,
+    stats=None,
+):
+    """
+    engine:
+        "bfs": flood fill each component with ``LinearImageLabeler``.
+            Only with ``stats``; otherwise the same labels are computed
+            with the union-find kernel, which is cached on disk
+        "union_find": raster-scan union-find over the beta angles, faster
+            and producing the same labels
+        "parallel": union-find over vertical strips labeled on all Numba
+            threads, producing the same labels
+    label_dtype: type of the label image, by default ``get_label_dtype()``,
+        i.e. ``np.uint16`` unless the image has more than 65535 pixels
+    roi: optional ``RegionOfInterest``. Only its pixels are labeled, with
+        union-find whatever the engine, computing the beta angles of the
+        region only; the other pixels are 0. The components are numbered
+        in the raster order of the region.
+    stats: optional ``Stats`` receiving the time of the "labels.*" stages
+        and the number of labeled pixels, of components and, with "bfs",
+        the largest size of the queue of the flood fill
+    """
+    if label_dtype is None:
+        label_dtype = get_label_dtype(params.rows, params.cols)
+    if stats is not None:
+        return compute_labels_instrumented(
+            input_image, params, angle_threshold, engine, label_dtype, roi, stats
+        )
+    if engine == "parallel" and roi is None:
+        return label_union_find_parallel(
+            input_image,
+            params.row_alphas_sines,
+            params.row_alphas_cosines,
+            params.col_alphas_sines,
+            params.col_alphas_cosines,
+            angle_threshold,
+            get_num_threads(),
+            label_dtype,
+        )
+    # "bfs" and "union_find" give the same labels; both run the cached
+    # union-find kernel here, the jitclass labelers are only compiled for
+    # ``stats``.
+    if roi is None:
+        return label_frame(
+            input_image,
+            params.row_alphas_sines,
+            params.row_alphas_cosines,
+            params.col_alphas_sines,
+            params.col_alphas_cosines,
+            angle_threshold,
+            label_dtype,
+            True,
+        )
+    label_window = label_frame(
+        roi.extract(input_image),
+        roi.crop_rows(params.row_alphas_sines),
+        roi.crop_rows(params.row_alphas_cosines),
+        roi.crop_cols(params.col_alphas_sines),
+        roi.crop_cols(params.col_alphas_cosines),
+        angle_threshold,
+        label_dtype,
+        roi.wrap,
+    )
+    return roi.insert(label_window)
+
+
+def label_frame(
+    depth_image,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    angle_threshold,
+    label_dtype,
+    wrap,
+):
+    rows, cols = depth_image.shape
+    label_image = np.empty((rows, cols), dtype=label_dtype)
+    label_frame_into(
+        depth_image,
+        row_alphas_sines,
+        row_alphas_cosines,
+        col_alphas_sines,
+        col_alphas_cosines,
+        angle_threshold,
+        np.empty(rows * cols, dtype=np.int64),
+        np.empty(rows * cols, dtype=np.int64),
+        label_image,
+        wrap,
+    )
+    return label_image
+
+
+def compute_labels_instrumented(
+    input_image, params, angle_threshold, engine, label_dtype, roi, stats
+):
+    if roi is not None or engine == "parallel":
+        name = "labels.roi" if roi is not None else "labels.parallel"
+        with stats.stage(name):
+            label_image = compute_labels(
+                input_image, params, angle_threshold, engine, label_dtype, roi
+            )
+    else:
+        with stats.stage("labels.betas"):
+            angle_diff = AngleDiff(input_image, params)
+        if engine == "union_find":
+            with stats.stage("labels.union_find"):
+                label_image = label_union_find(
+                    input_image,
+                    angle_diff._beta_rows,
+                    angle_diff._beta_cols,
+                    angle_threshold,
+                    label_dtype,
+                )
+        else:
+            with stats.stage("labels.bfs"):
+                labeler = InstrumentedLinearImageLabeler(
+                    params.rows, params.cols, angle_threshold, angle_diff
+                )
+                label_image = labeler.compute_labels(input_image, label_dtype)
+            stats.high_water("labels.queue_max", labeler.max_queue_size)
+    stats.count("labels.pixels", np.count_nonzero(label_image))
+    stats.count("labels.components", label_image.max(initial=0))
+    stats.finish()
+    return label_image
 
 
 @njit(fastmath=True)
-def compute_labels(input_image, params, angle_threshold):
+def compute_labels_jit(
+    input_image, params, angle_threshold, engine="bfs", label_dtype=np.uint16
+):
+    """
+    ``compute_labels`` callable from other njit functions, as
+    ``compute_labels`` itself was before it became a Python function.
+    Without ``roi`` and ``stats``, and ``label_dtype`` is not chosen from
+    the image size: pass ``get_label_dtype(rows, cols)`` for images of
+    more than 65535 pixels.
+    """
+    if engine == "parallel":
+        return label_union_find_parallel(
+            input_image,
+            params.row_alphas_sines,
+            params.row_alphas_cosines,
+            params.col_alphas_sines,
+            params.col_alphas_cosines,
+            angle_threshold,
+            get_num_threads(),
+            label_dtype,
+        )
     angle_diff = AngleDiff(input_image, params)
+    if engine == "union_find":
+        return label_union_find(
+            input_image,
+            angle_diff._beta_rows,
+            angle_diff._beta_cols,
+            angle_threshold,
+            label_dtype,
+        )
     labeler = LinearImageLabeler(
         params.rows, params.cols, angle_threshold, angle_diff
     )
-    l_mat = labeler.compute_labels(input_image)
+    l_mat = labeler.compute_labels(input_image, label_dtype)
     return l_mat
 
 
-@njit(fastmath=True)
-def filter_clusters(label_mat, min_cluster_size=10, max_cluster_size=3000):
-    result = np.copy(label_mat)
-
-    labels_counter = dictobject.new_dict(int64, int64)
-    for r in range(result.shape[0]):
-        for c in range(result.shape[1]):
-            label = result[r][c]
-            v = labels_counter.get(label, 0)
-            labels_counter[label] = v + 1
-
-    labels_to_erase = set()
-    for label, count in labels_counter.items():
-        if count < min_cluster_size or count > max_cluster_size:
-            labels_to_erase.add(label)
-
-    for r in range(result.shape[0]):
-        for c in range(result.shape[1]):
-            if result[r][c] in labels_to_erase:
-                result[r][c] = 0
-    return result
+def compute_labels_batch(depth_stack, params, angle_threshold, label_dtype=None):
+    """
+    Label a ``(N, rows, cols)`` float32 stack of depth images, processing
+    the frames in parallel on all Numba threads. Returns a
+    ``(N, rows, cols)`` label array, each frame being the same as
+    ``compute_labels`` would return for it.
+    """
+    if label_dtype is None:
+        label_dtype = get_label_dtype(params.rows, params.cols)
+    return label_union_find_batch(
+        depth_stack,
+        params.row_alphas_sines,
+        params.row_alphas_cosines,
+        params.col_alphas_sines,
+        params.col_alphas_cosines,
+        angle_threshold,
+        get_num_threads(),
+        label_dtype,
+    )
 
 
-def compute_labels_with_filtering(
-    input_image, params, min_cluster_size=10, max_cluster_size=3000
+@njit(fastmath=True, cache=True)
+def filter_clusters(
+    label_mat,
+    min_cluster_size=10,
+    max_cluster_size=3000,
+    min_rows=1,
+    max_rows=NO_LIMIT,
+    min_cols=1,
+    max_cols=NO_LIMIT,
+    dense=False,
 ):
-    label_mat = compute_labels(input_image, params)
-    result = filter_clusters(label_mat, min_cluster_size, max_cluster_size)
+    """
+    Set the labels of the clusters with less than ``min_cluster_size`` or
+    more than ``max_cluster_size`` pixels to 0. ``min_rows`` / ``max_rows``
+    and ``min_cols`` / ``max_cols`` limit the height and the width of the
+    bounding box of the clusters in pixels.
+
+    dense: renumber the remaining clusters 1, 2, ... in the same order,
+        which keeps tables indexed by label small
+    """
+    rows, cols = label_mat.shape
+    num_labels = 1
+    for r in range(rows):
+        for c in range(cols):
+            num_labels = max(num_labels, np.int64(label_mat[r, c]) + 1)
+
+    counts = np.zeros(num_labels, dtype=np.int64)
+    bounds = np.empty((num_labels, 6), dtype=np.int64)
+    for r in range(rows):
+        for c in range(cols):
+            add_to_cluster_stats(counts, bounds, label_mat[r, c], r, c, cols)
+
+    limits = (
+        min_cluster_size, max_cluster_size, min_rows, max_rows, min_cols, max_cols
+    )
+    # new_labels[label]: label after filtering, 0 if removed
+    new_labels = np.zeros(num_labels, dtype=np.int64)
+    for label in range(1, num_labels):
+        if counts[label] > 0 and keep_cluster(counts, bounds, label, limits):
+            new_labels[label] = label
+    if dense:
+        renumber_densely(new_labels)
+
+    result = np.empty_like(label_mat)
+    for r in range(rows):
+        for c in range(cols):
+            result[r, c] = new_labels[label_mat[r, c]]
     return result
 
 
-def calculate_segmented_point_clouds(label_mat, pc_image):
-    result = defaultdict(list)
+def compute_labels_with_filtering(
+    input_image,
+    params,
+    angle_threshold,
+    min_cluster_size=10,
+    max_cluster_size=3000,
+    min_rows=1,
+    max_rows=NO_LIMIT,
+    min_cols=1,
+    max_cols=NO_LIMIT,
+    dense=False,
+    fused=True,
+    label_dtype=None,
+):
+    """
+    ``compute_labels`` followed by ``filter_clusters``. With ``fused`` the
+    clusters are filtered while labeling with union-find, using the sizes
+    of the components known after merging, which saves the passes over
+    the label image.
+    """
+    if label_dtype is None:
+        label_dtype = get_label_dtype(params.rows, params.cols)
+    if not fused:
+        label_mat = compute_labels(
+            input_image, params, angle_threshold, label_dtype=label_dtype
+        )
+        return filter_clusters(
+            label_mat,
+            min_cluster_size,
+            max_cluster_size,
+            min_rows,
+            max_rows,
+            min_cols,
+            max_cols,
+            dense,
+        )
+    return label_union_find_filtered(
+        input_image,
+        params.row_alphas_sines,
+        params.row_alphas_cosines,
+        params.col_alphas_sines,
+        params.col_alphas_cosines,
+        angle_threshold,
+        (min_cluster_size, max_cluster_size, min_rows, max_rows, min_cols, max_cols),
+        dense,
+        label_dtype,
+    )
 
+
+@njit(nogil=True, cache=True)
+def segment_points(label_mat, pc_image):
+    """
+    Counting sort of the points of ``pc_image`` by label, skipping label 0.
+    Returns the sorted labels, the ``len(labels) + 1`` offsets and the
+    ``(N, 3)`` points, the points of ``labels[i]`` being
+    ``points[offsets[i]:offsets[i + 1]]`` in raster order.
+    """
     rows, cols = label_mat.shape
+    max_label = 0
+    for r in range(rows):
+        for c in range(cols):
+            if label_mat[r, c] > max_label:
+                max_label = label_mat[r, c]
+
+    counts = np.zeros(np.int64(max_label) + 1, dtype=np.int64)
     for r in range(rows):
         for c in range(cols):
-            label = label_mat[r][c]
+            counts[label_mat[r, c]] += 1
+    counts[0] = 0
+
+    num_labels = 0
+    for label in range(1, max_label + 1):
+        if counts[label] > 0:
+            num_labels += 1
+
+    labels = np.empty(num_labels, dtype=label_mat.dtype)
+    offsets = np.zeros(num_labels + 1, dtype=np.int64)
+    starts = np.zeros(max_label + 1, dtype=np.int64)
+    i = 0
+    for label in range(1, max_label + 1):
+        if counts[label] > 0:
+            labels[i] = label
+            starts[label] = offsets[i]
+            offsets[i + 1] = offsets[i] + counts[label]
+            i += 1
+
+    dims = pc_image.shape[2]
+    points = np.empty((offsets[num_labels], dims), dtype=pc_image.dtype)
+    for r in range(rows):
+        for c in range(cols):
+            label = label_mat[r, c]
             if label == 0:
                 continue
-            p = pc_image[r][c]
-            result[label].append(p)
+            k = starts[label]
+            for d in range(dims):
+                points[k, d] = pc_image[r, c, d]
+            starts[label] = k + 1
+    return labels, offsets, points
 
-    for k, l in result.items():
-        result[k] = np.array(l)
 
-    return result
+class SegmentedPointCloud(Mapping):
+    """
+    Read-only mapping from label to the ``(n, 3)`` points of the cluster.
+
+    The points of all clusters are stored in one contiguous ``points``
+    array, sorted by label and indexed by ``offsets``; the values are
+    views into it, nothing is copied.
+    """
+
+    def __init__(self, labels, offsets, points):
+        self.labels = labels
+        self.offsets = offsets
+        self.points = points
+
+    @classmethod
+    def from_label_image(cls, label_mat, pc_image):
+        return cls(*segment_points(label_mat, pc_image))
+
+    @property
+    def counts(self):
+        return np.diff(self.offsets)
+
+    def __getitem__(self, label):
+        i = np.searchsorted(self.labels, label)
+        if i == len(self.labels) or self.labels[i] != label:
+            raise KeyError(label)
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        return iter(self.labels.tolist())
+
+    def __len__(self):
+        return len(self.labels)
+
+
+def calculate_segmented_point_clouds(label_mat, pc_image):
+    segmented = SegmentedPointCloud.from_label_image(label_mat, pc_image)
+    return defaultdict(list, segmented.items())
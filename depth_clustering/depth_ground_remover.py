@@ -20,17 +20,22 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 DEALINGS IN THE SOFTWARE.
 """
+from concurrent.futures import ThreadPoolExecutor
 from math import radians
 
 import cv2
 import numpy as np
-from numba import njit, float32, uint8
+from numba import njit, prange, float32, uint8
 
 from .simple_diff import SimpleDiff
-from .linear_image_labeler import SimpleDiffLinearImageLabeler, PixelCoord
+from .linear_image_labeler import (
+    InstrumentedSimpleDiffLinearImageLabeler,
+    PixelCoord,
+    SimpleDiffLinearImageLabeler,
+)
 
 
-@njit(uint8[:, :](uint8))
+@njit(uint8[:, :](uint8), cache=True)
 def get_uniform_kernel(window_size):
     if window_size % 2 == 0:
         raise ValueError("only odd window size allowed")
@@ -47,27 +52,191 @@ def dilate_image(label_image, window_size):
     return dilated
 
 
-@njit
+@njit(nogil=True, cache=True)
 def dilate_custom(image, window_size):
+    dilated_image = np.empty_like(image)
+    dilate_custom_into(image, window_size, dilated_image)
+    return dilated_image
+
+
+@njit(nogil=True, cache=True)
+def dilate_custom_into(image, window_size, dilated_image):
     h, w = image.shape
     half_w = window_size // 2
-    dilated_image = np.copy(image)
+    dilated_image[:, :] = image
 
     for y in range(half_w, h - half_w):
         for x in range(half_w, w - half_w):
-            max_val = np.max(image[y-half_w:y+half_w+1, x-half_w:x+half_w+1])
+            max_val = image[y - half_w, x - half_w]
+            for i in range(y - half_w, y + half_w + 1):
+                for j in range(x - half_w, x + half_w + 1):
+                    max_val = max(max_val, image[i, j])
             dilated_image[y, x] = max_val
 
-    return dilated_image
 
+@njit(nogil=True, cache=True)
+def max_along_row(
+    image, r, window_size, prefix_max, suffix_max, out_row, wrap=True
+):
+    """
+    Running max over ``window_size`` columns centered on each pixel of row
+    ``r``, wrapping around the first / last column (van Herk/Gil-Werman:
+    prefix and suffix maxima over blocks of ``window_size``, so the cost
+    does not depend on the window size). Without ``wrap`` the pixels
+    beyond the first / last column count as 0.
 
-@njit(float32[:, :](float32[:, :], uint8, float32))
-def repair_depth(no_ground_image, step, depth_threshold):
-    inpainted_depth = np.copy(no_ground_image)
-    rows, cols = inpainted_depth.shape
+    prefix_max, suffix_max: scratch of ``cols + window_size - 1`` elements
+    """
+    cols = image.shape[1]
+    half = window_size // 2
+    n = cols + window_size - 1
+
+    # padded index j is column (j - half) % cols
+    c = (-half) % cols
+    block_index = 0
+    for j in range(n):
+        value = image[r, c]
+        if not wrap and (j < half or j >= cols + half):
+            value = 0
+        if block_index == 0:
+            prefix_max[j] = value
+        else:
+            prefix_max[j] = max(prefix_max[j - 1], value)
+        c = c + 1 if c + 1 < cols else 0
+        block_index = block_index + 1 if block_index + 1 < window_size else 0
+
+    # the last block can be shorter
+    block_index = (n - 1) % window_size
+    for j in range(n - 1, -1, -1):
+        c = c - 1 if c > 0 else cols - 1
+        value = image[r, c]
+        if not wrap and (j < half or j >= cols + half):
+            value = 0
+        if j == n - 1 or block_index == window_size - 1:
+            suffix_max[j] = value
+        else:
+            suffix_max[j] = max(suffix_max[j + 1], value)
+        block_index = block_index - 1 if block_index > 0 else window_size - 1
 
     for c in range(cols):
-        for r in range(rows):
+        out_row[c] = max(suffix_max[c], prefix_max[c + window_size - 1])
+
+
+@njit(nogil=True, cache=True)
+def max_down_block(image, b, window_size, prefix_max, suffix_max, dilated):
+    """
+    Running max over ``window_size`` rows centered on each pixel of the rows
+    ``b * window_size`` to ``(b + 1) * window_size``, the window being
+    clamped to the image at the first / last row.
+
+    prefix_max, suffix_max: ``(window_size, cols)`` scratch
+    """
+    rows, cols = image.shape
+    half = window_size // 2
+    start = b * window_size
+
+    # padded row e is row min(max(e - half, 0), rows - 1); the suffix max
+    # covers block b, the prefix max block b + 1
+    for i in range(window_size - 1, -1, -1):
+        row = min(max(start + i - half, 0), rows - 1)
+        for c in range(cols):
+            if i == window_size - 1:
+                suffix_max[i, c] = image[row, c]
+            else:
+                suffix_max[i, c] = max(suffix_max[i + 1, c], image[row, c])
+    for i in range(window_size - 1):
+        row = min(max(start + window_size + i - half, 0), rows - 1)
+        for c in range(cols):
+            if i == 0:
+                prefix_max[i, c] = image[row, c]
+            else:
+                prefix_max[i, c] = max(prefix_max[i - 1, c], image[row, c])
+
+    for i in range(min(window_size, rows - start)):
+        for c in range(cols):
+            if i == 0:
+                dilated[start, c] = suffix_max[0, c]
+            else:
+                dilated[start + i, c] = \
+                    max(suffix_max[i, c], prefix_max[i - 1, c])
+
+
+@njit(nogil=True, cache=True)
+def dilate_wrapped_into(image, window_size, horizontal, dilated, wrap=True):
+    """
+    Dilate ``image`` with a ``window_size x window_size`` square: the max
+    over the window, which wraps around the first / last column like the
+    range image and is clamped at the first / last row. Separable, with a
+    constant cost per pixel whatever the window size.
+
+    horizontal: scratch of the shape and type of ``image``
+    wrap: see ``max_along_row``
+    """
+    rows, cols = image.shape
+    n = cols + window_size - 1
+    prefix_max = np.empty(n, dtype=image.dtype)
+    suffix_max = np.empty(n, dtype=image.dtype)
+    for r in range(rows):
+        max_along_row(
+            image, r, window_size, prefix_max, suffix_max, horizontal[r], wrap
+        )
+
+    block_prefix_max = np.empty((window_size, cols), dtype=image.dtype)
+    block_suffix_max = np.empty((window_size, cols), dtype=image.dtype)
+    for b in range((rows + window_size - 1) // window_size):
+        max_down_block(
+            horizontal, b, window_size, block_prefix_max, block_suffix_max, dilated
+        )
+
+
+@njit(parallel=True, cache=True)
+def dilate_wrapped(image, window_size):
+    """
+    ``dilate_wrapped_into`` on all Numba threads, splitting the rows.
+    """
+    rows, cols = image.shape
+    horizontal = np.empty_like(image)
+    dilated = np.empty_like(image)
+    n = cols + window_size - 1
+    for r in prange(rows):
+        max_along_row(
+            image,
+            r,
+            window_size,
+            np.empty(n, dtype=image.dtype),
+            np.empty(n, dtype=image.dtype),
+            horizontal[r],
+        )
+    for b in prange((rows + window_size - 1) // window_size):
+        max_down_block(
+            horizontal,
+            b,
+            window_size,
+            np.empty((window_size, cols), dtype=image.dtype),
+            np.empty((window_size, cols), dtype=image.dtype),
+            dilated,
+        )
+    return dilated
+
+
+@njit(nogil=True, cache=True)
+def repair_depth_in_place(inpainted_depth, step, depth_threshold):
+    repair_depth_columns(
+        inpainted_depth, step, depth_threshold, 0, inpainted_depth.shape[1]
+    )
+
+
+@njit(nogil=True, cache=True)
+def repair_depth_columns(inpainted_depth, step, depth_threshold, c_start, c_stop):
+    """
+    ``repair_depth_in_place`` for the columns ``c_start`` to ``c_stop``.
+    Columns are repaired independently, going down the rows of all of them
+    at once to access the image row by row.
+    """
+    rows = inpainted_depth.shape[0]
+
+    for r in range(rows):
+        for c in range(c_start, c_stop):
             curr_depth = inpainted_depth[r, c]
             if curr_depth < 0.001:
                 counter = 0
@@ -87,10 +256,92 @@ def repair_depth(no_ground_image, step, depth_threshold):
                 if counter > 0:
                     inpainted_depth[r, c] = sum_depths / counter
 
+
+@njit(nogil=True, cache=True)
+def repair_depth_linear_columns(
+    inpainted_depth, step, depth_threshold, c_start, c_stop
+):
+    """
+    Fill the gaps of less than ``step`` missing pixels in the columns
+    ``c_start`` to ``c_stop`` whose valid depths above and below differ by
+    less than ``depth_threshold``, interpolating linearly between them.
+
+    A single pass down the rows, remembering the last valid row of every
+    column, so the cost does not depend on ``step``. Depths of at least
+    0.001 are valid, the others are missing.
+    """
+    rows = inpainted_depth.shape[0]
+    last_valid = np.full(c_stop - c_start, -1, dtype=np.int64)
+
+    for r in range(rows):
+        for c in range(c_start, c_stop):
+            depth = inpainted_depth[r, c]
+            if depth < 0.001:
+                continue
+            prev_r = last_valid[c - c_start]
+            last_valid[c - c_start] = r
+            if prev_r < 0:
+                continue
+            gap = r - prev_r - 1
+            if gap == 0 or gap >= step:
+                continue
+            prev = inpainted_depth[prev_r, c]
+            if abs(prev - depth) < depth_threshold:
+                for i in range(1, gap + 1):
+                    inpainted_depth[prev_r + i, c] = \
+                        prev + (depth - prev) * i / (gap + 1)
+
+
+@njit(nogil=True, cache=True)
+def repair_depth_linear(no_ground_image, step, depth_threshold):
+    """
+    ``repair_depth`` filling each gap in one go with
+    ``repair_depth_linear_columns``, in linear time.
+    """
+    inpainted_depth = np.copy(no_ground_image)
+    repair_depth_linear_columns(
+        inpainted_depth, step, depth_threshold, 0, inpainted_depth.shape[1]
+    )
     return inpainted_depth
 
 
-@njit
+@njit(float32[:, :](float32[:, :], uint8, float32), nogil=True, cache=True)
+def repair_depth(no_ground_image, step, depth_threshold):
+    inpainted_depth = np.copy(no_ground_image)
+    repair_depth_in_place(inpainted_depth, step, depth_threshold)
+    return inpainted_depth
+
+
+# number of columns processed together by the parallel repair and the
+# fused engine
+BLOCK_COLUMNS = 32
+
+
+@njit(parallel=True, cache=True)
+def repair_depth_parallel(no_ground_image, step, depth_threshold, linear):
+    """
+    ``repair_depth_linear`` (``linear``) or ``repair_depth`` repairing
+    blocks of ``BLOCK_COLUMNS`` columns on all Numba threads. Columns are
+    repaired independently, so the output is the same.
+    """
+    inpainted_depth = np.copy(no_ground_image)
+    cols = inpainted_depth.shape[1]
+    num_blocks = (cols + BLOCK_COLUMNS - 1) // BLOCK_COLUMNS
+    for b in prange(num_blocks):
+        c_start = b * BLOCK_COLUMNS
+        c_stop = min(c_start + BLOCK_COLUMNS, cols)
+        if linear:
+            repair_depth_linear_columns(
+                inpainted_depth, step, depth_threshold, c_start, c_stop
+            )
+        else:
+            repair_depth_columns(
+                inpainted_depth, step, depth_threshold, c_start, c_stop
+            )
+    return inpainted_depth
+
+
+@njit(nogil=True)
 def zero_out_ground_bfs_jit(
     image, angle_image, angle_threshold, kernel_size, params
 ):
@@ -103,7 +354,8 @@ def zero_out_ground_bfs_jit(
     image_labeler = SimpleDiffLinearImageLabeler(
         rows, cols, angle_threshold, SimpleDiff(angle_image),
     )
-    label_image = np.zeros((rows, cols), dtype=np.uint16)
+    # ground mask, the labels are 0 or 1
+    label_image = np.zeros((rows, cols), dtype=np.uint8)
 
     for c in range(cols):
         r = rows - 1
@@ -119,8 +371,11 @@ def zero_out_ground_bfs_jit(
         current_coord = PixelCoord(r, c)
         image_labeler.label_one_component(label_image, image, 1, current_coord)
 
-    kernel_size = max(kernel_size - 2, 3)
-    dilated = dilate_custom(label_image, window_size=5)
+    # also remove the pixels next to the ground
+    dilated = np.empty_like(label_image)
+    dilate_wrapped_into(
+        label_image, kernel_size, np.empty_like(label_image), dilated
+    )
     res = np.zeros((rows, cols), dtype=np.float32)
 
     for r in range(rows):
@@ -130,52 +385,694 @@ def zero_out_ground_bfs_jit(
     return res
 
 
-@njit
-def create_angle_image_jit(depth_image, params):
+@njit(nogil=True)
+def label_ground_bfs(image, angle_image, angle_threshold, params):
+    """
+    The ground mask (0 or 1) of ``zero_out_ground_bfs_jit`` and the largest
+    size of the queue of its flood fill, for the instrumented code path.
+    """
+    start_thresh = radians(30)
+
     rows = params.rows
     cols = params.cols
-    angle_image = np.zeros((rows, cols), dtype=np.float32)
-    x_mat = np.zeros((rows, cols), dtype=np.float32)
-    y_mat = np.zeros((rows, cols), dtype=np.float32)
 
-    sines_vec = params.row_angles_sines
-    cosines_vec = params.row_angles_cosines
+    image_labeler = InstrumentedSimpleDiffLinearImageLabeler(
+        rows, cols, angle_threshold, SimpleDiff(angle_image),
+    )
+    # ground mask, the labels are 0 or 1
+    label_image = np.zeros((rows, cols), dtype=np.uint8)
 
-    x_mat[0, :] = depth_image[0, :] * cosines_vec[0]
-    y_mat[0, :] = depth_image[0, :] * sines_vec[0]
+    for c in range(cols):
+        r = rows - 1
+        while (r > 0 and image[r][c] < 0.001):
+            r -= 1
+        current_label = label_image[r][c]
+        if current_label > 0:
+            # this coord was already labeled, skip
+            continue
+        if angle_image[r][c] > start_thresh:
+            continue
+
+        current_coord = PixelCoord(r, c)
+        image_labeler.label_one_component(label_image, image, 1, current_coord)
+
+    return label_image, image_labeler.max_queue_size
 
-    for r in range(1, rows):
-        x_mat[r, :] = depth_image[r, :] * cosines_vec[r]
-        y_mat[r, :] = depth_image[r, :] * sines_vec[r]
-        dx = np.abs(x_mat[r, :] - x_mat[r - 1, :])
-        dy = np.abs(y_mat[r, :] - y_mat[r - 1, :])
-        angle_image[r, :] = np.arctan2(dy, dx)
 
+@njit(nogil=True, cache=True)
+def compute_angle_image(depth_image, sines_vec, cosines_vec):
+    angle_image = np.empty(depth_image.shape, dtype=np.float32)
+    compute_angle_image_into(depth_image, sines_vec, cosines_vec, angle_image)
     return angle_image
 
 
+@njit(nogil=True, cache=True)
+def compute_angle_image_into(depth_image, sines_vec, cosines_vec, angle_image):
+    rows, cols = depth_image.shape
+    angle_image[0, :] = 0.0
+
+    for r in range(1, rows):
+        for c in range(cols):
+            angle_image[r, c] = compute_angle(
+                depth_image, sines_vec, cosines_vec, r, c
+            )
+
+
+@njit(nogil=True, cache=True, inline="always")
+def compute_angle(depth_image, sines_vec, cosines_vec, r, c):
+    x_prev = depth_image[r - 1, c] * cosines_vec[r - 1]
+    y_prev = depth_image[r - 1, c] * sines_vec[r - 1]
+    x = depth_image[r, c] * cosines_vec[r]
+    y = depth_image[r, c] * sines_vec[r]
+    return np.arctan2(abs(y - y_prev), abs(x - x_prev))
+
+
+@njit(nogil=True, cache=True)
+def zero_out_ground_into(
+    image,
+    angle_image,
+    angle_threshold,
+    kernel_size,
+    label_image,
+    stack,
+    horizontal,
+    dilated,
+    no_ground_image,
+    wrap=True,
+):
+    """
+    ``zero_out_ground_bfs_jit`` working in caller supplied buffers.
+
+    The flood fill keeps pixel indices on ``stack`` (``rows * cols``
+    elements) instead of a list of PixelCoord, marking pixels when they are
+    pushed, which labels the same set of pixels.
+
+    wrap: whether the last column is next to the first one
+    """
+    label_ground(image, angle_image, angle_threshold, label_image, stack, wrap)
+    remove_dilated_ground(
+        image, label_image, kernel_size, horizontal, dilated, no_ground_image, wrap
+    )
+
+
+@njit(nogil=True, cache=True)
+def remove_dilated_ground(
+    image, label_image, kernel_size, horizontal, dilated, no_ground_image, wrap=True
+):
+    """
+    Copy ``image`` to ``no_ground_image`` except the ground of
+    ``label_image`` dilated by ``kernel_size``.
+    """
+    rows, cols = image.shape
+    dilate_wrapped_into(label_image, kernel_size, horizontal, dilated, wrap)
+
+    for r in range(rows):
+        for c in range(cols):
+            if dilated[r, c] == 0:
+                no_ground_image[r, c] = image[r, c]
+            else:
+                no_ground_image[r, c] = 0.0
+
+
+@njit(nogil=True, cache=True)
+def label_ground(
+    image, angle_image, angle_threshold, label_image, stack, wrap=True
+):
+    """
+    Set ``label_image`` to 1 on the ground: the pixels reachable from the
+    lowest valid pixel of each column through neighbors whose smoothed
+    angles differ by less than ``angle_threshold``.
+
+    wrap: whether the last column is next to the first one
+    """
+    start_thresh = radians(30)
+    threshold = np.float32(angle_threshold)
+
+    rows, cols = image.shape
+    label_image[:, :] = 0
+
+    for c in range(cols):
+        r = rows - 1
+        while (r > 0 and image[r, c] < 0.001):
+            r -= 1
+        if label_image[r, c] > 0:
+            # this coord was already labeled, skip
+            continue
+        if angle_image[r, c] > start_thresh:
+            continue
+
+        label_image[r, c] = 1
+        stack[0] = r * cols + c
+        flood_fill_ground(
+            image, angle_image, threshold, label_image, stack, 1, wrap
+        )
+
+
+@njit(nogil=True, cache=True)
+def flood_fill_ground(
+    image, angle_image, threshold, label_image, stack, size, wrap=True
+):
+    """
+    Label the neighbors of the ``size`` pixels on ``stack``, which are
+    already labeled, and so on.
+    """
+    rows, cols = image.shape
+    while size > 0:
+        size -= 1
+        row = stack[size] // cols
+        col = stack[size] % cols
+        if image[row, col] < 0.001:
+            continue
+        current = angle_image[row, col]
+
+        for i in range(4):
+            neighbor_row = row
+            neighbor_col = col
+            if i == 0:
+                neighbor_row -= 1
+            elif i == 1:
+                neighbor_row += 1
+            elif i == 2:
+                # WrapCols
+                neighbor_col = col - 1 if col > 0 else cols - 1
+            else:
+                neighbor_col = col + 1 if col + 1 < cols else 0
+            if neighbor_row < 0 or neighbor_row >= rows:
+                continue
+            if not wrap and abs(neighbor_col - col) > 1:
+                continue
+            if label_image[neighbor_row, neighbor_col] > 0:
+                continue
+            if abs(current - angle_image[neighbor_row, neighbor_col]) \
+                    < threshold:
+                label_image[neighbor_row, neighbor_col] = 1
+                stack[size] = neighbor_row * cols + neighbor_col
+                size += 1
+
+
+@njit(nogil=True, cache=True)
+def remove_ground_columns(
+    raw_depth_image,
+    sines_vec,
+    cosines_vec,
+    kernel,
+    linear_repair,
+    c_start,
+    c_stop,
+    depth_image,
+    angle_block,
+    smoothed_image,
+):
+    """
+    Repair the depth, compute the angle image and smooth it for the columns
+    ``c_start`` to ``c_stop``. The angles are only kept in ``angle_block``,
+    a ``(rows, >= c_stop - c_start)`` scratch array which stays in cache.
+
+    linear_repair: repair with ``repair_depth_linear_columns`` instead of
+        ``repair_depth_columns``
+
+    The smoothing is the same as ``cv2.filter2D`` with ``BORDER_REFLECT101``
+    and a vertical ``kernel``, accumulating the taps with fused
+    multiply-adds as OpenCV does on CPUs with FMA. Other OpenCV builds
+    round differently, the angles then agree up to rounding only.
+    """
+    rows = raw_depth_image.shape[0]
+    for r in range(rows):
+        for c in range(c_start, c_stop):
+            depth_image[r, c] = raw_depth_image[r, c]
+    if linear_repair:
+        repair_depth_linear_columns(depth_image, 5, 1.0, c_start, c_stop)
+    else:
+        repair_depth_columns(
+            depth_image, np.uint8(5), np.float32(1.0), c_start, c_stop
+        )
+
+    for c in range(c_start, c_stop):
+        angle_block[0, c - c_start] = 0.0
+    for r in range(1, rows):
+        for c in range(c_start, c_stop):
+            angle_block[r, c - c_start] = compute_angle(
+                depth_image, sines_vec, cosines_vec, r, c
+            )
+
+    half = len(kernel) // 2
+    width = c_stop - c_start
+    smoothed = np.empty(width, dtype=np.float32)
+    for r in range(rows):
+        smoothed[:] = 0.0
+        for i in range(len(kernel)):
+            k = r + i - half
+            if k < 0:
+                k = -k
+            elif k >= rows:
+                k = 2 * (rows - 1) - k
+            weight = np.float64(kernel[i])
+            for c in range(width):
+                # float32 products are exact in float64, so this rounds once
+                smoothed[c] = np.float32(
+                    np.float64(smoothed[c])
+                    + weight * np.float64(angle_block[k, c])
+                )
+        for c in range(width):
+            smoothed_image[r, c_start + c] = smoothed[c]
+
+
+@njit(nogil=True, cache=True)
+def remove_ground_fused_into(
+    raw_depth_image,
+    sines_vec,
+    cosines_vec,
+    kernel,
+    angle_threshold,
+    kernel_size,
+    linear_repair,
+    depth_image,
+    angle_block,
+    smoothed_image,
+    label_image,
+    stack,
+    horizontal,
+    no_ground_image,
+):
+    """
+    Fused ground removal on the calling thread, in caller supplied buffers;
+    see ``remove_ground_fused``. ``angle_block`` is ``(rows, BLOCK_COLUMNS)``,
+    ``label_image`` is left with the dilated ground mask.
+    """
+    rows, cols = raw_depth_image.shape
+    block = angle_block.shape[1]
+    for c_start in range(0, cols, block):
+        remove_ground_columns(
+            raw_depth_image,
+            sines_vec,
+            cosines_vec,
+            kernel,
+            linear_repair,
+            c_start,
+            min(c_start + block, cols),
+            depth_image,
+            angle_block,
+            smoothed_image,
+        )
+    label_ground(depth_image, smoothed_image, angle_threshold, label_image, stack)
+    # the vertical pass only reads horizontal, so it can overwrite the mask
+    dilate_wrapped_into(label_image, kernel_size, horizontal, label_image)
+    for r in range(rows):
+        for c in range(cols):
+            no_ground_image[r, c] = \
+                depth_image[r, c] if label_image[r, c] == 0 else 0.0
+
+
+@njit(nogil=True, cache=True)
+def remove_ground_fused(
+    raw_depth_image,
+    sines_vec,
+    cosines_vec,
+    kernel,
+    angle_threshold,
+    kernel_size,
+    linear_repair,
+):
+    """
+    ``DepthGroundRemover.on_new_object_received`` in one kernel.
+
+    Depth repair, angle image and smoothing only look along the columns and
+    are done for blocks of ``BLOCK_COLUMNS`` columns at a time, then the
+    ground is flood filled and removed with the dilated ground mask. The
+    output is the same up to rounding near ``angle_threshold``: see the
+    smoothing of ``remove_ground_columns``.
+
+    kernel: the 1-D Savitzky-Golay kernel
+    kernel_size: size of the window by which the ground mask is dilated
+    linear_repair: see ``remove_ground_columns``
+    """
+    rows, cols = raw_depth_image.shape
+    no_ground_image = np.empty((rows, cols), dtype=np.float32)
+    remove_ground_fused_into(
+        raw_depth_image,
+        sines_vec,
+        cosines_vec,
+        kernel,
+        angle_threshold,
+        kernel_size,
+        linear_repair,
+        np.empty((rows, cols), dtype=np.float32),
+        np.empty((rows, BLOCK_COLUMNS), dtype=np.float32),
+        np.empty((rows, cols), dtype=np.float32),
+        np.empty((rows, cols), dtype=np.uint8),
+        np.empty(rows * cols, dtype=np.int64),
+        np.empty((rows, cols), dtype=np.uint8),
+        no_ground_image,
+    )
+    return no_ground_image
+
+
+@njit(parallel=True, cache=True)
+def remove_ground_fused_parallel(
+    raw_depth_image,
+    sines_vec,
+    cosines_vec,
+    kernel,
+    angle_threshold,
+    kernel_size,
+    linear_repair,
+):
+    """
+    ``remove_ground_fused`` processing the column blocks and the output rows
+    on all Numba threads. Only the flood fill runs on one thread.
+    """
+    rows, cols = raw_depth_image.shape
+    depth_image = np.empty((rows, cols), dtype=np.float32)
+    smoothed_image = np.empty((rows, cols), dtype=np.float32)
+
+    num_blocks = (cols + BLOCK_COLUMNS - 1) // BLOCK_COLUMNS
+    for b in prange(num_blocks):
+        c_start = b * BLOCK_COLUMNS
+        remove_ground_columns(
+            raw_depth_image,
+            sines_vec,
+            cosines_vec,
+            kernel,
+            linear_repair,
+            c_start,
+            min(c_start + BLOCK_COLUMNS, cols),
+            depth_image,
+            np.empty((rows, BLOCK_COLUMNS), dtype=np.float32),
+            smoothed_image,
+        )
+
+    label_image = np.empty((rows, cols), dtype=np.uint8)
+    stack = np.empty(rows * cols, dtype=np.int64)
+    label_ground(depth_image, smoothed_image, angle_threshold, label_image, stack)
+
+    dilated = dilate_wrapped(label_image, kernel_size)
+    no_ground_image = np.empty((rows, cols), dtype=np.float32)
+    for r in prange(rows):
+        for c in range(cols):
+            no_ground_image[r, c] = \
+                depth_image[r, c] if dilated[r, c] == 0 else 0.0
+    return no_ground_image
+
+
+@njit(nogil=True, cache=True, inline="always")
+def smooth_at(angle_image, kernel, r, c):
+    """
+    Smoothed angle of ``remove_ground_columns`` for a single pixel.
+    """
+    rows = angle_image.shape[0]
+    half = len(kernel) // 2
+    smoothed = np.float32(0.0)
+    for i in range(len(kernel)):
+        k = r + i - half
+        if k < 0:
+            k = -k
+        elif k >= rows:
+            k = 2 * (rows - 1) - k
+        smoothed = np.float32(
+            np.float64(smoothed)
+            + np.float64(kernel[i]) * np.float64(angle_image[k, c])
+        )
+    return smoothed
+
+
+@njit(nogil=True, cache=True)
+def compute_ground_full(
+    depth_image,
+    sines_vec,
+    cosines_vec,
+    kernel,
+    angle_threshold,
+    ref_depth,
+    angle_image,
+    smoothed_image,
+    label_image,
+    stack,
+):
+    """
+    Compute the state of the "temporal" engine from scratch: the depth the
+    angles are computed from, the angle image, the smoothed angle image and
+    the ground mask before dilation.
+    """
+    rows, cols = depth_image.shape
+    ref_depth[:, :] = depth_image
+    compute_angle_image_into(depth_image, sines_vec, cosines_vec, angle_image)
+    for r in range(rows):
+        for c in range(cols):
+            smoothed_image[r, c] = smooth_at(angle_image, kernel, r, c)
+    label_ground(depth_image, smoothed_image, angle_threshold, label_image, stack)
+
+
+@njit(nogil=True, cache=True)
+def detect_depth_changes(depth_image, ref_depth, depth_tolerance, changed):
+    """
+    Set ``changed`` to 1 where the depth differs from ``ref_depth`` by more
+    than ``depth_tolerance`` or became valid / missing, 0 elsewhere, and
+    return the number of changed pixels.
+    """
+    rows, cols = depth_image.shape
+    num_changed = 0
+    for r in range(rows):
+        for c in range(cols):
+            depth = depth_image[r, c]
+            ref = ref_depth[r, c]
+            if (depth < 0.001) != (ref < 0.001) or \
+                    abs(depth - ref) > depth_tolerance:
+                changed[r, c] = 1
+                num_changed += 1
+            else:
+                changed[r, c] = 0
+    return num_changed
+
+
+@njit(nogil=True, cache=True)
+def update_ground(
+    depth_image,
+    sines_vec,
+    cosines_vec,
+    kernel,
+    angle_threshold,
+    ref_depth,
+    angle_image,
+    smoothed_image,
+    label_image,
+    changed,
+    stack,
+):
+    """
+    Update the state of ``compute_ground_full`` for a new frame, given the
+    pixels marked by ``detect_depth_changes``.
+
+    Only the angles depending on a changed depth are recomputed, from the
+    current depth, and the smoothed angles depending on them. The other
+    angles are those of the frame in which their depths last changed. The
+    ground is then flood filled again from the column seeds, so ground kept
+    from the previous frames is checked against the current angles.
+    """
+    rows, cols = depth_image.shape
+    half = len(kernel) // 2
+
+    # bit 1: depth changed, bit 2: angle recomputed
+    for r in range(rows):
+        for c in range(cols):
+            if changed[r, c]:
+                ref_depth[r, c] = depth_image[r, c]
+    for r in range(1, rows):
+        for c in range(cols):
+            if (changed[r, c] | changed[r - 1, c]) & 1:
+                angle_image[r, c] = compute_angle(
+                    depth_image, sines_vec, cosines_vec, r, c
+                )
+                changed[r, c] |= 2
+    for r in range(rows):
+        for c in range(cols):
+            for i in range(len(kernel)):
+                k = r + i - half
+                if k < 0:
+                    k = -k
+                elif k >= rows:
+                    k = 2 * (rows - 1) - k
+                if changed[k, c] & 2:
+                    smoothed_image[r, c] = smooth_at(angle_image, kernel, r, c)
+                    break
+
+    label_ground(depth_image, smoothed_image, angle_threshold, label_image, stack)
+
+
+@njit
+def create_angle_image_jit(depth_image, params):
+    return compute_angle_image(
+        depth_image, params.row_angles_sines, params.row_angles_cosines
+    )
+
+
+class GroundState:
+    """
+    What the "temporal" engine keeps from one frame to the next.
+    """
+
+    def __init__(self, rows, cols):
+        self.ref_depth = np.zeros((rows, cols), dtype=np.float32)
+        self.angle_image = np.zeros((rows, cols), dtype=np.float32)
+        self.smoothed_image = np.zeros((rows, cols), dtype=np.float32)
+        self.label_image = np.zeros((rows, cols), dtype=np.uint8)
+        self.changed = np.zeros((rows, cols), dtype=np.uint8)
+        self.stack = np.zeros(rows * cols, dtype=np.int64)
+        self.horizontal = np.zeros((rows, cols), dtype=np.uint8)
+        self.dilated = np.zeros((rows, cols), dtype=np.uint8)
+        self.frames_since_reset = 0
+
+
 class DepthGroundRemover:
+    """
+    engine:
+        "bfs": the steps of the original implementation one after another
+        "fused": ``remove_ground_fused_parallel``, which gives the same
+            output up to rounding near ``ground_remove_angle`` in fewer
+            passes over the image on all Numba threads
+        "temporal": for consecutive frames of one sensor. Keeps the angle
+            images of the previous frame and only recomputes the angles
+            where the depth moved by more than ``depth_tolerance``; the
+            ground is flood filled again on every frame. Angles of pixels
+            which moved by less are those of an earlier frame, so near the
+            border of the ground the output differs from "bfs" about as
+            much as "bfs" differs between two frames of sensor noise.
+            Everything is recomputed every ``reset_interval`` frames, when
+            more than ``max_changed_fraction`` of the pixels changed, or
+            after ``reset()``; these frames give the same output as "bfs",
+            up to rounding near ``ground_remove_angle`` as with "fused".
+    repair_mode:
+        "legacy": ``repair_depth``, averaging pairs of pixels above and
+            below each missing pixel as in the original implementation.
+            The default
+        "linear": fill short gaps in the columns by linear interpolation,
+            see ``repair_depth_linear``. Faster on large images, but not
+            the same pixels are filled
+    roi: optional ``RegionOfInterest``, "bfs" engine only. Only the pixels
+        of the region are processed, the others are 0 in the output.
+    """
 
-    def __init__(self, params, window_size, ground_remove_angle):
+    def __init__(
+        self,
+        params,
+        window_size,
+        ground_remove_angle,
+        engine="bfs",
+        repair_mode="legacy",
+        depth_tolerance=0.05,
+        reset_interval=5,
+        max_changed_fraction=0.25,
+        roi=None,
+    ):
+        if engine not in ("bfs", "fused", "temporal"):
+            raise ValueError("unknown engine: {}".format(engine))
+        if repair_mode not in ("linear", "legacy"):
+            raise ValueError("unknown repair mode: {}".format(repair_mode))
+        if roi is not None and engine != "bfs":
+            raise ValueError("roi requires the bfs engine")
         self.params = params
         self.window_size = window_size
         self.ground_remove_angle = ground_remove_angle
+        self.engine = engine
+        self.repair_mode = repair_mode
+        self.depth_tolerance = depth_tolerance
+        self.reset_interval = reset_interval
+        self.max_changed_fraction = max_changed_fraction
+        self._state = None
+        self.roi = roi
+        if roi is not None:
+            self._roi_sines = roi.crop_rows(params.row_angles_sines)
+            self._roi_cosines = roi.crop_rows(params.row_angles_cosines)
 
-    def on_new_object_received(self, raw_depth_image):
-        depth_image = repair_depth(raw_depth_image, 5, 1.0)
-        angle_image = self.create_angle_image(depth_image)
-        smoothed_image = self.apply_savitsky_golay_smoothing(
-            angle_image,
-            self.window_size,
-        )
-        no_ground_image = self.zero_out_ground_bfs(
+    def reset(self):
+        """
+        Forget the previous frame of the "temporal" engine.
+        """
+        self._state = None
+
+    def on_new_object_received(self, raw_depth_image, stats=None):
+        """
+        stats: optional ``Stats`` receiving the time of the "ground.*"
+            stages, the number of valid pixels of ``raw_depth_image`` and
+            of pixels kept and, with the "bfs" engine, of ground pixels
+            flood filled and the largest size of the queue of the fill
+        """
+        if stats is not None:
+            return self.on_new_object_received_instrumented(
+                raw_depth_image, stats
+            )
+        if self.roi is not None:
+            window = self.remove_ground_window(self.roi.extract(raw_depth_image))
+            return self.roi.insert(window)
+        if self.engine == "fused":
+            return remove_ground_fused_parallel(
+                raw_depth_image,
+                self.params.row_angles_sines,
+                self.params.row_angles_cosines,
+                self.get_savitsky_golay_kernel(self.window_size)[:, 0],
+                self.ground_remove_angle,
+                self.window_size,
+                self.repair_mode == "linear",
+            )
+        depth_image = self.repair_depth(raw_depth_image)
+        if self.engine == "temporal":
+            return self.zero_out_ground_temporal(depth_image)
+        return self.zero_out_ground_smoothed(
             depth_image,
-            smoothed_image,
-            self.ground_remove_angle,
-            self.window_size
+            self.params.row_angles_sines,
+            self.params.row_angles_cosines,
+            True,
         )
+
+    def on_new_object_received_instrumented(self, raw_depth_image, stats):
+        if self.roi is not None or self.engine == "fused":
+            name = "ground.roi" if self.roi is not None else "ground.fused"
+            with stats.stage(name):
+                no_ground_image = self.on_new_object_received(raw_depth_image)
+        else:
+            with stats.stage("ground.repair"):
+                depth_image = self.repair_depth(raw_depth_image)
+            if self.engine == "temporal":
+                with stats.stage("ground.temporal"):
+                    no_ground_image = self.zero_out_ground_temporal(depth_image)
+            else:
+                no_ground_image = self.zero_out_ground_bfs_instrumented(
+                    depth_image, stats
+                )
+        stats.count("ground.valid_pixels", np.count_nonzero(raw_depth_image))
+        stats.count("ground.kept_pixels", np.count_nonzero(no_ground_image))
+        stats.finish()
         return no_ground_image
 
+    def zero_out_ground_bfs_instrumented(self, depth_image, stats):
+        with stats.stage("ground.angle_image"):
+            angle_image = self.create_angle_image(depth_image)
+        with stats.stage("ground.smoothing"):
+            smoothed_image = self.apply_savitsky_golay_smoothing(
+                angle_image, self.window_size
+            )
+        with stats.stage("ground.bfs"):
+            label_image, max_queue_size = label_ground_bfs(
+                depth_image, smoothed_image, self.ground_remove_angle, self.params
+            )
+        with stats.stage("ground.dilation"):
+            no_ground_image = np.empty_like(depth_image)
+            remove_dilated_ground(
+                depth_image,
+                label_image,
+                self.window_size,
+                np.empty_like(label_image),
+                np.empty_like(label_image),
+                no_ground_image,
+            )
+        stats.count("ground.ground_pixels", np.count_nonzero(label_image))
+        stats.high_water("ground.queue_max", max_queue_size)
+        return no_ground_image
+
+    def repair_depth(self, raw_depth_image):
+        return repair_depth_parallel(
+            raw_depth_image, 5, 1.0, self.repair_mode == "linear"
+        )
+
     def zero_out_ground_bfs(
         self, image, angle_image, angle_threshold, kernel_size
     ):
@@ -183,8 +1080,107 @@ class DepthGroundRemover:
             image, angle_image, angle_threshold, kernel_size, self.params,
         )
 
+    def remove_ground_window(self, raw_window):
+        return self.zero_out_ground_smoothed(
+            self.repair_depth(raw_window),
+            self._roi_sines,
+            self._roi_cosines,
+            self.roi.wrap,
+        )
+
+    def zero_out_ground_smoothed(self, depth_image, sines, cosines, wrap):
+        """
+        The "bfs" steps after the repair with the cached array kernels:
+        the same output as ``zero_out_ground_bfs`` without compiling the
+        jitclass flood fill.
+        """
+        angle_image = compute_angle_image(depth_image, sines, cosines)
+        smoothed_image = self.apply_savitsky_golay_smoothing(
+            angle_image, self.window_size
+        )
+
+        rows, cols = depth_image.shape
+        no_ground_image = np.empty_like(depth_image)
+        zero_out_ground_into(
+            depth_image,
+            smoothed_image,
+            self.ground_remove_angle,
+            self.window_size,
+            np.empty((rows, cols), dtype=np.uint8),
+            np.empty(rows * cols, dtype=np.int64),
+            np.empty((rows, cols), dtype=np.uint8),
+            np.empty((rows, cols), dtype=np.uint8),
+            no_ground_image,
+            wrap,
+        )
+        return no_ground_image
+
+    def zero_out_ground_temporal(self, depth_image):
+        rows, cols = depth_image.shape
+        kernel = self.get_savitsky_golay_kernel(self.window_size)[:, 0]
+        sines = self.params.row_angles_sines
+        cosines = self.params.row_angles_cosines
+
+        state = self._state
+        full = state is None or state.ref_depth.shape != (rows, cols) or \
+            state.frames_since_reset + 1 >= self.reset_interval
+        if not full:
+            num_changed = detect_depth_changes(
+                depth_image, state.ref_depth, self.depth_tolerance, state.changed
+            )
+            full = num_changed > self.max_changed_fraction * rows * cols
+
+        if full:
+            if state is None or state.ref_depth.shape != (rows, cols):
+                state = self._state = GroundState(rows, cols)
+            compute_ground_full(
+                depth_image,
+                sines,
+                cosines,
+                kernel,
+                self.ground_remove_angle,
+                state.ref_depth,
+                state.angle_image,
+                state.smoothed_image,
+                state.label_image,
+                state.stack,
+            )
+            state.frames_since_reset = 0
+        else:
+            update_ground(
+                depth_image,
+                sines,
+                cosines,
+                kernel,
+                self.ground_remove_angle,
+                state.ref_depth,
+                state.angle_image,
+                state.smoothed_image,
+                state.label_image,
+                state.changed,
+                state.stack,
+            )
+            state.frames_since_reset += 1
+
+        no_ground_image = np.empty((rows, cols), dtype=np.float32)
+        remove_dilated_ground(
+            depth_image,
+            state.label_image,
+            self.window_size,
+            state.horizontal,
+            state.dilated,
+            no_ground_image,
+        )
+        return no_ground_image
+
     def create_angle_image(self, depth_image):
-        return create_angle_image_jit(depth_image, self.params)
+        # Call the array kernel directly so that it can be served from
+        # Numba's on-disk cache (functions taking jitclasses cannot).
+        return compute_angle_image(
+            depth_image,
+            self.params.row_angles_sines,
+            self.params.row_angles_cosines,
+        )
 
     def apply_savitsky_golay_smoothing(self, image, window_size):
         kernel = self.get_savitsky_golay_kernel(window_size)
@@ -223,3 +1219,64 @@ class DepthGroundRemover:
             kernel /= 429.0
 
         return kernel
+
+
+def remove_ground_batch(
+    depth_stack,
+    params,
+    window_size,
+    ground_remove_angle,
+    num_workers=None,
+    engine="bfs",
+    repair_mode="legacy",
+):
+    """
+    Run ``DepthGroundRemover.on_new_object_received`` over a
+    ``(N, rows, cols)`` float32 stack of depth images.
+
+    Frames are processed concurrently on a thread pool; the Numba kernels
+    and OpenCV release the GIL. Returns a ``(N, rows, cols)`` float32 array.
+
+    num_workers: number of threads, defaults to ``os.cpu_count()``
+    engine, repair_mode: see ``DepthGroundRemover``; the "fused" engine
+        runs on one thread per frame here. The "temporal" engine is not
+        accepted, it needs the frames one after another.
+    """
+    if engine == "temporal":
+        raise ValueError("the temporal engine cannot process frames concurrently")
+    remover = DepthGroundRemover(
+        params, window_size, ground_remove_angle, engine, repair_mode
+    )
+    kernel = remover.get_savitsky_golay_kernel(window_size)[:, 0]
+    result = np.empty_like(depth_stack, dtype=np.float32)
+
+    def process(i):
+        if engine == "fused":
+            result[i] = remove_ground_fused(
+                depth_stack[i],
+                params.row_angles_sines,
+                params.row_angles_cosines,
+                kernel,
+                ground_remove_angle,
+                window_size,
+                repair_mode == "linear",
+            )
+        else:
+            # serial repair: parallel kernels are not launched from the
+            # threads of the pool
+            if repair_mode == "linear":
+                depth_image = repair_depth_linear(depth_stack[i], 5, 1.0)
+            else:
+                depth_image = repair_depth(depth_stack[i], 5, 1.0)
+            result[i] = remover.zero_out_ground_smoothed(
+                depth_image,
+                params.row_angles_sines,
+                params.row_angles_cosines,
+                True,
+            )
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for _ in executor.map(process, range(len(depth_stack))):
+            pass
+
+    return result
@@ -0,0 +1,219 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# header: rows, cols, capacity, type code, number of frames written
+HEADER_SIZE = 5
+ALIGNMENT = 64
+
+
+class FrameRing:
+    """
+    Ring buffer of ``capacity`` images of ``(rows, cols)`` in shared
+    memory, written by one process and read by any number of processes
+    without copying or pickling.
+
+    Every slot has a sequence number (seqlock) which is odd while the
+    slot is written. A reader takes a view of a frame together with the
+    sequence number of its slot, and after using the view calls
+    ``check()`` to know whether the producer overwrote it meanwhile.
+
+    Producer:
+
+        ring = FrameRing.create(rows, cols, capacity=4)
+        with ring.writing() as frame:  # or ring.write(depth_image)
+            driver.read_into(frame)
+
+    Consumer, in another process:
+
+        ring = FrameRing.attach(name)
+        number, depth_image, seq = ring.read()
+        labels = compute_labels(depth_image, params, angle_threshold)
+        if not ring.check(number, seq):
+            ...  # overwritten while processing, drop the result
+
+    Label images can be sent back the same way through a ring of
+    ``get_label_dtype(rows, cols)`` written by the consumer.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        rows, cols, capacity, type_code = self._header[:4].tolist()
+        self.rows = rows
+        self.cols = cols
+        self.capacity = capacity
+        self.dtype = np.dtype(chr(type_code))
+
+        offset = HEADER_SIZE * 8
+        self._seqs = np.ndarray(
+            (capacity,), dtype=np.int64, buffer=shm.buf, offset=offset
+        )
+        offset += capacity * 8
+        self._numbers = np.ndarray(
+            (capacity,), dtype=np.int64, buffer=shm.buf, offset=offset
+        )
+        offset += capacity * 8
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        self._frames = np.ndarray(
+            (capacity, rows, cols), dtype=self.dtype, buffer=shm.buf, offset=offset
+        )
+
+    @staticmethod
+    def get_size(rows, cols, capacity, dtype):
+        offset = (HEADER_SIZE + 2 * capacity) * 8
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        return offset + capacity * rows * cols * np.dtype(dtype).itemsize
+
+    @classmethod
+    def create(cls, rows, cols, capacity=4, dtype=np.float32, name=None):
+        """
+        Allocate a new ring, owned by the calling process: ``close()``
+        also frees the shared memory.
+        """
+        shm = shared_memory.SharedMemory(
+            name=name, create=True, size=cls.get_size(rows, cols, capacity, dtype)
+        )
+        header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=shm.buf)
+        header[:] = (rows, cols, capacity, ord(np.dtype(dtype).char), 0)
+        del header
+        ring = cls(shm, owner=True)
+        ring._seqs[:] = 0
+        ring._numbers[:] = -1
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Open the ring ``name`` created by another process.
+        """
+        # only the creator frees the memory: keep the segment out of the
+        # resource tracker, which would unlink it when this process exits
+        # (bpo-39959)
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def num_written(self):
+        """
+        Number of frames written so far; the last one is
+        ``num_written - 1``.
+        """
+        return int(self._header[4])
+
+    @contextmanager
+    def writing(self):
+        """
+        Yield the view of the next slot to fill in place, and publish it as
+        the next frame when the block exits without an exception.
+        """
+        number = self.num_written
+        slot = number % self.capacity
+        self._seqs[slot] += 1
+        try:
+            yield self._frames[slot]
+        except BaseException:
+            # leave the slot marked as invalid
+            self._numbers[slot] = -1
+            self._seqs[slot] += 1
+            raise
+        self._numbers[slot] = number
+        self._seqs[slot] += 1
+        self._header[4] = number + 1
+
+    def write(self, image):
+        """
+        Copy ``image`` into the next slot and return its frame number.
+        """
+        with self.writing() as frame:
+            np.copyto(frame, image)
+        return self.num_written - 1
+
+    def read(self, number=None):
+        """
+        Return ``(number, view, seq)`` for the frame ``number``, by default
+        the last one written. ``view`` is valid as long as ``check(number,
+        seq)`` is true. Raises KeyError if the frame was not written yet,
+        is being written or was overwritten.
+        """
+        if number is None:
+            number = self.num_written - 1
+        slot = number % self.capacity
+        seq = int(self._seqs[slot])
+        if number < 0 or seq % 2 or self._numbers[slot] != number:
+            raise KeyError(number)
+        return number, self._frames[slot], seq
+
+    def check(self, number, seq):
+        """
+        Whether the frame ``number`` read with sequence number ``seq`` is
+        still in its slot.
+        """
+        slot = number % self.capacity
+        return self._seqs[slot] == seq and self._numbers[slot] == number
+
+    def wait(self, number, timeout=None, poll_interval=0.0005):
+        """
+        Wait until the frame ``number`` is written and return ``read(number)``.
+        Raises TimeoutError after ``timeout`` seconds.
+        """
+        start = time.perf_counter()
+        while self.num_written <= number:
+            if timeout is not None and time.perf_counter() - start > timeout:
+                raise TimeoutError(number)
+            time.sleep(poll_interval)
+        return self.read(number)
+
+    def close(self):
+        """
+        Release the views and detach; the owner also frees the memory.
+        """
+        del self._header, self._seqs, self._numbers, self._frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,136 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+from contextlib import contextmanager
+
+from numba.core.runtime import rtsys
+
+try:
+    from numba.core.runtime import _nrt_python
+except ImportError:  # pragma: no cover
+    _nrt_python = None
+
+
+def enable_allocation_stats():
+    """
+    Make Numba count the allocations of its runtime. Older Numba versions
+    always count them; newer ones only with ``NUMBA_NRT_STATS=1`` or after
+    this call.
+    """
+    enable = getattr(_nrt_python, "memsys_enable_stats", None)
+    if enable is not None:
+        enable()
+
+
+def count_allocations():
+    return rtsys.get_allocation_stats().alloc
+
+
+class Stats:
+    """
+    Wall time of the stages and counters of the calls given ``stats=``,
+    e.g. ``compute_labels(..., stats=stats)`` or
+    ``DepthGroundRemover.on_new_object_received(..., stats=stats)``.
+    Passing the same object to several calls adds them up.
+
+    times: seconds per stage name
+    counters: counter name -> value, the "..._max" counters keep the
+        largest value instead of the sum
+    allocations: arrays allocated by Numba code per stage name, filled
+        with ``track_allocations`` only (which enables the allocation
+        counters of Numba for the whole process)
+    calls: number of instrumented calls
+    callback: called with this object at the end of every instrumented
+        call, e.g. to forward the numbers to a logger and ``reset()``
+
+    Stages are only as fine as the code paths allow: the "fused" ground
+    engine and the regions of interest run as one kernel or one call and
+    are reported as a single "ground.fused" / "ground.roi" (or
+    "labels.parallel" / "labels.roi") stage, which does not tell whether
+    the time went to the smoothing or to the flood fill. Use the "bfs"
+    engine on the full image to see the individual stages.
+
+    Without ``stats`` the functions run the same code as before and do
+    not pay for any of this: the queue sizes are tracked by separate
+    instrumented labelers.
+    """
+
+    def __init__(self, track_allocations=False, callback=None):
+        self.track_allocations = track_allocations
+        self.callback = callback
+        if track_allocations:
+            enable_allocation_stats()
+        self.reset()
+
+    def reset(self):
+        self.times = {}
+        self.counters = {}
+        self.allocations = {}
+        self.calls = 0
+
+    @contextmanager
+    def stage(self, name):
+        if self.track_allocations:
+            allocations = count_allocations()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.times[name] = self.times.get(name, 0.0) + elapsed
+            if self.track_allocations:
+                self.allocations[name] = self.allocations.get(name, 0) + \
+                    count_allocations() - allocations
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def high_water(self, name, value):
+        self.counters[name] = max(self.counters.get(name, 0), int(value))
+
+    def finish(self):
+        self.calls += 1
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def total_time(self):
+        return sum(self.times.values())
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "times": dict(self.times),
+            "counters": dict(self.counters),
+            "allocations": dict(self.allocations),
+        }
+
+    def __repr__(self):
+        stages = ", ".join(
+            "{}={:.3f}ms".format(name, seconds * 1e3)
+            for name, seconds in self.times.items()
+        )
+        return "Stats(calls={}, {}, counters={})".format(
+            self.calls, stages, self.counters
+        )
@@ -0,0 +1,252 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+from numba import njit
+
+# longest run of one entry, longer runs are split
+MAX_RUN = np.iinfo(np.uint16).max
+
+
+@njit(nogil=True, cache=True)
+def find_seam(label_image):
+    """
+    Column at which the rows are cut for the encoding, 0 being the
+    border of the range image: the one splitting the fewest runs of the
+    clusters crossing it.
+    """
+    rows, cols = label_image.shape
+    best_col = 0
+    best_splits = rows + 1
+    for c in range(cols):
+        prev_c = c - 1 if c > 0 else cols - 1
+        splits = 0
+        for r in range(rows):
+            label = label_image[r, c]
+            if label != 0 and label == label_image[r, prev_c]:
+                splits += 1
+        if splits < best_splits:
+            best_col = c
+            best_splits = splits
+            if splits == 0:
+                break
+    return best_col
+
+
+@njit(nogil=True, cache=True)
+def encode_labels(label_image):
+    """
+    Run-length encode a label image in row-major order, every row starting
+    at column ``seam`` and going on across the last column, so that the
+    clusters crossing the border of the range image are not split. Runs
+    go on from one row to the next.
+
+    Returns ``(seam, values, lengths)``: the label of every run and its
+    length, runs longer than ``MAX_RUN`` being split.
+    """
+    rows, cols = label_image.shape
+    if rows == 0 or cols == 0:
+        return 0, np.empty(0, dtype=label_image.dtype), np.empty(0, dtype=np.uint16)
+    seam = find_seam(label_image)
+
+    num_runs = 0
+    current = label_image[0, seam]
+    length = 0
+    for r in range(rows):
+        c = seam
+        for _ in range(cols):
+            label = label_image[r, c]
+            if label != current or length == MAX_RUN:
+                num_runs += 1
+                current = label
+                length = 0
+            length += 1
+            c = c + 1 if c + 1 < cols else 0
+    num_runs += 1
+
+    values = np.empty(num_runs, dtype=label_image.dtype)
+    lengths = np.empty(num_runs, dtype=np.uint16)
+    i = 0
+    current = label_image[0, seam]
+    length = 0
+    for r in range(rows):
+        c = seam
+        for _ in range(cols):
+            label = label_image[r, c]
+            if label != current or length == MAX_RUN:
+                values[i] = current
+                lengths[i] = length
+                i += 1
+                current = label
+                length = 0
+            length += 1
+            c = c + 1 if c + 1 < cols else 0
+    values[i] = current
+    lengths[i] = length
+    return seam, values, lengths
+
+
+@njit(nogil=True, cache=True)
+def decode_labels_into(seam, values, lengths, label_image):
+    """
+    Inverse of ``encode_labels``, writing into the ``(rows, cols)``
+    ``label_image``.
+    """
+    rows, cols = label_image.shape
+    r = 0
+    c = seam
+    remaining = cols
+    for i in range(len(values)):
+        value = values[i]
+        for _ in range(lengths[i]):
+            label_image[r, c] = value
+            c = c + 1 if c + 1 < cols else 0
+            remaining -= 1
+            if remaining == 0:
+                r += 1
+                remaining = cols
+
+
+def decode_labels(seam, values, lengths, rows, cols):
+    label_image = np.empty((rows, cols), dtype=values.dtype)
+    decode_labels_into(seam, values, lengths, label_image)
+    return label_image
+
+
+# file: MAGIC, then per frame a RECORD header followed by the values and
+# the lengths of its runs, little-endian, compressed with zlib
+MAGIC = b"DCLBL001"
+# rows, cols, label type code, compressed, seam, number of runs, size of
+# the payload
+RECORD = struct.Struct("<II2sxxIII")
+
+
+class LabelArchiveWriter:
+    """
+    Append run-length encoded label images, e.g. of ``compute_labels`` or
+    ``filter_clusters``, to the file ``path``, one frame at a time.
+
+    compression: zlib level of the runs, 0 to store them as they are
+
+        with LabelArchiveWriter("labels.lbl") as writer:
+            for label_image in label_images:
+                writer.write(label_image)
+    """
+
+    def __init__(self, path, compression=1):
+        self.path = path
+        self.compression = compression
+        self.num_frames = 0
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+
+    def write(self, label_image):
+        seam, values, lengths = encode_labels(label_image)
+        payload = (
+            values.astype(values.dtype.newbyteorder("<"), copy=False).tobytes()
+            + lengths.astype("<u2", copy=False).tobytes()
+        )
+        if self.compression > 0:
+            payload = zlib.compress(payload, self.compression)
+        rows, cols = label_image.shape
+        self._file.write(RECORD.pack(
+            rows,
+            cols,
+            label_image.dtype.char.encode() + (b"z" if self.compression > 0 else b"-"),
+            seam,
+            len(values),
+            len(payload),
+        ))
+        self._file.write(payload)
+        self.num_frames += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LabelArchive:
+    """
+    Read the label images of a file written by ``LabelArchiveWriter``.
+    Opening it only reads the record headers; ``archive[i]`` decodes
+    frame ``i`` and iterating decodes the frames in order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offsets = []
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a label archive: {}".format(path))
+            while True:
+                offset = f.tell()
+                record = f.read(RECORD.size)
+                if len(record) < RECORD.size:
+                    break
+                payload_size = RECORD.unpack(record)[-1]
+                f.seek(payload_size, 1)
+                self._offsets.append(offset)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        with open(self.path, "rb") as f:
+            f.seek(self._offsets[index])
+            return self._read(f)
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            f.seek(len(MAGIC))
+            for _ in range(len(self)):
+                yield self._read(f)
+
+    @staticmethod
+    def _read(f):
+        rows, cols, codes, seam, num_runs, payload_size = RECORD.unpack(
+            f.read(RECORD.size)
+        )
+        payload = f.read(payload_size)
+        dtype = np.dtype(codes[:1].decode())
+        if codes[1:] == b"z":
+            payload = zlib.decompress(payload)
+        # the kernels take native byte order, which is a no-op on
+        # little-endian machines
+        values = np.frombuffer(
+            payload, dtype=dtype.newbyteorder("<"), count=num_runs
+        ).astype(dtype, copy=False)
+        lengths = np.frombuffer(
+            payload, dtype="<u2", count=num_runs, offset=num_runs * dtype.itemsize
+        ).astype(np.uint16, copy=False)
+        return decode_labels(seam, values, lengths, rows, cols)
@@ -22,7 +22,7 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import numpy as np
-from numba import float32, int32, uint16
+from numba import float32, int32, int64, uint16
 from numba.experimental import jitclass
 
 from .angle_diff import AngleDiffType
@@ -47,7 +47,12 @@ class PixelCoord:
         return self.row == other.row and self.col == other.col
 
 
-def create_jitclass_labeler(diff_helper_type):
+def create_jitclass_labeler(diff_helper_type, track_queue=False):
+    """
+    track_queue: keep the largest number of coordinates queued by
+        label_one_component in ``max_queue_size``. The labelers without it
+        do not have the field and pay nothing for it.
+    """
 
     spec = [
         ("rows", uint16),
@@ -55,6 +60,8 @@ def create_jitclass_labeler(diff_helper_type):
         ("angle_threshold", float32),
         ("diff_helper", diff_helper_type),
     ]
+    if track_queue:
+        spec.append(("max_queue_size", int64))
 
     @jitclass(spec)
     class JittedLinearImageLabeler:
@@ -64,10 +71,12 @@ def create_jitclass_labeler(diff_helper_type):
             self.cols = cols
             self.angle_threshold = angle_threshold
             self.diff_helper = diff_helper
+            if track_queue:
+                self.max_queue_size = 0
 
-        def compute_labels(self, depth_image):
+        def compute_labels(self, depth_image, label_dtype=np.uint16):
 
-            label_image = np.zeros((self.rows, self.cols), dtype=np.uint16)
+            label_image = np.zeros((self.rows, self.cols), dtype=label_dtype)
 
             label = 1
             for row in range(self.rows):
@@ -127,6 +136,9 @@ def create_jitclass_labeler(diff_helper_type):
                     if self.diff_helper.satisfies_threshold(
                             diff, self.angle_threshold):
                         labeling_queue.append(neighbor)
+                        if track_queue and \
+                                len(labeling_queue) > self.max_queue_size:
+                            self.max_queue_size = len(labeling_queue)
 
     return JittedLinearImageLabeler
 
@@ -135,3 +147,11 @@ AngleDiffLinearImageLabeler = create_jitclass_labeler(AngleDiffType)
 LinearImageLabeler = AngleDiffLinearImageLabeler
 
 SimpleDiffLinearImageLabeler = create_jitclass_labeler(SimpleDiffType)
+
+# for the instrumented code paths only, see Stats
+InstrumentedLinearImageLabeler = create_jitclass_labeler(
+    AngleDiffType, track_queue=True
+)
+InstrumentedSimpleDiffLinearImageLabeler = create_jitclass_labeler(
+    SimpleDiffType, track_queue=True
+)
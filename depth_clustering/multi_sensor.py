@@ -0,0 +1,217 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import radians
+
+import numpy as np
+from numba import njit
+
+from .clusterer import SegmentedPointCloud, segment_points
+from .pipeline import ClusteringPipeline
+from .utils import spherical_to_cartesian_into
+
+
+@njit(nogil=True, cache=True)
+def transform_points(points, extrinsics):
+    """
+    Apply the 4x4 homogeneous transform ``extrinsics`` to the ``(N, 3)``
+    ``points`` in place.
+    """
+    for i in range(points.shape[0]):
+        x = points[i, 0]
+        y = points[i, 1]
+        z = points[i, 2]
+        for d in range(3):
+            points[i, d] = (
+                extrinsics[d, 0] * x
+                + extrinsics[d, 1] * y
+                + extrinsics[d, 2] * z
+                + extrinsics[d, 3]
+            )
+
+
+class MultiSensorFrame:
+    """
+    Result of ``MultiSensorExecutor.process`` for one frame of every sensor.
+
+    no_ground_images, label_images: per sensor name, views into the
+        buffers of the sensor's pipeline, valid until the next frame
+    clusters: ``SegmentedPointCloud`` of the clusters of all sensors in the
+        vehicle frame. The labels of a sensor are shifted by the largest
+        label of the sensors before it, so they are unique.
+    cluster_sensors: index in ``sensor_names`` of the sensor of every
+        cluster
+    latencies: per sensor name, seconds from the submission of the frame
+        to the end of its processing
+    """
+
+    def __init__(
+        self,
+        sensor_names,
+        no_ground_images,
+        label_images,
+        clusters,
+        cluster_sensors,
+        latencies,
+    ):
+        self.sensor_names = sensor_names
+        self.no_ground_images = no_ground_images
+        self.label_images = label_images
+        self.clusters = clusters
+        self.cluster_sensors = cluster_sensors
+        self.latencies = latencies
+
+
+class MultiSensorExecutor:
+    """
+    Ground removal, labeling and point cloud conversion for several sensors
+    of a vehicle, one ``ClusteringPipeline`` per sensor, the sensors being
+    processed concurrently on a thread pool. The Numba kernels release the
+    GIL, so the sensors run in parallel. The clusters are merged into the
+    vehicle frame.
+
+    sensors: mapping from sensor name to ``(params, extrinsics)``, the 4x4
+        homogeneous transform from the sensor to the vehicle frame
+    num_workers: threads of the pool, by default one per sensor
+
+    The other arguments are those of ``ClusteringPipeline``.
+
+        with MultiSensorExecutor(sensors, radians(10)) as executor:
+            frame = executor.process({"front": depth_front, "rear": depth_rear})
+            frame.clusters, frame.latencies
+    """
+
+    def __init__(
+        self,
+        sensors,
+        angle_threshold,
+        window_size=5,
+        ground_remove_angle=radians(5.0),
+        ground_engine="bfs",
+        repair_mode="legacy",
+        num_workers=None,
+    ):
+        self.sensor_names = list(sensors)
+        self._extrinsics = {}
+        self._pc_images = {}
+        self._pipelines = {}
+        for name, (params, extrinsics) in sensors.items():
+            extrinsics = np.asarray(extrinsics, dtype=np.float64)
+            if extrinsics.shape != (4, 4):
+                raise ValueError("extrinsics of {} are not 4x4".format(name))
+            self._extrinsics[name] = extrinsics
+            self._pc_images[name] = np.zeros(
+                (params.rows, params.cols, 3), dtype=np.float32
+            )
+            self._pipelines[name] = ClusteringPipeline(
+                params,
+                angle_threshold,
+                window_size,
+                ground_remove_angle,
+                ground_engine,
+                repair_mode,
+            )
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_workers or len(self.sensor_names)
+        )
+
+    def process(self, depth_images):
+        """
+        Process one frame of every sensor.
+
+        depth_images: mapping from sensor name to depth image, all sensors
+            must be present
+        """
+        start = time.perf_counter()
+        futures = [
+            self._executor.submit(self._process_sensor, name, depth_images[name], start)
+            for name in self.sensor_names
+        ]
+        results = [future.result() for future in futures]
+
+        no_ground_images = {}
+        label_images = {}
+        latencies = {}
+        labels = []
+        offsets = [np.zeros(1, dtype=np.int64)]
+        points = []
+        cluster_sensors = []
+        label_offset = 0
+        point_offset = 0
+        for i, (name, result) in enumerate(zip(self.sensor_names, results)):
+            no_ground_image, label_image, segmented, latency = result
+            no_ground_images[name] = no_ground_image
+            label_images[name] = label_image
+            latencies[name] = latency
+
+            labels.append(segmented.labels.astype(np.int64) + label_offset)
+            offsets.append(segmented.offsets[1:] + point_offset)
+            points.append(segmented.points)
+            cluster_sensors.append(np.full(len(segmented), i, dtype=np.int64))
+            if len(segmented) > 0:
+                label_offset += int(segmented.labels[-1])
+            point_offset += len(segmented.points)
+
+        clusters = SegmentedPointCloud(
+            np.concatenate(labels), np.concatenate(offsets), np.concatenate(points)
+        )
+        return MultiSensorFrame(
+            self.sensor_names,
+            no_ground_images,
+            label_images,
+            clusters,
+            np.concatenate(cluster_sensors),
+            latencies,
+        )
+
+    def close(self):
+        self._executor.shutdown()
+        for pipeline in self._pipelines.values():
+            pipeline.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _process_sensor(self, name, depth_image, start):
+        pipeline = self._pipelines[name]
+        params = pipeline.params
+        pc_image = self._pc_images[name]
+        # already on a thread of the pool, no hop to the pipeline's worker
+        no_ground_image, label_image = pipeline.process_inline(depth_image)
+        spherical_to_cartesian_into(
+            no_ground_image,
+            params.row_angles_sines,
+            params.row_angles_cosines,
+            params.col_angles_sines,
+            params.col_angles_cosines,
+            pc_image,
+            label_image,
+        )
+        segmented = SegmentedPointCloud(*segment_points(label_image, pc_image))
+        transform_points(segmented.points, self._extrinsics[name])
+        return no_ground_image, label_image, segmented, time.perf_counter() - start
@@ -0,0 +1,286 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from math import radians
+
+import cv2
+import numpy as np
+
+from .clusterer import get_label_dtype
+from .depth_ground_remover import (
+    BLOCK_COLUMNS,
+    DepthGroundRemover,
+    compute_angle_image_into,
+    remove_ground_fused_into,
+    repair_depth_linear_columns,
+    repair_depth_in_place,
+    zero_out_ground_into,
+)
+from .union_find_labeler import label_frame_into
+
+
+class Workspace:
+    """
+    Preallocated buffers for one frame in flight.
+    """
+
+    def __init__(self, rows, cols):
+        self.raw_depth_image = np.zeros((rows, cols), dtype=np.float32)
+        self.depth_image = np.zeros((rows, cols), dtype=np.float32)
+        self.angle_image = np.zeros((rows, cols), dtype=np.float32)
+        self.angle_block = np.zeros((rows, BLOCK_COLUMNS), dtype=np.float32)
+        self.smoothed_image = np.zeros((rows, cols), dtype=np.float32)
+        self.ground_labels = np.zeros((rows, cols), dtype=np.uint8)
+        self.horizontal = np.zeros((rows, cols), dtype=np.uint8)
+        self.dilated = np.zeros((rows, cols), dtype=np.uint8)
+        self.stack = np.zeros(rows * cols, dtype=np.int64)
+        self.no_ground_image = np.zeros((rows, cols), dtype=np.float32)
+
+        self.parent = np.zeros(rows * cols, dtype=np.int64)
+        self.root_labels = np.zeros(rows * cols, dtype=np.int64)
+        self.label_image = np.zeros(
+            (rows, cols), dtype=get_label_dtype(rows, cols)
+        )
+
+
+class ClusteringPipeline:
+    """
+    Ground removal followed by labeling for a stream of frames of one
+    sensor, without allocating arrays per frame.
+
+    Two workspaces are used in turn: while the ground of frame k + 1 is
+    removed on a worker thread, frame k is labeled on the calling thread.
+    The results are the same as ``DepthGroundRemover.on_new_object_received``
+    followed by ``compute_labels``.
+
+    ground_engine, repair_mode: see ``DepthGroundRemover``; the "fused"
+        engine runs on the worker thread only
+
+    The returned arrays are views into the workspaces. They are valid until
+    the next call to ``feed()`` / the next iteration of ``run()``; copy
+    them to keep them longer.
+
+    Frames can be pushed from a driver callback:
+
+        pipeline = ClusteringPipeline(params, angle_threshold=radians(10))
+
+        def on_frame(depth_image):
+            result = pipeline.feed(depth_image)
+            if result is not None:
+                no_ground_image, label_image = result
+                ...
+
+    or pulled from an iterable:
+
+        for no_ground_image, label_image in pipeline.run(frames):
+            ...
+    """
+
+    def __init__(
+        self,
+        params,
+        angle_threshold,
+        window_size=5,
+        ground_remove_angle=radians(5.0),
+        ground_engine="bfs",
+        repair_mode="legacy",
+    ):
+        if ground_engine not in ("bfs", "fused"):
+            raise ValueError("unknown engine: {}".format(ground_engine))
+        if repair_mode not in ("linear", "legacy"):
+            raise ValueError("unknown repair mode: {}".format(repair_mode))
+        self.params = params
+        self.angle_threshold = angle_threshold
+        self.window_size = window_size
+        self.ground_remove_angle = ground_remove_angle
+        self.ground_engine = ground_engine
+        self.repair_mode = repair_mode
+
+        self._kernel = DepthGroundRemover(
+            params, window_size, ground_remove_angle
+        ).get_savitsky_golay_kernel(window_size)
+        self._workspaces = [
+            Workspace(params.rows, params.cols),
+            Workspace(params.rows, params.cols),
+        ]
+        self._next = 0
+        self._pending = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def feed(self, depth_image):
+        """
+        Start processing ``depth_image`` and return
+        ``(no_ground_image, label_image)`` of the previous frame, or None
+        for the first frame.
+        """
+        workspace = self._load(depth_image)
+        future = self._executor.submit(self._remove_ground, workspace)
+
+        result = None
+        try:
+            if self._pending is not None:
+                result = self._finish(*self._pending)
+        finally:
+            # a frame which failed is dropped, not left pending
+            self._pending = (future, workspace)
+        return result
+
+    def flush(self):
+        """
+        Return the result of the last frame passed to ``feed()``, or None if
+        there is none.
+        """
+        if self._pending is None:
+            return None
+        try:
+            return self._finish(*self._pending)
+        finally:
+            self._pending = None
+
+    def run(self, frames):
+        """
+        Yield ``(no_ground_image, label_image)`` for every frame of
+        ``frames``.
+        """
+        for depth_image in frames:
+            result = self.feed(depth_image)
+            if result is not None:
+                yield result
+        result = self.flush()
+        if result is not None:
+            yield result
+
+    def process(self, depth_image):
+        """
+        Process a single frame synchronously. Raises RuntimeError if a frame
+        passed to ``feed()`` is still pending: ``flush()`` it first, as its
+        result would be lost.
+        """
+        if self._pending is not None:
+            raise RuntimeError("a frame passed to feed() is pending, flush() it first")
+        self.feed(depth_image)
+        return self.flush()
+
+    def process_inline(self, depth_image):
+        """
+        ``process()`` running every step on the calling thread instead of
+        handing the ground removal to the worker thread, for callers which
+        already run on a thread of their own. Raises RuntimeError if a
+        frame passed to ``feed()`` is pending.
+        """
+        if self._pending is not None:
+            raise RuntimeError("a frame passed to feed() is pending, flush() it first")
+        workspace = self._load(depth_image)
+        self._remove_ground(workspace)
+        return self._label(workspace)
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load(self, depth_image):
+        workspace = self._workspaces[self._next]
+        self._next = 1 - self._next
+        if self.ground_engine == "fused":
+            np.copyto(workspace.raw_depth_image, depth_image)
+        else:
+            # repaired in place
+            np.copyto(workspace.depth_image, depth_image)
+        return workspace
+
+    def _remove_ground(self, workspace):
+        if self.ground_engine == "fused":
+            remove_ground_fused_into(
+                workspace.raw_depth_image,
+                self.params.row_angles_sines,
+                self.params.row_angles_cosines,
+                self._kernel[:, 0],
+                self.ground_remove_angle,
+                self.window_size,
+                self.repair_mode == "linear",
+                workspace.depth_image,
+                workspace.angle_block,
+                workspace.smoothed_image,
+                workspace.ground_labels,
+                workspace.stack,
+                workspace.horizontal,
+                workspace.no_ground_image,
+            )
+            return
+
+        if self.repair_mode == "linear":
+            repair_depth_linear_columns(
+                workspace.depth_image, 5, 1.0, 0, self.params.cols
+            )
+        else:
+            repair_depth_in_place(
+                workspace.depth_image, np.uint8(5), np.float32(1.0)
+            )
+        compute_angle_image_into(
+            workspace.depth_image,
+            self.params.row_angles_sines,
+            self.params.row_angles_cosines,
+            workspace.angle_image,
+        )
+        cv2.filter2D(
+            workspace.angle_image,
+            -1,
+            self._kernel,
+            dst=workspace.smoothed_image,
+            borderType=cv2.BORDER_REFLECT101,
+        )
+        zero_out_ground_into(
+            workspace.depth_image,
+            workspace.smoothed_image,
+            self.ground_remove_angle,
+            self.window_size,
+            workspace.ground_labels,
+            workspace.stack,
+            workspace.horizontal,
+            workspace.dilated,
+            workspace.no_ground_image,
+        )
+
+    def _finish(self, future, workspace):
+        future.result()
+        return self._label(workspace)
+
+    def _label(self, workspace):
+        label_frame_into(
+            workspace.no_ground_image,
+            self.params.row_alphas_sines,
+            self.params.row_alphas_cosines,
+            self.params.col_alphas_sines,
+            self.params.col_alphas_cosines,
+            self.angle_threshold,
+            workspace.parent,
+            workspace.root_labels,
+            workspace.label_image,
+        )
+        return workspace.no_ground_image, workspace.label_image
@@ -22,7 +22,7 @@ DEALINGS IN THE SOFTWARE.
 """
 
 import numpy as np
-from numba import deferred_type, float32, int32
+from numba import deferred_type, float32, int32, njit
 from numba.experimental import jitclass
 
 
@@ -49,35 +49,200 @@ SpanParamsType = deferred_type()
 SpanParamsType.define(SpanParams.class_type.instance_type)
 
 
+@njit(cache=True)
+def fill_alphas(angles):
+    result = np.zeros(len(angles), dtype=np.float32)
+    for i in range(len(angles) - 1):
+        result[i] = np.fabs(angles[i + 1] - angles[i])
+    return result
+
+
+@njit(cache=True)
+def fill_sines_cosines(angles):
+    sines = np.empty(len(angles), dtype=np.float32)
+    cosines = np.empty(len(angles), dtype=np.float32)
+    for i in range(len(angles)):
+        sines[i] = np.sin(angles[i])
+        cosines[i] = np.cos(angles[i])
+    return sines, cosines
+
+
+@njit(cache=True)
+def fill_lookup(sorted_angles):
+    """
+    Table mapping equally sized angle bins to the index of the sorted
+    angle closest to the lower end of the bin. The table covers the
+    sorted angles plus half a gap on both sides.
+    """
+    n = len(sorted_angles)
+    if n > 1:
+        gaps = sorted_angles[1:] - sorted_angles[:-1]
+        min_gap = max(gaps.min(), 1e-6)
+        start = sorted_angles[0] - gaps[0] / 2
+        stop = sorted_angles[-1] + gaps[-1] / 2
+    else:
+        min_gap = 1e-6
+        start = sorted_angles[0] - min_gap
+        stop = sorted_angles[0] + min_gap
+
+    size = max(int(np.ceil((stop - start) / (min_gap / 2))), 1)
+    step = (stop - start) / size
+    lookup = np.empty(size, dtype=np.int32)
+    k = 0
+    for i in range(size):
+        angle = start + i * step
+        while k + 1 < n and abs(angle - sorted_angles[k + 1]) <= \
+                abs(angle - sorted_angles[k]):
+            k += 1
+        lookup[i] = k
+    return np.float32(start), np.float32(step), lookup
+
+
+@njit(cache=True)
+def fill_angles(start_angle, step, num_beams):
+    result = np.empty(num_beams, dtype=np.float32)
+    rad = start_angle
+    for i in range(num_beams):
+        result[i] = rad
+        rad += step
+    return result
+
+
+@njit(cache=True)
+def fill_row_alphas(row_angles):
+    """
+    Angles between neighboring rows, used by AngleDiff.
+    """
+    return fill_alphas(row_angles)
+
+
+@njit(cache=True)
+def fill_col_alphas(col_angles, h_span):
+    """
+    Angles between neighboring columns, used by AngleDiff. The last column
+    alpha is the one between the last and the first column (WrapCols).
+    """
+    col_alphas = fill_alphas(col_angles)
+    last_alpha = np.fabs(col_angles[0] - col_angles[-1])
+    last_alpha -= h_span
+    col_alphas[-1] = last_alpha
+    return col_alphas
+
+
+@njit(cache=True)
+def fill_col_tables(start_angle, step, num_beams, h_span):
+    col_angles = fill_angles(start_angle, step, num_beams)
+    col_alphas_sines, col_alphas_cosines = \
+        fill_sines_cosines(fill_col_alphas(col_angles, h_span))
+    return (
+        col_angles,
+        np.sin(col_angles),
+        np.cos(col_angles),
+        col_alphas_sines,
+        col_alphas_cosines,
+    )
+
+
+@njit(cache=True)
+def fill_row_tables(row_angles):
+    row_alphas_sines, row_alphas_cosines = \
+        fill_sines_cosines(fill_row_alphas(row_angles))
+    return (
+        row_angles,
+        np.sin(row_angles),
+        np.cos(row_angles),
+        row_alphas_sines,
+        row_alphas_cosines,
+    )
+
+
+@njit(cache=True)
+def fill_row_lookup(row_angles):
+    """
+    Tables of ``row_from_angle``: the start and the step of the angle bins,
+    the index of the sorted row angle of every bin, the sorted row angles
+    and the rows they belong to.
+    """
+    sorted_rows = np.argsort(row_angles).astype(np.int32)
+    sorted_row_angles = row_angles[sorted_rows]
+    lookup_start, lookup_step, lookup = fill_lookup(sorted_row_angles)
+    return lookup_start, lookup_step, lookup, sorted_row_angles, sorted_rows
+
+
+@njit(nogil=True, cache=True)
+def row_from_angle(
+    angle, lookup_start, lookup_step, lookup, sorted_row_angles, sorted_rows
+):
+    """
+    Index of the row closest to ``angle``, or -1 if it is outside of the
+    vertical field of view, in O(1) with the tables of ``fill_row_lookup``.
+    """
+    n = len(sorted_row_angles)
+    i = int(np.floor((angle - lookup_start) / lookup_step))
+    if i < 0 or i >= len(lookup):
+        return -1
+
+    # the bins are narrower than the gaps between rows, so the closest
+    # row is either the one of the bin or the next one
+    k = lookup[i]
+    if k + 1 < n and abs(angle - sorted_row_angles[k + 1]) < \
+            abs(angle - sorted_row_angles[k]):
+        k += 1
+    return sorted_rows[k]
+
+
+# Only the tables used by the kernels are fields: every field makes the
+# class, which is compiled in every process, slower to build. The others
+# are built from these by the cached functions above.
 @jitclass(
     [
         ("h_span_params", SpanParamsType),
         ("v_span_params", SpanParamsType),
         ("col_angles", float32[:]),
+        ("col_angles_sines", float32[:]),
+        ("col_angles_cosines", float32[:]),
         ("row_angles", float32[:]),
         ("row_angles_sines", float32[:]),
         ("row_angles_cosines", float32[:]),
+        ("row_alphas_sines", float32[:]),
+        ("row_alphas_cosines", float32[:]),
+        ("col_alphas_sines", float32[:]),
+        ("col_alphas_cosines", float32[:]),
     ]
 )
 class ProjectionParams:
     def __init__(self, h_span_params, v_span_params):
         """
-        FIXME:
-
-        The original implementation accepts an array of span_param.
-        Velodyne Lidars don't scan at equally spaced angles to the
-        vertical, so we should fix this code to ensure it does.
-        Dolphin Lidars are basically implemented as if it scans at
-        equally spaced angles to the vertical.
+        The rows are equally spaced over ``v_span_params``. Velodyne and
+        Ouster Lidars don't scan at equally spaced angles to the vertical;
+        use ``create_projection_params_from_row_angles`` for those.
         """
         self.h_span_params = h_span_params
-        self.col_angles = self.fill_vector(h_span_params)
+        (
+            self.col_angles,
+            self.col_angles_sines,
+            self.col_angles_cosines,
+            self.col_alphas_sines,
+            self.col_alphas_cosines,
+        ) = fill_col_tables(
+            h_span_params.start_angle,
+            h_span_params.step,
+            h_span_params.num_beams,
+            h_span_params.span,
+        )
 
         self.v_span_params = v_span_params
-        self.row_angles = self.fill_vector(v_span_params)
-
-        self.row_angles_sines = np.sin(self.row_angles)
-        self.row_angles_cosines = np.cos(self.row_angles)
+        (
+            self.row_angles,
+            self.row_angles_sines,
+            self.row_angles_cosines,
+            self.row_alphas_sines,
+            self.row_alphas_cosines,
+        ) = fill_row_tables(fill_angles(
+            v_span_params.start_angle,
+            v_span_params.step,
+            v_span_params.num_beams,
+        ))
 
     @property
     def size(self):
@@ -113,15 +278,76 @@ class ProjectionParams:
             c -= len(self.col_angles)
         return self.col_angles[c]
 
+    def row_from_angle(self, angle):
+        """
+        Index of the row closest to ``angle``, or -1 if it is outside of
+        the vertical field of view. Builds the tables of
+        ``fill_row_lookup`` on every call; for many angles, build them once
+        and call the ``row_from_angle`` function.
+        """
+        return row_from_angle(angle, *fill_row_lookup(self.row_angles))
+
+    def col_from_angle(self, angle):
+        """
+        Index of the column closest to ``angle``, or -1 if it is outside of
+        the horizontal field of view. Angles wrap around for 360° sensors.
+        """
+        wrap = self.h_span >= 2 * np.pi - abs(self.h_span_params.step)
+        return self.index_from_angle(self.h_span_params, angle, wrap)
+
+    @staticmethod
+    def index_from_angle(span_params, angle, wrap):
+        index = int(np.floor(
+            (angle - span_params.start_angle) / span_params.step + 0.5
+        ))
+        if wrap:
+            return index % span_params.num_beams
+        if index < 0 or index >= span_params.num_beams:
+            return -1
+        return index
+
     @staticmethod
     def fill_vector(span_params):
-        result = np.empty(span_params.num_beams, dtype=np.float32)
-        rad = span_params.start_angle
-        for i in range(span_params.num_beams):
-            result[i] = rad
-            rad += span_params.step
-        return result
+        return fill_angles(
+            span_params.start_angle, span_params.step, span_params.num_beams
+        )
 
 
 ProjectionParamsType = deferred_type()
 ProjectionParamsType.define(ProjectionParams.class_type.instance_type)
+
+
+def create_projection_params_from_row_angles(h_span_params, row_angles):
+    """
+    ProjectionParams for sensors whose beams are not equally spaced to the
+    vertical, e.g. with ``row_angles`` read from a calibration file.
+
+    row_angles: elevation of every row in radians, in the row order of
+        the range images
+    """
+    row_angles = np.asarray(row_angles, dtype=np.float32)
+    num_beams = len(row_angles)
+    if num_beams > 1:
+        step = (row_angles[-1] - row_angles[0]) / (num_beams - 1)
+    else:
+        step = 0.0
+    v_span_params = SpanParams(
+        row_angles[0], row_angles[0] + step * num_beams, num_beams
+    )
+    params = ProjectionParams(h_span_params, v_span_params)
+    set_row_angles(params, row_angles)
+    return params
+
+
+def set_row_angles(params, row_angles):
+    """
+    Replace the elevation of every row of ``params``, and all tables
+    derived from them. ``v_span_params`` is not updated.
+    """
+    (
+        params.row_angles,
+        params.row_angles_sines,
+        params.row_angles_cosines,
+        params.row_alphas_sines,
+        params.row_alphas_cosines,
+    ) = fill_row_tables(np.asarray(row_angles, dtype=np.float32))
@@ -0,0 +1,208 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+import cv2
+import numpy as np
+
+from .projections import SpanParams, create_projection_params_from_row_angles
+
+# file layout: MAGIC, offset of the frames as uint64, JSON header padded
+# with spaces up to the frames
+MAGIC = b"DCREC001"
+# the frames start at a multiple of this, e.g. a page
+ALIGNMENT = 4096
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a recording: {}".format(path))
+        offset = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(offset - len(MAGIC) - 8).decode("utf-8"))
+    header["offset"] = offset
+    return header
+
+
+class RecordingWriter:
+    """
+    Write a sequence of depth images of one sensor to ``path``: a header
+    holding the ``ProjectionParams`` followed by the frames, one after the
+    other, so that ``Recording`` can memory map them.
+
+    dtype: type of the stored pixels. ``np.uint16`` halves the size of
+        float32 frames.
+    depth_scale: stored value per meter, e.g. 500 for the PNG images of
+        the original implementation
+
+        with RecordingWriter("scans.rec", params) as writer:
+            for depth_image in frames:
+                writer.write(depth_image)
+    """
+
+    def __init__(self, path, params, dtype=np.float32, depth_scale=1.0):
+        self.path = path
+        self.rows = params.rows
+        self.cols = params.cols
+        self.dtype = np.dtype(dtype)
+        self.depth_scale = depth_scale
+        self.num_frames = 0
+        self._header = {
+            "rows": self.rows,
+            "cols": self.cols,
+            "dtype": self.dtype.str,
+            "depth_scale": depth_scale,
+            "h_span": [
+                float(params.h_span_params.start_angle),
+                float(params.h_span_params.end_angle),
+                int(params.h_span_params.num_beams),
+            ],
+            "row_angles": [float(angle) for angle in params.row_angles],
+            # room for the final number of frames
+            "num_frames": 10**18,
+        }
+        size = len(MAGIC) + 8 + len(json.dumps(self._header))
+        self._offset = -(-size // ALIGNMENT) * ALIGNMENT
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        self._header["num_frames"] = self.num_frames
+        header = json.dumps(self._header).encode("utf-8")
+        self._file.seek(0)
+        self._file.write(MAGIC)
+        self._file.write(self._offset.to_bytes(8, "little"))
+        self._file.write(header.ljust(self._offset - len(MAGIC) - 8, b" "))
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, depth_image):
+        """
+        Append a ``(rows, cols)`` depth image in meters, or already in the
+        stored type and units when it has the stored type.
+        """
+        if depth_image.shape != (self.rows, self.cols):
+            raise ValueError(
+                "frame of shape {} for a recording of {}x{}".format(
+                    depth_image.shape, self.rows, self.cols
+                )
+            )
+        if depth_image.dtype != self.dtype:
+            depth_image = depth_image * self.depth_scale
+            if self.dtype.kind in "ui":
+                info = np.iinfo(self.dtype)
+                depth_image = np.clip(np.rint(depth_image), info.min, info.max)
+        self._file.write(np.ascontiguousarray(depth_image, dtype=self.dtype).tobytes())
+        self.num_frames += 1
+
+    def close(self):
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Recording:
+    """
+    Random access to the frames of a file written by ``RecordingWriter``
+    through ``np.memmap``: only the frames which are used are read.
+
+    recording[i]: frame ``i`` as a float32 depth image in meters
+    recording.frames: ``(num_frames, rows, cols)`` memory map of the
+        stored pixels
+    """
+
+    def __init__(self, path):
+        self.path = path
+        header = read_header(path)
+        self.rows = header["rows"]
+        self.cols = header["cols"]
+        self.depth_scale = header["depth_scale"]
+        dtype = np.dtype(header["dtype"])
+        shape = (header["num_frames"], self.rows, self.cols)
+        if header["num_frames"] == 0:
+            # an empty file region cannot be mapped
+            self.frames = np.zeros(shape, dtype=dtype)
+        else:
+            self.frames = np.memmap(
+                path, dtype=dtype, mode="r", offset=header["offset"], shape=shape
+            )
+        self._header = header
+
+    @property
+    def params(self):
+        start_angle, end_angle, num_beams = self._header["h_span"]
+        return create_projection_params_from_row_angles(
+            SpanParams(start_angle, end_angle, num_beams),
+            np.array(self._header["row_angles"], dtype=np.float32),
+        )
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        frame = self.frames[index]
+        if frame.dtype == np.float32 and self.depth_scale == 1.0:
+            return np.array(frame)
+        return (frame / self.depth_scale).astype(np.float32)
+
+    def replay(self, start=0, stop=None, prefetch=2):
+        """
+        Yield the frames ``start`` to ``stop`` as float32 depth images in
+        meters, reading and converting the next ``prefetch`` frames on a
+        worker thread while the current one is processed.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = deque()
+            next_index = start
+            while pending or next_index < stop:
+                while next_index < stop and len(pending) <= prefetch:
+                    pending.append(executor.submit(self.__getitem__, next_index))
+                    next_index += 1
+                yield pending.popleft().result()
+
+
+def convert_png_folder(folder, path, params, depth_scale=500.0, pattern="*.png"):
+    """
+    Convert the 16 bit PNG range images of ``folder`` matching ``pattern``,
+    in file name order, to a recording at ``path``. The pixel values are
+    kept as they are, ``depth_scale`` per meter (500 for the scans of the
+    original implementation). Returns the number of frames.
+    """
+    filenames = sorted(glob(os.path.join(folder, pattern)))
+    with RecordingWriter(path, params, np.uint16, depth_scale) as writer:
+        for filename in filenames:
+            image = cv2.imread(filename, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                raise ValueError("cannot read {}".format(filename))
+            writer.write(image.astype(np.uint16))
+    return len(filenames)
@@ -0,0 +1,177 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+
+
+class RegionOfInterest:
+    """
+    The part of the range images to process: the rows ``row_start`` to
+    ``row_stop`` of ``num_cols`` columns starting at ``col_start``, going
+    on from column 0 after the last column. ``mask`` optionally restricts
+    the window further to its non-zero pixels.
+
+    The labeling and the ground removal only look at the window, so their
+    cost scales with its size. Pixels on both sides of the last / first
+    column are only neighbors when the window spans all the columns.
+    """
+
+    def __init__(
+        self,
+        rows,
+        cols,
+        row_start=0,
+        row_stop=None,
+        col_start=0,
+        num_cols=None,
+        mask=None,
+    ):
+        if row_stop is None:
+            row_stop = rows
+        if num_cols is None:
+            num_cols = cols
+        if not 0 <= row_start < row_stop <= rows:
+            raise ValueError("invalid row window: {}:{}".format(row_start, row_stop))
+        if not 0 < num_cols <= cols:
+            raise ValueError("invalid number of columns: {}".format(num_cols))
+        self.rows = rows
+        self.cols = cols
+        self.row_start = row_start
+        self.row_stop = row_stop
+        self.col_indices = (col_start + np.arange(num_cols)) % cols
+        self.wrap = num_cols == cols
+        if mask is not None:
+            mask = np.asarray(mask)[row_start:row_stop, self.col_indices] != 0
+        self.mask = mask
+
+    @classmethod
+    def from_angles(cls, params, azimuth=None, elevation=None):
+        """
+        Window of the pixels with an azimuth from ``azimuth[0]`` to
+        ``azimuth[1]``, going across the last column if ``azimuth[0]`` is
+        the larger one, and an elevation between ``elevation[0]`` and
+        ``elevation[1]``, in radians. ``None`` means all the columns / rows,
+        as does an azimuth window covering the full circle, e.g. from -pi
+        to pi.
+        """
+        row_start = 0
+        row_stop = params.rows
+        if elevation is not None:
+            low, high = sorted(elevation)
+            inside = np.flatnonzero(
+                (params.row_angles >= low) & (params.row_angles <= high)
+            )
+            if len(inside) == 0:
+                raise ValueError("no row in elevation window {}".format(elevation))
+            row_start = inside[0]
+            row_stop = inside[-1] + 1
+
+        col_start = 0
+        num_cols = params.cols
+        if azimuth is not None and not cls.is_full_circle(params, azimuth):
+            col_start = params.col_from_angle(azimuth[0])
+            col_stop = params.col_from_angle(azimuth[1])
+            if col_start < 0 or col_stop < 0:
+                raise ValueError("azimuth window outside of the field of view")
+            num_cols = (col_stop - col_start) % params.cols + 1
+        return cls(params.rows, params.cols, row_start, row_stop, col_start, num_cols)
+
+    @staticmethod
+    def is_full_circle(params, azimuth):
+        """
+        Whether going from ``azimuth[0]`` to ``azimuth[1]`` covers all the
+        columns of a sensor spanning the full circle, up to one column.
+        """
+        step = abs(params.h_span_params.step)
+        if params.h_span < 2 * np.pi - step:
+            return False
+        span = azimuth[1] - azimuth[0]
+        if span < 0:
+            span += 2 * np.pi
+        return span >= 2 * np.pi - step
+
+    @classmethod
+    def from_mask(cls, mask):
+        """
+        Smallest window containing the non-zero pixels of the
+        ``(rows, cols)`` array ``mask``, restricted to them. The window
+        goes across the last column when that makes it narrower.
+        """
+        mask = np.asarray(mask)
+        rows, cols = mask.shape
+        used_rows = np.flatnonzero(mask.any(axis=1))
+        used_cols = np.flatnonzero(mask.any(axis=0))
+        if len(used_rows) == 0:
+            raise ValueError("empty mask")
+
+        # leave out the largest run of unused columns, which can wrap
+        gaps = np.diff(used_cols, append=used_cols[0] + cols) - 1
+        i = np.argmax(gaps)
+        col_start = used_cols[(i + 1) % len(used_cols)]
+        num_cols = cols - gaps[i]
+        return cls(
+            rows, cols, used_rows[0], used_rows[-1] + 1, col_start, num_cols, mask
+        )
+
+    @property
+    def shape(self):
+        return (self.row_stop - self.row_start, len(self.col_indices))
+
+    def extract(self, image):
+        """
+        The window of a ``(rows, cols, ...)`` image as a new array, with the
+        pixels outside of the mask set to 0.
+        """
+        window = image[self.row_start:self.row_stop].take(self.col_indices, axis=1)
+        if self.mask is not None:
+            window[~self.mask] = 0
+        return window
+
+    def insert(self, window, out=None):
+        """
+        Write the pixels of the window which are inside of the mask back to
+        a full size image, by default a new one filled with 0.
+        """
+        if out is None:
+            out = np.zeros((self.rows, self.cols) + window.shape[2:], dtype=window.dtype)
+        rows = np.arange(self.row_start, self.row_stop)[:, None]
+        if self.mask is None:
+            out[rows, self.col_indices] = window
+        else:
+            r, c = np.nonzero(self.mask)
+            out[r + self.row_start, self.col_indices[c]] = window[r, c]
+        return out
+
+    def crop_rows(self, table):
+        """
+        The entries of a per row table, e.g. ``params.row_alphas_sines``,
+        for the rows of the window.
+        """
+        return np.ascontiguousarray(table[self.row_start:self.row_stop])
+
+    def crop_cols(self, table):
+        """
+        The entries of a per column table, e.g. ``params.col_alphas_sines``,
+        for the columns of the window, in their order.
+        """
+        return table[self.col_indices]
@@ -0,0 +1,237 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from numba import njit
+
+from .cluster_features import ClusterFeatures
+from .clusterer import SegmentedPointCloud
+
+
+@njit(nogil=True, cache=True)
+def compute_cluster_descriptors(offsets, points):
+    """
+    Centroid, extent (max - min of x, y and z) and number of points of the
+    clusters ``points[offsets[i]:offsets[i + 1]]``.
+    """
+    num_clusters = len(offsets) - 1
+    centroids = np.zeros((num_clusters, 3))
+    extents = np.zeros((num_clusters, 3))
+    counts = np.zeros(num_clusters, dtype=np.int64)
+    for i in range(num_clusters):
+        start = offsets[i]
+        stop = offsets[i + 1]
+        counts[i] = stop - start
+        if stop == start:
+            continue
+        for d in range(3):
+            low = points[start, d]
+            high = points[start, d]
+            total = 0.0
+            for k in range(start, stop):
+                value = points[k, d]
+                total += value
+                if value < low:
+                    low = value
+                elif value > high:
+                    high = value
+            centroids[i, d] = total / (stop - start)
+            extents[i, d] = high - low
+    return centroids, extents, counts
+
+
+@njit(nogil=True, cache=True, inline="always")
+def grid_key(cell_x, cell_z):
+    return cell_x * (1 << 32) + cell_z
+
+
+@njit(nogil=True, cache=True)
+def associate(track_centroids, centroids, gate):
+    """
+    Greedily match clusters to tracks, closest pairs first, considering
+    only pairs closer than ``gate`` on the ground (x-z) plane.
+
+    The tracks are sorted into a grid of ``gate`` sized cells, so each
+    cluster is only compared to the tracks of the 3x3 cells around it.
+    Returns for every cluster the index of its track, -1 if none.
+    """
+    num_tracks = len(track_centroids)
+    num_clusters = len(centroids)
+    keys = np.empty(num_tracks, dtype=np.int64)
+    for j in range(num_tracks):
+        keys[j] = grid_key(
+            np.int64(np.floor(track_centroids[j, 0] / gate)),
+            np.int64(np.floor(track_centroids[j, 2] / gate)),
+        )
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+
+    capacity = 4 * num_clusters + 4
+    costs = np.empty(capacity)
+    pairs = np.empty((capacity, 2), dtype=np.int64)
+    num_pairs = 0
+    for i in range(num_clusters):
+        x = centroids[i, 0]
+        z = centroids[i, 2]
+        cell_x = np.int64(np.floor(x / gate))
+        cell_z = np.int64(np.floor(z / gate))
+        for dx in range(-1, 2):
+            for dz in range(-1, 2):
+                key = grid_key(cell_x + dx, cell_z + dz)
+                k = np.searchsorted(sorted_keys, key)
+                while k < num_tracks and sorted_keys[k] == key:
+                    j = order[k]
+                    k += 1
+                    distance = np.sqrt(
+                        (track_centroids[j, 0] - x) ** 2
+                        + (track_centroids[j, 2] - z) ** 2
+                    )
+                    if distance >= gate:
+                        continue
+                    if num_pairs == capacity:
+                        capacity *= 2
+                        new_costs = np.empty(capacity)
+                        new_costs[:num_pairs] = costs
+                        costs = new_costs
+                        new_pairs = np.empty((capacity, 2), dtype=np.int64)
+                        new_pairs[:num_pairs] = pairs
+                        pairs = new_pairs
+                    costs[num_pairs] = distance
+                    pairs[num_pairs, 0] = i
+                    pairs[num_pairs, 1] = j
+                    num_pairs += 1
+
+    matches = np.full(num_clusters, -1, dtype=np.int64)
+    track_taken = np.zeros(num_tracks, dtype=np.bool_)
+    for p in np.argsort(costs[:num_pairs], kind="mergesort"):
+        i = pairs[p, 0]
+        j = pairs[p, 1]
+        if matches[i] < 0 and not track_taken[j]:
+            matches[i] = j
+            track_taken[j] = True
+    return matches
+
+
+class ClusterTracker:
+    """
+    Gives the clusters of consecutive frames persistent ids.
+
+    Every track keeps the centroid, extent and number of points of its
+    last cluster and a velocity per frame. Clusters are matched to the
+    track whose predicted centroid is closest, within ``gate`` meters on
+    the ground plane. Unmatched clusters start new tracks, and tracks
+    without a cluster for more than ``max_misses`` frames are dropped.
+
+        tracker = ClusterTracker()
+        for depth_image in frames:
+            ...
+            features = ClusterFeatures.from_label_image(label_image, pc_image)
+            track_ids = tracker.update(features)  # label -> track id
+    """
+
+    def __init__(self, gate=1.0, max_misses=2):
+        self.gate = gate
+        self.max_misses = max_misses
+        self.next_id = 1
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, 3))
+        self.extents = np.zeros((0, 3))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.velocities = np.zeros((0, 3))
+        self.ages = np.zeros(0, dtype=np.int64)
+        self.misses = np.zeros(0, dtype=np.int64)
+
+    def update(self, segmented):
+        """
+        segmented: ``ClusterFeatures``, ``SegmentedPointCloud`` or a
+            mapping from label to the ``(n, 3)`` points of the cluster,
+            e.g. the output of ``calculate_segmented_point_clouds``
+
+        Returns a dict from label to track id.
+        """
+        if isinstance(segmented, ClusterFeatures):
+            return dict(zip(
+                segmented.labels.tolist(),
+                self.update_descriptors(
+                    segmented.centroids, segmented.extents, segmented.counts
+                ).tolist(),
+            ))
+        if not isinstance(segmented, SegmentedPointCloud):
+            labels = np.array(list(segmented.keys()), dtype=np.int64)
+            clouds = [np.asarray(segmented[label])[:, :3] for label in labels]
+            offsets = np.zeros(len(clouds) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(cloud) for cloud in clouds])
+            points = np.concatenate(clouds) if clouds else np.zeros((0, 3))
+            segmented = SegmentedPointCloud(labels, offsets, points)
+        centroids, extents, counts = compute_cluster_descriptors(
+            segmented.offsets, np.ascontiguousarray(segmented.points[:, :3])
+        )
+        return dict(zip(
+            segmented.labels.tolist(),
+            self.update_descriptors(centroids, extents, counts).tolist(),
+        ))
+
+    def update_descriptors(self, centroids, extents, counts):
+        """
+        ``update`` for clusters already reduced to their descriptors.
+        Returns the track id of every cluster.
+        """
+        predicted = self.centroids + self.velocities
+        matches = associate(predicted, centroids, self.gate)
+        matched = matches >= 0
+        tracks = matches[matched]
+
+        track_seen = np.zeros(len(self.ids), dtype=bool)
+        track_seen[tracks] = True
+        self.velocities[tracks] = centroids[matched] - self.centroids[tracks]
+        self.centroids[tracks] = centroids[matched]
+        self.extents[tracks] = extents[matched]
+        self.counts[tracks] = counts[matched]
+        self.ages += 1
+        self.misses[track_seen] = 0
+        self.misses[~track_seen] += 1
+        self.centroids[~track_seen] = predicted[~track_seen]
+
+        cluster_ids = np.empty(len(centroids), dtype=np.int64)
+        cluster_ids[matched] = self.ids[tracks]
+        num_new = len(centroids) - len(tracks)
+        cluster_ids[~matched] = np.arange(self.next_id, self.next_id + num_new)
+        self.next_id += num_new
+
+        keep = self.misses <= self.max_misses
+        self.ids = np.concatenate((self.ids[keep], cluster_ids[~matched]))
+        self.centroids = np.concatenate(
+            (self.centroids[keep], centroids[~matched])
+        )
+        self.extents = np.concatenate((self.extents[keep], extents[~matched]))
+        self.counts = np.concatenate((self.counts[keep], counts[~matched]))
+        self.velocities = np.concatenate(
+            (self.velocities[keep], np.zeros((num_new, 3)))
+        )
+        self.ages = np.concatenate(
+            (self.ages[keep], np.ones(num_new, dtype=np.int64))
+        )
+        self.misses = np.concatenate(
+            (self.misses[keep], np.zeros(num_new, dtype=np.int64))
+        )
+        return cluster_ids
@@ -0,0 +1,436 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+from .angle_diff import compute_beta_from_trig
+from .cluster_filter import (
+    add_to_cluster_stats,
+    keep_cluster,
+    renumber_densely,
+)
+
+
+@njit(nogil=True, cache=True)
+def find_root(parent, index):
+    root = index
+    while parent[root] != root:
+        root = parent[root]
+
+    # path compression
+    while parent[index] != root:
+        next_index = parent[index]
+        parent[index] = root
+        index = next_index
+    return root
+
+
+@njit(nogil=True, cache=True)
+def union_roots(parent, a, b):
+    """
+    Merge the sets of ``a`` and ``b``. The smaller index always becomes the
+    root, so the root of a set is its first pixel in raster order.
+    """
+    root_a = find_root(parent, a)
+    root_b = find_root(parent, b)
+    if root_a < root_b:
+        parent[root_b] = root_a
+    elif root_b < root_a:
+        parent[root_a] = root_b
+
+
+@njit(cache=True)
+def label_union_find(
+    depth_image, beta_rows, beta_cols, angle_threshold, label_dtype=np.uint16
+):
+    """
+    Two-pass connected component labeling over the beta angles precomputed
+    by ``AngleDiff``.
+
+    Produces the same label image as ``LinearImageLabeler.compute_labels``:
+    components are numbered in the raster order of their first pixel which
+    is deep enough to start a component.
+    """
+    rows, cols = depth_image.shape
+    threshold = np.float32(angle_threshold)
+
+    parent = np.arange(rows * cols)
+
+    # --- first pass: merge pixels connected to their right / lower neighbor
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.001:
+                continue
+            index = r * cols + c
+
+            # WrapCols
+            next_c = c + 1 if c + 1 < cols else 0
+            if beta_cols[r, c] > threshold:
+                union_roots(parent, index, r * cols + next_c)
+
+            if r + 1 < rows and beta_rows[r, c] > threshold:
+                union_roots(parent, index, index + cols)
+
+    # --- second pass: number the components in raster order
+    root_labels = np.zeros(rows * cols, dtype=np.int64)
+    label = 1
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.005:
+                continue
+            root = find_root(parent, r * cols + c)
+            if root_labels[root] == 0:
+                root_labels[root] = label
+                label += 1
+
+    label_image = np.zeros((rows, cols), dtype=label_dtype)
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.001:
+                continue
+            label_image[r, c] = root_labels[find_root(parent, r * cols + c)]
+
+    return label_image
+
+
+@njit(parallel=True, cache=True)
+def label_union_find_parallel(
+    depth_image,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    angle_threshold,
+    num_strips,
+    label_dtype=np.uint16,
+):
+    """
+    Parallel variant of ``label_union_find``.
+
+    The image is split into vertical strips which are labeled concurrently,
+    computing the beta angles on the fly. The components crossing the strip
+    borders, including the border between the last and the first column,
+    are merged afterwards. The output is the same as ``label_union_find``.
+
+    num_strips: number of strips, typically ``numba.get_num_threads()``
+    label_dtype: ``np.uint16``, or ``np.uint32`` for images of more than
+        65535 pixels which can have more components
+    """
+    rows, cols = depth_image.shape
+    threshold = np.float32(angle_threshold)
+
+    num_strips = max(1, min(num_strips, cols))
+
+    parent = np.arange(rows * cols)
+
+    # --- label the strips; a strip only touches the parents of its pixels
+    for s in prange(num_strips):
+        c_start = s * cols // num_strips
+        c_stop = (s + 1) * cols // num_strips
+        for r in range(rows):
+            for c in range(c_start, c_stop):
+                curr = depth_image[r, c]
+                if curr < 0.001:
+                    continue
+                index = r * cols + c
+
+                if c + 1 < c_stop:
+                    beta = compute_beta_from_trig(
+                        col_alphas_sines[c],
+                        col_alphas_cosines[c],
+                        curr,
+                        depth_image[r, c + 1],
+                    )
+                    if beta > threshold:
+                        union_roots(parent, index, index + 1)
+
+                if r + 1 < rows:
+                    beta = compute_beta_from_trig(
+                        row_alphas_sines[r],
+                        row_alphas_cosines[r],
+                        curr,
+                        depth_image[r + 1, c],
+                    )
+                    if beta > threshold:
+                        union_roots(parent, index, index + cols)
+
+    # --- merge along the strip borders, the last one wraps to column 0
+    for s in range(num_strips):
+        c = (s + 1) * cols // num_strips - 1
+        next_c = c + 1 if c + 1 < cols else 0
+        for r in range(rows):
+            curr = depth_image[r, c]
+            if curr < 0.001:
+                continue
+            beta = compute_beta_from_trig(
+                col_alphas_sines[c],
+                col_alphas_cosines[c],
+                curr,
+                depth_image[r, next_c],
+            )
+            if beta > threshold:
+                union_roots(parent, r * cols + c, r * cols + next_c)
+
+    roots = np.empty(rows * cols, dtype=np.int64)
+    for r in prange(rows):
+        for c in range(cols):
+            root = r * cols + c
+            while parent[root] != root:
+                root = parent[root]
+            roots[r * cols + c] = root
+
+    # --- number the components in raster order
+    root_labels = np.zeros(rows * cols, dtype=np.int64)
+    label = 1
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.005:
+                continue
+            root = roots[r * cols + c]
+            if root_labels[root] == 0:
+                root_labels[root] = label
+                label += 1
+
+    label_image = np.zeros((rows, cols), dtype=label_dtype)
+    for r in prange(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.001:
+                continue
+            label_image[r, c] = root_labels[roots[r * cols + c]]
+
+    return label_image
+
+
+@njit(nogil=True, cache=True)
+def merge_components(
+    depth_image,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    threshold,
+    parent,
+    wrap=True,
+):
+    """
+    First pass of the union-find labelers computing the beta angles on the
+    fly: merge every pixel with its right and lower neighbor.
+
+    wrap: whether the last column is next to the first one
+    """
+    rows, cols = depth_image.shape
+    for r in range(rows):
+        for c in range(cols):
+            curr = depth_image[r, c]
+            if curr < 0.001:
+                continue
+            index = r * cols + c
+
+            # WrapCols
+            next_c = c + 1 if c + 1 < cols else 0
+            if next_c > 0 or wrap:
+                beta = compute_beta_from_trig(
+                    col_alphas_sines[c],
+                    col_alphas_cosines[c],
+                    curr,
+                    depth_image[r, next_c],
+                )
+                if beta > threshold:
+                    union_roots(parent, index, r * cols + next_c)
+
+            if r + 1 < rows:
+                beta = compute_beta_from_trig(
+                    row_alphas_sines[r],
+                    row_alphas_cosines[r],
+                    curr,
+                    depth_image[r + 1, c],
+                )
+                if beta > threshold:
+                    union_roots(parent, index, index + cols)
+
+
+@njit(nogil=True, cache=True)
+def label_frame_into(
+    depth_image,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    angle_threshold,
+    parent,
+    root_labels,
+    label_image,
+    wrap=True,
+):
+    """
+    ``label_union_find`` computing the beta angles on the fly and working
+    in caller supplied buffers of ``rows * cols`` elements, so it can be
+    called repeatedly without allocating.
+
+    wrap: see ``merge_components``
+    """
+    rows, cols = depth_image.shape
+    threshold = np.float32(angle_threshold)
+
+    for i in range(rows * cols):
+        parent[i] = i
+        root_labels[i] = 0
+
+    merge_components(
+        depth_image,
+        row_alphas_sines,
+        row_alphas_cosines,
+        col_alphas_sines,
+        col_alphas_cosines,
+        threshold,
+        parent,
+        wrap,
+    )
+
+    label = 1
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.005:
+                continue
+            root = find_root(parent, r * cols + c)
+            if root_labels[root] == 0:
+                root_labels[root] = label
+                label += 1
+
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.001:
+                label_image[r, c] = 0
+            else:
+                label_image[r, c] = \
+                    root_labels[find_root(parent, r * cols + c)]
+
+
+@njit(parallel=True, cache=True)
+def label_union_find_batch(
+    depth_stack,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    angle_threshold,
+    num_workers,
+    label_dtype=np.uint16,
+):
+    """
+    Label a ``(N, rows, cols)`` stack of frames, distributing the frames
+    over ``num_workers`` workers. Each worker allocates its scratch buffers
+    once and reuses them for all of its frames.
+    """
+    num_frames, rows, cols = depth_stack.shape
+    num_workers = max(1, min(num_workers, num_frames))
+    label_stack = np.zeros((num_frames, rows, cols), dtype=label_dtype)
+
+    for w in prange(num_workers):
+        parent = np.empty(rows * cols, dtype=np.int64)
+        root_labels = np.empty(rows * cols, dtype=np.int64)
+        for i in range(w, num_frames, num_workers):
+            label_frame_into(
+                depth_stack[i],
+                row_alphas_sines,
+                row_alphas_cosines,
+                col_alphas_sines,
+                col_alphas_cosines,
+                angle_threshold,
+                parent,
+                root_labels,
+                label_stack[i],
+            )
+
+    return label_stack
+
+
+@njit(cache=True)
+def label_union_find_filtered(
+    depth_image,
+    row_alphas_sines,
+    row_alphas_cosines,
+    col_alphas_sines,
+    col_alphas_cosines,
+    angle_threshold,
+    limits,
+    dense=False,
+    label_dtype=np.uint16,
+):
+    """
+    ``label_union_find`` followed by ``filter_clusters``, in the same number
+    of passes as labeling alone: the size and the bounding box of the
+    components are accumulated per root while numbering them.
+
+    limits: see ``keep_cluster``
+    dense: renumber the remaining clusters 1, 2, ... in the same order
+    """
+    rows, cols = depth_image.shape
+    threshold = np.float32(angle_threshold)
+
+    parent = np.arange(rows * cols)
+    merge_components(
+        depth_image,
+        row_alphas_sines,
+        row_alphas_cosines,
+        col_alphas_sines,
+        col_alphas_cosines,
+        threshold,
+        parent,
+    )
+
+    root_labels = np.zeros(rows * cols, dtype=np.int64)
+    counts = np.zeros(rows * cols, dtype=np.int64)
+    bounds = np.empty((rows * cols, 6), dtype=np.int64)
+    label = 1
+    for r in range(rows):
+        for c in range(cols):
+            depth = depth_image[r, c]
+            if depth < 0.001:
+                continue
+            root = find_root(parent, r * cols + c)
+            add_to_cluster_stats(counts, bounds, root, r, c, cols)
+            if depth >= 0.005 and root_labels[root] == 0:
+                root_labels[root] = label
+                label += 1
+
+    # new_labels[label]: label after filtering, renumbered if dense
+    new_labels = np.zeros(label, dtype=np.int64)
+    for root in range(rows * cols):
+        if root_labels[root] > 0 and keep_cluster(counts, bounds, root, limits):
+            new_labels[root_labels[root]] = root_labels[root]
+    if dense:
+        renumber_densely(new_labels)
+    for root in range(rows * cols):
+        root_labels[root] = new_labels[root_labels[root]]
+
+    # find_root() above left every parent pointing to its root
+    label_image = np.zeros((rows, cols), dtype=label_dtype)
+    for r in range(rows):
+        for c in range(cols):
+            if depth_image[r, c] < 0.001:
+                continue
+            label_image[r, c] = root_labels[parent[r * cols + c]]
+
+    return label_image
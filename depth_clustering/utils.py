@@ -24,21 +24,105 @@ DEALINGS IN THE SOFTWARE.
 import numpy as np
 from numba import njit
 
+from .projections import fill_row_lookup, row_from_angle
+
 
 @njit(fastmath=True)
-def convert_spherical_to_cartesian(image, params):
-    result = np.empty((params.rows, params.cols, 3))
+def convert_spherical_to_cartesian(image, params, mask=None):
+    """
+    mask: optional (rows, cols) array, e.g. a label image. Only the pixels
+        where it is non-zero are converted, the others are zero.
+    """
+    result = np.zeros((params.rows, params.cols, 3))
+    convert_spherical_to_cartesian_into(image, params, result, mask)
+    return result
 
-    for r in range(params.rows):
-        for c in range(params.cols):
 
-            alpha = params.angle_from_col(c)
-            beta = -params.angle_from_row(r)
-            d = image[r][c]
+@njit(fastmath=True)
+def convert_spherical_to_cartesian_into(image, params, out, mask=None):
+    """
+    ``convert_spherical_to_cartesian`` writing into the (rows, cols, 3)
+    array ``out``, e.g. a preallocated float32 buffer. Pixels outside of
+    ``mask`` are left untouched.
+    """
+    spherical_to_cartesian_into(
+        image,
+        params.row_angles_sines,
+        params.row_angles_cosines,
+        params.col_angles_sines,
+        params.col_angles_cosines,
+        out,
+        mask,
+    )
 
-            x = d * np.cos(beta) * np.sin(alpha)
-            y = d * np.sin(beta)
-            z = -d * np.cos(beta) * np.cos(alpha)
 
-            result[r][c] = [x, y, z]
-    return result
+@njit(nogil=True, fastmath=True, cache=True)
+def spherical_to_cartesian_into(
+    image,
+    row_angles_sines,
+    row_angles_cosines,
+    col_angles_sines,
+    col_angles_cosines,
+    result,
+    mask=None,
+):
+    rows, cols = image.shape
+    for r in range(rows):
+        # beta = -row_angle
+        sin_beta = -row_angles_sines[r]
+        cos_beta = row_angles_cosines[r]
+        for c in range(cols):
+            if mask is not None and mask[r, c] == 0:
+                continue
+            d = image[r, c]
+            result[r, c, 0] = d * cos_beta * col_angles_sines[c]
+            result[r, c, 1] = d * sin_beta
+            result[r, c, 2] = -d * cos_beta * col_angles_cosines[c]
+
+
+# fastmath without the "nnan" and "ninf" flags, which would let LLVM
+# assume that the coordinates are finite and drop the checks
+FINITE_FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+
+@njit(fastmath=FINITE_FASTMATH)
+def project_point_cloud(points, params):
+    """
+    Project a point cloud into a range image, the inverse of
+    ``convert_spherical_to_cartesian``.
+
+    points: (N, 3) or wider array, only x, y and z are used
+
+    Returns the depth image and an index image holding, for every pixel,
+    the index of the point it was taken from (-1 for empty pixels). When
+    several points fall into the same pixel the closest one wins. Points
+    with NaN or infinite coordinates are skipped like the points outside
+    of the field of view.
+    """
+    depth_image = np.zeros((params.rows, params.cols), dtype=np.float32)
+    index_image = np.full((params.rows, params.cols), -1, dtype=np.int64)
+
+    row_lookup = fill_row_lookup(params.row_angles)
+    for i in range(points.shape[0]):
+        x = points[i, 0]
+        y = points[i, 1]
+        z = points[i, 2]
+
+        if not (np.isfinite(x) and np.isfinite(y) and np.isfinite(z)):
+            continue
+        d = np.sqrt(x * x + y * y + z * z)
+        if d < 0.001:
+            continue
+
+        r = row_from_angle(-np.arctan2(y, np.sqrt(x * x + z * z)), *row_lookup)
+        if r < 0:
+            continue
+        c = params.col_from_angle(np.arctan2(x, -z))
+        if c < 0:
+            continue
+
+        if index_image[r, c] < 0 or d < depth_image[r, c]:
+            depth_image[r, c] = d
+            index_image[r, c] = i
+
+    return depth_image, index_image
@@ -0,0 +1,79 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+from math import radians
+
+import numpy as np
+
+from .cluster_features import ClusterFeatures
+from .clusterer import (
+    compute_labels,
+    compute_labels_with_filtering,
+    filter_clusters,
+)
+from .depth_ground_remover import DepthGroundRemover
+from .pipeline import ClusteringPipeline
+from .utils import convert_spherical_to_cartesian
+
+
+def warmup(
+    params,
+    angle_threshold=radians(10.0),
+    window_size=5,
+    ground_remove_angle=radians(5.0),
+):
+    """
+    Compile every kernel of the clustering and ground removal pipeline for
+    the given sensor by running it once on a synthetic frame.
+
+    Numba compiles lazily, so without this the first real frame pays for
+    the compilation. Kernels which only take arrays are also written to
+    Numba's on-disk cache, so later processes start faster. Kernels taking
+    jitclasses (e.g. ``AngleDiff``, ``ProjectionParams``) cannot be cached
+    by Numba and are compiled again in every process.
+    """
+    depth_image = np.full((params.rows, params.cols), 10.0, dtype=np.float32)
+
+    remover = DepthGroundRemover(params, window_size, ground_remove_angle)
+    no_ground_image = remover.on_new_object_received(depth_image)
+    DepthGroundRemover(
+        params, window_size, ground_remove_angle, engine="fused"
+    ).on_new_object_received(depth_image)
+    temporal = DepthGroundRemover(
+        params, window_size, ground_remove_angle, engine="temporal"
+    )
+    for _ in range(2):
+        temporal.on_new_object_received(depth_image)
+
+    compute_labels(no_ground_image, params, angle_threshold, "union_find")
+    compute_labels(no_ground_image, params, angle_threshold, "parallel")
+    label_image = compute_labels(no_ground_image, params, angle_threshold)
+    filter_clusters(label_image)
+    compute_labels_with_filtering(no_ground_image, params, angle_threshold)
+    pc_image = convert_spherical_to_cartesian(no_ground_image, params)
+    ClusterFeatures.from_label_image(label_image, pc_image, oriented=True)
+
+    with ClusteringPipeline(
+        params, angle_threshold, window_size, ground_remove_angle
+    ) as pipeline:
+        pipeline.process(depth_image)
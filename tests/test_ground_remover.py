@@ -32,7 +32,25 @@ from depth_clustering import (
     ProjectionParams,
     SpanParams,
     DepthGroundRemover,
+    RegionOfInterest,
+    remove_ground_batch,
 )
+from depth_clustering.depth_ground_remover import (
+    dilate_wrapped,
+    dilate_wrapped_into,
+    remove_ground_columns,
+    repair_depth,
+    repair_depth_linear,
+    repair_depth_parallel,
+)
+
+
+def assert_same_ground(actual, expected):
+    # The engines smooth the angles like cv2.filter2D, whose rounding
+    # depends on the OpenCV build and the CPU (FMA or not), so pixels whose
+    # smoothed angle is within rounding of the threshold may differ.
+    np.testing.assert_array_equal(actual[(actual != 0) & (expected != 0)], expected[(actual != 0) & (expected != 0)])
+    assert ((actual == 0) == (expected == 0)).mean() > 0.999
 
 
 class TestGroundRemover(unittest.TestCase):
@@ -48,6 +66,234 @@ class TestGroundRemover(unittest.TestCase):
 
         assert removed.shape == (64, 870)
 
+    def test_fused_engine(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        # flat ground 1.7 m below the sensor with some missing pixels
+        depth_image = np.random.rand(64, 870).astype("float32") * 20
+        sines = np.sin(-params.row_angles)
+        depth_image[sines > 0.05] = (1.7 / sines[sines > 0.05])[:, None]
+        depth_image[np.random.rand(64, 870) < 0.05] = 0.0
+
+        for window_size, repair_mode in ((5, "linear"), (9, "linear"), (5, "legacy")):
+            remover = DepthGroundRemover(params, window_size, radians(5), repair_mode=repair_mode)
+            fused = DepthGroundRemover(params, window_size, radians(5), "fused", repair_mode)
+            expected = remover.on_new_object_received(depth_image)
+            self.assertTrue((expected == 0).sum() > (depth_image == 0).sum())
+            assert_same_ground(fused.on_new_object_received(depth_image), expected)
+
+            # the smoothed angles match cv2.filter2D up to rounding
+            repaired = np.empty_like(depth_image)
+            smoothed = np.empty_like(depth_image)
+            kernel = remover.get_savitsky_golay_kernel(window_size)[:, 0]
+            remove_ground_columns(
+                depth_image, params.row_angles_sines, params.row_angles_cosines, kernel,
+                repair_mode == "linear", 0, 870, repaired, np.empty_like(depth_image), smoothed,
+            )
+            angle_image = remover.create_angle_image(repaired)
+            np.testing.assert_allclose(
+                smoothed, remover.apply_savitsky_golay_smoothing(angle_image, window_size), rtol=1e-5, atol=1e-6
+            )
+
+        removed = remove_ground_batch(depth_image[None], params, window_size, radians(5), engine="fused", repair_mode=repair_mode)
+        assert_same_ground(removed[0], remover.on_new_object_received(depth_image))
+
+    def test_temporal_engine(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        rng = np.random.default_rng(0)
+        depth_image = rng.random((64, 870), dtype=np.float32) * 20
+        sines = np.sin(-params.row_angles)
+        depth_image[sines > 0.05] = (1.7 / sines[sines > 0.05])[:, None]
+        depth_image[rng.random((64, 870)) < 0.05] = 0.0
+
+        remover = DepthGroundRemover(params, 5, radians(5))
+        temporal = DepthGroundRemover(params, 5, radians(5), "temporal", reset_interval=3)
+        expected = remover.on_new_object_received(depth_image)
+        for _ in range(2):
+            assert_same_ground(temporal.on_new_object_received(depth_image), expected)
+
+        # an object moving over the ground, the second frame is a reset
+        for frame in range(3):
+            moved = depth_image.copy()
+            moved[30:50, 100 + 10 * frame:140 + 10 * frame] = 6.0
+            expected = remover.on_new_object_received(moved)
+            no_ground = temporal.on_new_object_received(moved)
+            assert_same_ground(no_ground, expected)
+
+        temporal.reset()
+        assert_same_ground(temporal.on_new_object_received(depth_image), remover.on_new_object_received(depth_image))
+
+    def test_temporal_engine_noise(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        # a static scene with 1 cm of noise: the angles of the pixels which
+        # moved by less than depth_tolerance are kept from earlier frames
+        rng = np.random.default_rng(0)
+        elevations = np.asarray(params.row_angles, dtype=np.float64)
+        depth_image = np.zeros((64, 870), dtype=np.float32)
+        down = elevations < 0
+        depth_image[down] = (1.7 / np.sin(-elevations[down]))[:, None]
+        # boxes 2 m high standing on the ground
+        for c_start in range(0, 870, 60):
+            distance = rng.uniform(4.0, 30.0)
+            height = distance * np.tan(elevations) + 1.7
+            rows = (height > 0) & (height < 2.0)
+            depth_image[rows, c_start:c_start + 25] = (distance / np.cos(elevations[rows]))[:, None]
+
+        remover = DepthGroundRemover(params, 5, radians(5))
+        temporal = DepthGroundRemover(params, 5, radians(5), "temporal")
+        agreement = []
+        flicker = []
+        previous = None
+        for _ in range(10):
+            noisy = depth_image + rng.normal(0.0, 0.01, depth_image.shape).astype(np.float32)
+            expected = remover.on_new_object_received(noisy)
+            no_ground = temporal.on_new_object_received(noisy)
+            agreement.append(((no_ground == 0) == (expected == 0)).mean())
+            if previous is not None:
+                flicker.append(((previous == 0) == (expected == 0)).mean())
+            previous = expected
+        # 99.96% here, "bfs" itself changes 0.23% of the pixels per frame
+        self.assertGreater(np.mean(agreement), 0.999)
+        self.assertGreater(min(agreement), 0.998)
+        self.assertGreater(np.mean(agreement), np.mean(flicker))
+
+    def test_roi(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        depth_image = np.random.rand(64, 870).astype("float32") * 20
+        sines = np.sin(-params.row_angles)
+        depth_image[sines > 0.05] = (1.7 / sines[sines > 0.05])[:, None]
+        expected = DepthGroundRemover(params, 5, radians(5)).on_new_object_received(depth_image)
+
+        roi = RegionOfInterest(64, 870)
+        removed = DepthGroundRemover(params, 5, radians(5), roi=roi).on_new_object_received(depth_image)
+        np.testing.assert_array_equal(removed, expected)
+
+        # a sector across the last column and a band of rows
+        roi = RegionOfInterest(64, 870, 10, 60, col_start=800, num_cols=200)
+        removed = DepthGroundRemover(params, 5, radians(5), roi=roi).on_new_object_received(depth_image)
+        inside = np.zeros((64, 870), dtype=bool)
+        inside[10:60, roi.col_indices] = True
+        self.assertTrue((removed[~inside] == 0).all())
+        # away from the borders of the window
+        np.testing.assert_array_equal(removed[12:58, roi.col_indices[2:-2]], expected[12:58, roi.col_indices[2:-2]])
+
+        with self.assertRaises(ValueError):
+            DepthGroundRemover(params, 5, radians(5), "fused", roi=roi)
+
+    def test_remove_ground_batch(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        remover = DepthGroundRemover(params, window_size=5, ground_remove_angle=radians(5))
+
+        depth_stack = np.random.rand(3, 64, 870).astype("float32")
+        removed = remove_ground_batch(depth_stack, params, 5, radians(5), num_workers=2)
+
+        assert removed.shape == (3, 64, 870)
+        for depth_image, no_ground_image in zip(depth_stack, removed):
+            np.testing.assert_array_equal(no_ground_image, remover.on_new_object_received(depth_image))
+
+        with self.assertRaises(ValueError):
+            remove_ground_batch(depth_stack, params, 5, radians(5), engine="temporal")
+
+
+class TestRepairDepth(unittest.TestCase):
+    def test_repair_depth_linear(self):
+        column = np.array([0, 2, 0, 0, 5, 0, 0, 0, 0, 0, 6, 0, 6.5, 20, 0, 30, 0], dtype=np.float32)
+        repaired = repair_depth_linear(column[:, None], 5, 4.0)[:, 0]
+        np.testing.assert_allclose(
+            repaired, [0, 2, 3, 4, 5, 0, 0, 0, 0, 0, 6, 6.25, 6.5, 20, 0, 30, 0]
+        )
+
+        # a depth of 0.001 is valid, also as the end of a gap
+        column = np.array([0.001, 0, 0.501, 0.0009, 0.301], dtype=np.float32)
+        repaired = repair_depth_linear(column[:, None], 5, 1.0)[:, 0]
+        np.testing.assert_allclose(repaired, [0.001, 0.251, 0.501, 0.401, 0.301], rtol=1e-6)
+
+
+def repair_depth_original(no_ground_image, step, depth_threshold):
+    # repair_depth of the original implementation, in plain Python
+    # with the float types of the Numba version
+    inpainted_depth = np.copy(no_ground_image)
+    rows, cols = inpainted_depth.shape
+    for c in range(cols):
+        for r in range(rows):
+            if inpainted_depth[r, c] < 0.001:
+                counter = 0
+                sum_depths = 0.0
+                for i in range(1, step):
+                    if r - i < 0:
+                        continue
+                    for j in range(1, step):
+                        if r + j > rows - 1:
+                            continue
+                        prev = inpainted_depth[r - i, c]
+                        next_depth = inpainted_depth[r + j, c]
+                        if prev > 0.001 and next_depth > 0.001 and abs(prev - next_depth) < depth_threshold:
+                            # float32 sum of the pair, accumulated in float64 as in Numba
+                            sum_depths += float(prev + next_depth)
+                            counter += 2
+                if counter > 0:
+                    inpainted_depth[r, c] = sum_depths / counter
+    return inpainted_depth
+
+
+class TestRepairDepthLegacy(unittest.TestCase):
+    def test_same_as_original(self):
+        rng = np.random.default_rng(0)
+        depth_image = rng.uniform(5.0, 6.5, (16, 70)).astype(np.float32)
+        depth_image[rng.random(depth_image.shape) < 0.3] = 0
+        expected = repair_depth_original(depth_image, 5, np.float32(1.0))
+
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=70)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=16)
+        remover = DepthGroundRemover(ProjectionParams(h_span_params, v_span_params), 5, radians(5))
+        for repaired in (
+            repair_depth(depth_image, 5, 1.0),
+            repair_depth_parallel(depth_image, 5, 1.0, False),
+            remover.repair_depth(depth_image),
+        ):
+            np.testing.assert_array_equal(repaired, expected)
+
+    def test_parallel_linear(self):
+        rng = np.random.default_rng(1)
+        depth_image = rng.uniform(5.0, 6.5, (16, 70)).astype(np.float32)
+        depth_image[rng.random(depth_image.shape) < 0.3] = 0
+        np.testing.assert_array_equal(
+            repair_depth_parallel(depth_image, 5, 1.0, True), repair_depth_linear(depth_image, 5, 1.0)
+        )
+
+
+class TestDilation(unittest.TestCase):
+    def test_dilate_wrapped(self):
+        image = (np.random.rand(9, 14) * (np.random.rand(9, 14) < 0.1) * 100).astype("uint8")
+        rows, cols = image.shape
+        for window_size in (1, 3, 5, 7):
+            half = window_size // 2
+            expected = np.empty_like(image)
+            for r in range(rows):
+                for c in range(cols):
+                    rs = np.clip(np.arange(r - half, r + half + 1), 0, rows - 1)
+                    cs = np.arange(c - half, c + half + 1) % cols
+                    expected[r, c] = image[np.ix_(rs, cs)].max()
+
+            np.testing.assert_array_equal(dilate_wrapped(image, window_size), expected)
+            dilated = np.empty_like(image)
+            dilate_wrapped_into(image, window_size, np.empty_like(image), dilated)
+            np.testing.assert_array_equal(dilated, expected)
+
 
 if __name__ == "__main__":
     unittest.main()
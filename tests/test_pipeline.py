@@ -0,0 +1,374 @@
+"""
+Copyright (C) 2023  T. Kamatani
+Copyright (C) 2020  I. Bogoslavskyi, C. Stachniss
+
+Permission is hereby granted, free of charge, to any person obtaining a
+copy of this software and associated documentation files (the "Software"),
+to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense,
+and/or sell copies of the Software, and to permit persons to whom the
+Software is furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+DEALINGS IN THE SOFTWARE.
+"""
+
+# flake8: noqa F841,E501
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from math import radians
+from unittest import mock
+
+import cv2
+
+import numpy as np
+
+from depth_clustering import (
+    ClusteringPipeline,
+    DepthGroundRemover,
+    FrameRing,
+    MultiSensorExecutor,
+    ProjectionParams,
+    Recording,
+    RecordingWriter,
+    SegmentedPointCloud,
+    SpanParams,
+    Stats,
+    compute_labels,
+    convert_png_folder,
+    convert_spherical_to_cartesian,
+    create_projection_params_from_row_angles,
+    get_label_dtype,
+    segment_points,
+)
+from depth_clustering.union_find_labeler import label_frame_into
+
+
+class TestClusteringPipeline(unittest.TestCase):
+    def setUp(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        self.params = ProjectionParams(h_span_params, v_span_params)
+
+        self.frames = [np.random.rand(64, 870).astype("float32") * 20 for _ in range(4)]
+        remover = DepthGroundRemover(self.params, window_size=5, ground_remove_angle=radians(5))
+        self.expected = []
+        for depth_image in self.frames:
+            no_ground_image = remover.on_new_object_received(depth_image)
+            labels = compute_labels(no_ground_image, self.params, radians(10.0))
+            self.expected.append((no_ground_image, labels))
+
+    def assert_results(self, results):
+        self.assertEqual(len(results), len(self.expected))
+        for (no_ground_image, labels), (expected_image, expected_labels) in zip(results, self.expected):
+            np.testing.assert_array_equal(no_ground_image, expected_image)
+            np.testing.assert_array_equal(labels, expected_labels)
+
+    def test_run(self):
+        with ClusteringPipeline(self.params, radians(10.0)) as pipeline:
+            results = [(a.copy(), b.copy()) for a, b in pipeline.run(self.frames)]
+        self.assert_results(results)
+
+    def test_feed(self):
+        results = []
+        with ClusteringPipeline(self.params, radians(10.0)) as pipeline:
+            self.assertIsNone(pipeline.feed(self.frames[0]))
+            for depth_image in self.frames[1:]:
+                results.append([a.copy() for a in pipeline.feed(depth_image)])
+            results.append(pipeline.flush())
+            self.assertIsNone(pipeline.flush())
+        self.assert_results(results)
+
+    def test_process(self):
+        with ClusteringPipeline(self.params, radians(10.0)) as pipeline:
+            results = [[a.copy() for a in pipeline.process(depth_image)] for depth_image in self.frames]
+            self.assert_results(results)
+
+            results = [[a.copy() for a in pipeline.process_inline(depth_image)] for depth_image in self.frames]
+            self.assert_results(results)
+
+            pipeline.feed(self.frames[0])
+            with self.assertRaises(RuntimeError):
+                pipeline.process(self.frames[1])
+            with self.assertRaises(RuntimeError):
+                pipeline.process_inline(self.frames[1])
+            no_ground_image, labels = pipeline.flush()
+            np.testing.assert_array_equal(labels, self.expected[0][1])
+
+    def test_failed_frame(self):
+        with ClusteringPipeline(self.params, radians(10.0)) as pipeline:
+            remove_ground = pipeline._remove_ground
+            with mock.patch.object(pipeline, "_remove_ground", side_effect=ValueError):
+                self.assertIsNone(pipeline.feed(self.frames[0]))
+            with self.assertRaises(ValueError):
+                pipeline.flush()
+            self.assertIsNone(pipeline.flush())
+
+            calls = []
+
+            def fail_first(workspace):
+                calls.append(workspace)
+                if len(calls) == 1:
+                    raise ValueError
+                remove_ground(workspace)
+
+            with mock.patch.object(pipeline, "_remove_ground", side_effect=fail_first):
+                pipeline.feed(self.frames[0])
+                with self.assertRaises(ValueError):
+                    pipeline.feed(self.frames[1])
+            # the frame fed after the failed one is still processed
+            no_ground_image, labels = pipeline.flush()
+            np.testing.assert_array_equal(labels, self.expected[1][1])
+
+            no_ground_image, labels = pipeline.process(self.frames[2])
+            np.testing.assert_array_equal(labels, self.expected[2][1])
+
+    def test_fused_ground_engine(self):
+        with ClusteringPipeline(self.params, radians(10.0), ground_engine="fused") as pipeline:
+            results = [(a.copy(), b.copy()) for a, b in pipeline.run(self.frames)]
+        # the smoothing matches cv2.filter2D up to rounding, which depends on
+        # the OpenCV build and the CPU, so the ground may differ by a few pixels
+        self.assertEqual(len(results), len(self.expected))
+        for (no_ground_image, labels), (expected_image, _) in zip(results, self.expected):
+            self.assertGreater(((no_ground_image == 0) == (expected_image == 0)).mean(), 0.999)
+            np.testing.assert_array_equal(labels, compute_labels(no_ground_image, self.params, radians(10.0)))
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        self.params = ProjectionParams(h_span_params, v_span_params)
+        self.depth_image = np.random.rand(64, 870).astype("float32") * 20
+
+    def test_ground_removal(self):
+        calls = []
+        stats = Stats(callback=calls.append)
+        for engine in ("bfs", "fused", "temporal"):
+            remover = DepthGroundRemover(self.params, 5, radians(5), engine=engine)
+            expected = remover.on_new_object_received(self.depth_image)
+            remover.reset()
+            no_ground_image = remover.on_new_object_received(self.depth_image, stats=stats)
+            np.testing.assert_array_equal(no_ground_image, expected)
+
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(stats.calls, 3)
+        self.assertEqual(
+            set(stats.times),
+            {
+                "ground.repair",
+                "ground.angle_image",
+                "ground.smoothing",
+                "ground.bfs",
+                "ground.dilation",
+                "ground.fused",
+                "ground.temporal",
+            },
+        )
+        self.assertEqual(stats.counters["ground.valid_pixels"], 3 * np.count_nonzero(self.depth_image))
+        self.assertGreater(stats.counters["ground.ground_pixels"], 0)
+        self.assertGreater(stats.counters["ground.queue_max"], 0)
+        self.assertEqual(stats.allocations, {})
+
+    def test_labels(self):
+        for engine in ("bfs", "union_find", "parallel"):
+            expected = compute_labels(self.depth_image, self.params, radians(10.0), engine=engine)
+            stats = Stats(track_allocations=True)
+            labels = compute_labels(self.depth_image, self.params, radians(10.0), engine=engine, stats=stats)
+            np.testing.assert_array_equal(labels, expected)
+            self.assertEqual(stats.counters["labels.pixels"], np.count_nonzero(expected))
+            self.assertEqual(stats.counters["labels.components"], expected.max())
+            self.assertEqual("labels.queue_max" in stats.counters, engine == "bfs")
+            self.assertEqual(set(stats.allocations), set(stats.times))
+            self.assertGreater(sum(stats.allocations.values()), 0)
+
+        stats.reset()
+        self.assertEqual(stats.as_dict(), {"calls": 0, "times": {}, "counters": {}, "allocations": {}})
+
+
+class TestMultiSensorExecutor(unittest.TestCase):
+    def test_process(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+        small_params = ProjectionParams(h_span_params, SpanParams(radians(-15), radians(15), num_beams=16))
+
+        # a sensor 2 m above the vehicle origin, turned by 90 degrees
+        turned = np.array([[0, 0, 1, 0], [0, 1, 0, 2], [-1, 0, 0, 0], [0, 0, 0, 1]], dtype=float)
+        sensors = {"top": (small_params, turned), "front": (params, np.eye(4)), "rear": (small_params, np.eye(4))}
+        depth_images = {
+            "top": np.random.rand(16, 870).astype("float32") * 20,
+            "front": np.random.rand(64, 870).astype("float32") * 20,
+            "rear": np.random.rand(16, 870).astype("float32") * 20,
+        }
+        with MultiSensorExecutor(sensors, radians(10.0)) as executor:
+            frame = executor.process(depth_images)
+
+        label_offset = 0
+        for i, (name, (sensor_params, extrinsics)) in enumerate(sensors.items()):
+            no_ground_image = DepthGroundRemover(sensor_params, 5, radians(5)).on_new_object_received(depth_images[name])
+            labels = compute_labels(no_ground_image, sensor_params, radians(10.0))
+            np.testing.assert_array_equal(frame.no_ground_images[name], no_ground_image)
+            np.testing.assert_array_equal(frame.label_images[name], labels)
+            self.assertGreaterEqual(frame.latencies[name], 0.0)
+
+            pc_image = convert_spherical_to_cartesian(no_ground_image, sensor_params, labels)
+            expected = SegmentedPointCloud.from_label_image(labels, pc_image)
+            self.assertEqual((frame.cluster_sensors == i).sum(), len(expected))
+            for label, points in expected.items():
+                vehicle_points = points @ extrinsics[:3, :3].T + extrinsics[:3, 3]
+                np.testing.assert_allclose(frame.clusters[label + label_offset], vehicle_points, atol=1e-4)
+            label_offset += int(labels.max())
+
+
+    def test_kernels_release_gil(self):
+        # While a kernel runs on another thread, this one must get the GIL.
+        # With a long switch interval the waiting thread only gets it back
+        # when the kernel thread releases it, so if the kernel held it the
+        # kernel would be finished when this thread wakes up.
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=4096)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=128)
+        params = ProjectionParams(h_span_params, v_span_params)
+        depth_image = np.random.rand(128, 4096).astype("float32") * 20
+        label_image = np.empty((128, 4096), dtype=np.uint32)
+        label_args = (
+            depth_image,
+            params.row_alphas_sines,
+            params.row_alphas_cosines,
+            params.col_alphas_sines,
+            params.col_alphas_cosines,
+            radians(10.0),
+            np.empty(depth_image.size, dtype=np.int64),
+            np.empty(depth_image.size, dtype=np.int64),
+            label_image,
+            True,
+        )
+        label_frame_into(*label_args)
+        pc_image = np.random.rand(128, 4096, 3)
+        segment_points(label_image, pc_image)
+
+        def run(kernel, args, started, finished):
+            started.set()
+            kernel(*args)
+            finished.set()
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(100.0)
+        try:
+            for kernel, args in ((label_frame_into, label_args), (segment_points, (label_image, pc_image))):
+                started = threading.Event()
+                finished = threading.Event()
+                thread = threading.Thread(target=run, args=(kernel, args, started, finished))
+                thread.start()
+                started.wait()
+                kernel_running = not finished.is_set()
+                thread.join()
+                self.assertTrue(kernel_running, kernel.__name__)
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+
+class TestFrameRing(unittest.TestCase):
+    def test_ring(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        v_span_params = SpanParams(radians(-15), radians(15), num_beams=16)
+        params = ProjectionParams(h_span_params, v_span_params)
+        frames = [np.random.rand(16, 870).astype("float32") * 20 for _ in range(4)]
+
+        with FrameRing.create(16, 870, capacity=2) as ring, \
+                FrameRing.create(16, 870, capacity=2, dtype=get_label_dtype(16, 870)) as label_ring:
+            consumer = FrameRing.attach(ring.name)
+            label_consumer = FrameRing.attach(label_ring.name)
+            self.assertEqual(consumer.dtype, np.float32)
+            self.assertEqual(label_consumer.dtype, np.uint16)
+            with self.assertRaises(KeyError):
+                consumer.read()
+
+            for depth_image in frames[:3]:
+                ring.write(depth_image)
+            number, depth_image, seq = consumer.read()
+            self.assertEqual(number, 2)
+            np.testing.assert_array_equal(depth_image, frames[2])
+            with self.assertRaises(KeyError):
+                consumer.read(0)
+
+            with label_consumer.writing() as labels:
+                labels[:] = compute_labels(depth_image, params, radians(10.0))
+            self.assertTrue(consumer.check(number, seq))
+            np.testing.assert_array_equal(label_ring.read(0)[1], compute_labels(frames[2], params, radians(10.0)))
+
+            # frame 4 overwrites frame 2 in its slot
+            ring.write(frames[3])
+            self.assertTrue(consumer.check(number, seq))
+            ring.write(frames[3])
+            self.assertFalse(consumer.check(number, seq))
+
+            # a failed write leaves no frame behind
+            with self.assertRaises(RuntimeError), ring.writing():
+                raise RuntimeError
+            self.assertEqual(ring.num_written, 5)
+            with self.assertRaises(KeyError):
+                consumer.read(5)
+
+            del depth_image, labels
+            consumer.close()
+            label_consumer.close()
+
+
+class TestRecording(unittest.TestCase):
+    def setUp(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        row_angles = np.radians(np.random.uniform(-24, 2, 64))
+        self.params = create_projection_params_from_row_angles(h_span_params, row_angles)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scans.rec")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_same_params(self, params):
+        np.testing.assert_array_equal(params.row_angles, self.params.row_angles)
+        np.testing.assert_array_equal(params.col_angles, self.params.col_angles)
+        np.testing.assert_array_equal(params.col_alphas_sines, self.params.col_alphas_sines)
+
+    def test_float32(self):
+        frames = [np.random.rand(64, 870).astype("float32") * 20 for _ in range(5)]
+        with RecordingWriter(self.path, self.params) as writer:
+            for depth_image in frames:
+                writer.write(depth_image)
+
+        recording = Recording(self.path)
+        self.assertEqual(len(recording), 5)
+        self.assert_same_params(recording.params)
+        np.testing.assert_array_equal(recording[3], frames[3])
+        for depth_image, expected in zip(recording.replay(start=1, prefetch=2), frames[1:]):
+            np.testing.assert_array_equal(depth_image, expected)
+        self.assertEqual(len(list(recording.replay(start=2, stop=4))), 2)
+
+    def test_convert_png_folder(self):
+        images = [np.random.randint(0, 20000, (64, 870)).astype(np.uint16) for _ in range(3)]
+        for i, image in enumerate(images):
+            cv2.imwrite(os.path.join(self.directory.name, "scan{:05d}.png".format(i + 1)), image)
+
+        self.assertEqual(convert_png_folder(self.directory.name, self.path, self.params), 3)
+        recording = Recording(self.path)
+        self.assertEqual(recording.frames.dtype, np.uint16)
+        self.assert_same_params(recording.params)
+        for depth_image, image in zip(recording.replay(), images):
+            np.testing.assert_array_equal(depth_image, (image / 500.0).astype(np.float32))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -23,22 +23,46 @@ DEALINGS IN THE SOFTWARE.
 
 # flake8: noqa F841,E501
 
+import os
+import tempfile
 import unittest
 from math import radians
 
 import numpy as np
+from numba import njit
 
 from depth_clustering import (
     AngleDiff,
+    ClusterFeatures,
+    ClusterTracker,
+    LabelArchive,
+    LabelArchiveWriter,
     LinearImageLabeler,
     PixelCoord,
     ProjectionParams,
+    RegionOfInterest,
+    SegmentedPointCloud,
     SpanParams,
     calculate_segmented_point_clouds,
     compute_labels,
+    compute_labels_batch,
+    compute_labels_jit,
+    compute_labels_with_filtering,
+    create_projection_params_from_row_angles,
+    decode_labels,
+    encode_labels,
     convert_spherical_to_cartesian,
+    convert_spherical_to_cartesian_into,
     filter_clusters,
+    get_label_dtype,
+    project_point_cloud,
+    warmup,
 )
+from depth_clustering.angle_diff import compute_beta
+from depth_clustering.label_codec import MAGIC, RECORD
+from depth_clustering.projections import fill_col_alphas, fill_row_alphas, fill_row_lookup, row_from_angle
+from depth_clustering.tracker import associate
+from depth_clustering.union_find_labeler import label_union_find_parallel
 
 
 class TestPixelCoord(unittest.TestCase):
@@ -69,6 +93,46 @@ class TestProjecctionParams(unittest.TestCase):
         for func, index, output in targets:
             self.assertAlmostEqual(func(index), output, places=4)
 
+        row_alphas = fill_row_alphas(params.row_angles)
+        col_alphas = fill_col_alphas(params.col_angles, params.h_span)
+        np.testing.assert_allclose(row_alphas[:-1], np.diff(params.row_angles), rtol=1e-4)
+        np.testing.assert_allclose(col_alphas[:-1], np.diff(params.col_angles), rtol=1e-4)
+        np.testing.assert_allclose(params.col_alphas_sines, np.sin(col_alphas), rtol=1e-5)
+
+    def test_row_from_angle(self):
+        h_span_params = SpanParams(radians(-45), radians(45), num_beams=328)
+        v_span_params = SpanParams(radians(-30), radians(30), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        for r in range(64):
+            self.assertEqual(params.row_from_angle(params.row_angles[r]), r)
+        self.assertEqual(params.row_from_angle(radians(-31)), -1)
+        self.assertEqual(params.row_from_angle(radians(31)), -1)
+        self.assertEqual(params.col_from_angle(params.col_angles[100]), 100)
+
+
+class TestNonUniformProjectionParams(unittest.TestCase):
+    def test_row_angles(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=870)
+        row_angles = np.radians(np.concatenate([np.linspace(2, -8, 40), np.linspace(-8.5, -24.8, 24)]))
+        params = create_projection_params_from_row_angles(h_span_params, row_angles)
+
+        self.assertEqual(params.rows, 64)
+        np.testing.assert_allclose(params.row_angles, row_angles, rtol=1e-6)
+        np.testing.assert_allclose(params.row_angles_sines, np.sin(row_angles), rtol=1e-5)
+        np.testing.assert_allclose(fill_row_alphas(params.row_angles)[:-1], np.abs(np.diff(row_angles)), rtol=1e-4)
+
+        row_lookup = fill_row_lookup(params.row_angles)
+
+        for angle in np.radians(np.linspace(-25, 2, 500)):
+            expected = np.argmin(np.abs(row_angles - angle))
+            self.assertEqual(row_from_angle(angle, *row_lookup), expected)
+        self.assertEqual(row_from_angle(radians(3), *row_lookup), -1)
+        self.assertEqual(params.row_from_angle(radians(-8.2)), 39)
+
+        depth_image = np.random.rand(64, 870).astype("float32")
+        compute_labels(depth_image, params, radians(10.0))
+
 
 class TestAngleDiff(unittest.TestCase):
     def test_angle_diff(self):
@@ -80,6 +144,49 @@ class TestAngleDiff(unittest.TestCase):
         angle_diff = AngleDiff(input_image, params)
         mat = angle_diff.visualize()
 
+    def test_update(self):
+        h_span_params = SpanParams(radians(-45), radians(45), num_beams=328)
+        v_span_params = SpanParams(radians(-30), radians(30), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        first_image = np.random.rand(64, 328).astype("float32")
+        second_image = np.random.rand(64, 328).astype("float32")
+        angle_diff = AngleDiff(first_image, params)
+        angle_diff.update(second_image)
+        expected = AngleDiff(second_image, params)
+
+        np.testing.assert_array_equal(angle_diff._beta_rows, expected._beta_rows)
+        np.testing.assert_array_equal(angle_diff._beta_cols, expected._beta_cols)
+        self.assertAlmostEqual(
+            expected._beta_cols[0, 0],
+            expected.get_beta(fill_col_alphas(params.col_angles, params.h_span)[0], second_image[0, 0], second_image[0, 1]),
+            places=5,
+        )
+
+    def test_same_as_per_pixel_beta(self):
+        # the beta angles computed from the precomputed tables are exactly
+        # those of compute_beta(alpha, ...), as computed per pixel before
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=32)
+        params = ProjectionParams(h_span_params, v_span_params)
+        input_image = np.random.rand(32, 328).astype("float32") * 20
+        input_image[input_image < 1] = 0
+        angle_diff = AngleDiff(input_image, params)
+
+        row_alphas = fill_row_alphas(params.row_angles)
+        col_alphas = fill_col_alphas(params.col_angles, params.h_span)
+        beta_rows = np.zeros((32, 328), dtype=np.float32)
+        beta_cols = np.zeros((32, 328), dtype=np.float32)
+        for r in range(32):
+            for c in range(328):
+                if input_image[r, c] < 0.001:
+                    continue
+                beta_cols[r, c] = compute_beta(col_alphas[c], input_image[r, c], input_image[r, (c + 1) % 328])
+                if r + 1 < 32:
+                    beta_rows[r, c] = compute_beta(row_alphas[r], input_image[r, c], input_image[r + 1, c])
+        np.testing.assert_array_equal(angle_diff._beta_rows, beta_rows)
+        np.testing.assert_array_equal(angle_diff._beta_cols, beta_cols)
+
 
 class TestLinearImageLabeler(unittest.TestCase):
     def test_labeler(self):
@@ -105,5 +212,400 @@ class TestLinearImageLabeler(unittest.TestCase):
         # print(list(segmented.keys()))
 
 
+class TestSegmentedPointCloud(unittest.TestCase):
+    def test_compute_labels_jit(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=32)
+        params = ProjectionParams(h_span_params, v_span_params)
+        input_image = np.random.rand(32, 328).astype("float32") * 20
+
+        # callable from njit code, as compute_labels was
+        @njit
+        def label(depth_image, params, angle_threshold):
+            return compute_labels_jit(depth_image, params, angle_threshold)
+
+        labels = label(input_image, params, radians(10.0))
+        self.assertEqual(labels.dtype, np.uint16)
+        np.testing.assert_array_equal(labels, compute_labels(input_image, params, radians(10.0)))
+
+    def test_segmented(self):
+        label_mat = np.array([[0, 2, 2], [5, 0, 2]], dtype=np.uint16)
+        pc_image = np.arange(18, dtype=np.float32).reshape(2, 3, 3)
+
+        segmented = SegmentedPointCloud.from_label_image(label_mat, pc_image)
+        self.assertEqual(list(segmented), [2, 5])
+        self.assertEqual(list(segmented.counts), [3, 1])
+        np.testing.assert_array_equal(segmented[2], pc_image[[0, 0, 1], [1, 2, 2]])
+        np.testing.assert_array_equal(segmented[5], pc_image[[1], [0]])
+        self.assertNotIn(0, segmented)
+        self.assertNotIn(3, segmented)
+        self.assertTrue(np.shares_memory(segmented[5], segmented.points))
+
+        result = calculate_segmented_point_clouds(label_mat, pc_image)
+        self.assertEqual(sorted(result), [2, 5])
+        np.testing.assert_array_equal(result[2], segmented[2])
+
+
+class TestFilterClusters(unittest.TestCase):
+    def test_filter(self):
+        label_mat = np.zeros((4, 10), dtype=np.uint16)
+        label_mat[0, 0:3] = 1
+        label_mat[1:4, 5] = 2
+        # crosses the last column
+        label_mat[2, 9] = 3
+        label_mat[3, 0] = 3
+
+        def labels(result):
+            return sorted(set(np.unique(result)) - {0})
+
+        self.assertEqual(labels(filter_clusters(label_mat, 3, 3)), [1, 2])
+        self.assertEqual(labels(filter_clusters(label_mat, 1, 10, max_rows=2)), [1, 3])
+        self.assertEqual(labels(filter_clusters(label_mat, 1, 10, min_cols=2)), [1, 3])
+        self.assertEqual(labels(filter_clusters(label_mat, 1, 10, max_cols=2)), [2, 3])
+
+    def test_dense(self):
+        label_mat = np.array([[0, 4, 4, 9], [7, 7, 7, 9]], dtype=np.uint16)
+        np.testing.assert_array_equal(
+            filter_clusters(label_mat, 2, 2, dense=True),
+            np.array([[0, 1, 1, 2], [0, 0, 0, 2]]),
+        )
+
+    def test_fused(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-30), radians(30), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        input_image = np.random.rand(64, 328).astype("float32")
+        input_image[input_image < 0.1] = 0.0
+        angle_threshold = radians(1.0)
+        label_mat = compute_labels(input_image, params, angle_threshold)
+        for limits in ((5, 3000), (2, 100, 1, 3, 2, 10)):
+            np.testing.assert_array_equal(
+                compute_labels_with_filtering(input_image, params, angle_threshold, *limits),
+                filter_clusters(label_mat, *limits),
+            )
+        np.testing.assert_array_equal(
+            compute_labels_with_filtering(input_image, params, angle_threshold, 2, 100, dense=True),
+            filter_clusters(label_mat, 2, 100, dense=True),
+        )
+
+
+class TestLabelDtype(unittest.TestCase):
+    def test_no_overflow(self):
+        self.assertEqual(get_label_dtype(64, 870), np.uint16)
+        self.assertEqual(get_label_dtype(128, 2048), np.uint32)
+
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=1024)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=128)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        # every pixel is a component of its own
+        checkerboard = np.indices((128, 1024)).sum(axis=0) % 2
+        input_image = np.where(checkerboard == 0, 1.0, 100.0).astype("float32")
+        for engine in ("union_find", "parallel"):
+            label_mat = compute_labels(input_image, params, radians(10.0), engine)
+            self.assertEqual(label_mat.dtype, np.uint32)
+            self.assertEqual(label_mat.max(), 128 * 1024)
+
+
+class TestUnionFindLabeler(unittest.TestCase):
+    def test_same_labels_as_bfs(self):
+        h_span_params = SpanParams(radians(-45), radians(45), num_beams=328)
+        v_span_params = SpanParams(radians(-30), radians(30), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        input_image = np.random.rand(64, 328).astype("float32")
+        input_image[input_image < 0.1] = 0.0
+        for angle_threshold in (radians(1.0), radians(10.0)):
+            bfs = compute_labels(input_image, params, angle_threshold)
+            union_find = compute_labels(input_image, params, angle_threshold, "union_find")
+            np.testing.assert_array_equal(bfs, union_find)
+
+    def test_parallel_same_labels_as_bfs(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-30), radians(30), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        input_image = np.random.rand(64, 328).astype("float32")
+        input_image[input_image < 0.1] = 0.0
+        angle_threshold = radians(1.0)
+        bfs = compute_labels(input_image, params, angle_threshold)
+        np.testing.assert_array_equal(
+            bfs, compute_labels(input_image, params, angle_threshold, "parallel")
+        )
+
+        for num_strips in (1, 3, 8, 328):
+            labels = label_union_find_parallel(
+                input_image,
+                params.row_alphas_sines,
+                params.row_alphas_cosines,
+                params.col_alphas_sines,
+                params.col_alphas_cosines,
+                angle_threshold,
+                num_strips,
+            )
+            np.testing.assert_array_equal(bfs, labels)
+
+
+class TestComputeLabelsBatch(unittest.TestCase):
+    def test_same_labels_as_compute_labels(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-30), radians(30), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        depth_stack = np.random.rand(3, 64, 328).astype("float32")
+        depth_stack[depth_stack < 0.1] = 0.0
+        label_stack = compute_labels_batch(depth_stack, params, radians(1.0))
+
+        self.assertEqual(label_stack.shape, (3, 64, 328))
+        for depth_image, labels in zip(depth_stack, label_stack):
+            np.testing.assert_array_equal(
+                labels, compute_labels(depth_image, params, radians(1.0))
+            )
+
+
+class TestConvertSphericalToCartesian(unittest.TestCase):
+    def test_convert(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        depth_image = np.random.uniform(1.0, 50.0, (64, 328)).astype("float32")
+        result = convert_spherical_to_cartesian(depth_image, params)
+
+        beta = -params.row_angles[:, None].astype(np.float64)
+        alpha = params.col_angles[None, :].astype(np.float64)
+        np.testing.assert_allclose(result[..., 0], depth_image * np.cos(beta) * np.sin(alpha), atol=1e-4)
+        np.testing.assert_allclose(result[..., 1], depth_image * np.sin(beta), atol=1e-4)
+        np.testing.assert_allclose(result[..., 2], -depth_image * np.cos(beta) * np.cos(alpha), atol=1e-4)
+
+        out = np.full((64, 328, 3), -1.0, dtype=np.float32)
+        mask = (depth_image > 25.0).astype(np.uint16)
+        convert_spherical_to_cartesian_into(depth_image, params, out, mask)
+        np.testing.assert_allclose(out[mask > 0], result[mask > 0], atol=1e-4)
+        self.assertTrue((out[mask == 0] == -1.0).all())
+
+
+class TestProjectPointCloud(unittest.TestCase):
+    def test_round_trip(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        depth_image = np.random.uniform(1.0, 50.0, (64, 328)).astype("float32")
+        depth_image[depth_image < 5.0] = 0.0
+        points = convert_spherical_to_cartesian(depth_image, params).reshape(-1, 3)
+        projected, index_image = project_point_cloud(points, params)
+
+        np.testing.assert_allclose(projected, depth_image, rtol=1e-5)
+        np.testing.assert_array_equal(index_image >= 0, depth_image > 0)
+        pixels = np.flatnonzero(index_image >= 0)
+        np.testing.assert_array_equal(index_image.ravel()[pixels], pixels)
+
+    def test_closest_point_wins(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        points = np.array([[0.0, 0.0, -10.0], [0.0, 0.0, -5.0], [0.0, 0.0, -7.0]])
+        projected, index_image = project_point_cloud(points, params)
+
+        r, c = np.argwhere(index_image >= 0)[0]
+        self.assertEqual(index_image[r, c], 1)
+        self.assertAlmostEqual(projected[r, c], 5.0)
+        self.assertEqual((index_image >= 0).sum(), 1)
+
+    def test_non_finite_points(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=328)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=64)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        points = np.array(
+            [[np.nan, 0.0, -10.0], [0.0, np.inf, -5.0], [-np.inf, 0.0, 0.0], [0.0, 0.0, np.nan], [0.0, 0.0, -7.0]]
+        )
+        projected, index_image = project_point_cloud(points, params)
+
+        np.testing.assert_array_equal(index_image[index_image >= 0], [4])
+        self.assertTrue(np.isfinite(projected).all())
+
+
+class TestRegionOfInterest(unittest.TestCase):
+    def test_labels(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=512)
+        v_span_params = SpanParams(radians(-15), radians(15), num_beams=16)
+        params = ProjectionParams(h_span_params, v_span_params)
+        depth_image = np.zeros((16, 512), dtype=np.float32)
+        depth_image[0:5, 505:512] = 10.0
+        depth_image[0:5, 0:5] = 10.0
+        depth_image[8:12, 450:453] = 10.0
+        depth_image[8:12, 59:62] = 10.0
+
+        full = compute_labels(depth_image, params, radians(10), "union_find")
+        np.testing.assert_array_equal(compute_labels(depth_image, params, radians(10), roi=RegionOfInterest(16, 512)), full)
+
+        # the window from column 450 to 61 is not closed, the objects at
+        # its two ends stay apart and the one across column 0 is one
+        roi = RegionOfInterest.from_angles(params, azimuth=(params.col_angles[450], params.col_angles[61]))
+        self.assertEqual(roi.shape, (16, 124))
+        self.assertFalse(roi.wrap)
+        label_image = compute_labels(depth_image, params, radians(10), roi=roi)
+        self.assertEqual(label_image[0, 505], 1)
+        np.testing.assert_array_equal(label_image[0:5, 0:5], 1)
+        self.assertEqual(label_image[8, 450], 2)
+        self.assertEqual(label_image[8, 61], 3)
+
+        # the full circle, from -pi to pi or one column less
+        for azimuth in ((radians(-180), radians(180)), (radians(-180), radians(179.9))):
+            roi = RegionOfInterest.from_angles(params, azimuth=azimuth)
+            self.assertEqual(roi.shape, (16, 512))
+            self.assertTrue(roi.wrap)
+            np.testing.assert_array_equal(compute_labels(depth_image, params, radians(10), roi=roi), full)
+
+        mask = depth_image[:] > 0
+        mask[:, 100:500] = False
+        roi = RegionOfInterest.from_mask(mask)
+        self.assertEqual((roi.row_start, roi.row_stop), (0, 12))
+        np.testing.assert_array_equal(roi.col_indices, np.arange(505, 574) % 512)
+        label_image = compute_labels(depth_image, params, radians(10), roi=roi)
+        np.testing.assert_array_equal(np.unique(label_image), [0, 1, 2])
+        self.assertEqual(label_image[8, 450], 0)
+
+
+class TestClusterFeatures(unittest.TestCase):
+    def test_features(self):
+        label_image = np.random.randint(0, 20, (16, 64)).astype(np.uint16)
+        pc_image = np.random.normal(size=(16, 64, 3))
+        features = ClusterFeatures.from_label_image(label_image, pc_image)
+        segmented = SegmentedPointCloud.from_label_image(label_image, pc_image)
+
+        np.testing.assert_array_equal(features.labels, segmented.labels)
+        np.testing.assert_array_equal(features.counts, segmented.counts)
+        for i, points in enumerate(segmented.values()):
+            np.testing.assert_allclose(features.centroids[i], points.mean(axis=0))
+            np.testing.assert_allclose(features.variances[i], points.var(axis=0), atol=1e-12)
+            np.testing.assert_array_equal(features.mins[i], points.min(axis=0))
+            np.testing.assert_array_equal(features.extents[i], np.ptp(points, axis=0))
+            depths = np.linalg.norm(points, axis=1)
+            np.testing.assert_allclose([features.min_depths[i], features.max_depths[i]], [depths.min(), depths.max()])
+        self.assertEqual(len(features.box_angles), 0)
+
+    def test_oriented_box(self):
+        # a 4 x 1 m rectangle rotated by 0.4 rad around (3, 1)
+        along = np.linspace(-2, 2, 41).repeat(11)
+        across = np.tile(np.linspace(-0.5, 0.5, 11), 41)
+        pc_image = np.zeros((1, len(along), 3))
+        pc_image[0, :, 0] = 3 + along * np.cos(0.4) - across * np.sin(0.4)
+        pc_image[0, :, 2] = 1 + along * np.sin(0.4) + across * np.cos(0.4)
+        label_image = np.ones((1, len(along)), dtype=np.uint16)
+
+        features = ClusterFeatures.from_label_image(label_image, pc_image, oriented=True)
+        np.testing.assert_allclose(features.box_centers, [[3, 1]], atol=1e-9)
+        np.testing.assert_allclose(features.box_sizes, [[4, 1]], atol=1e-9)
+        np.testing.assert_allclose(features.box_angles, [0.4])
+
+
+class TestLabelCodec(unittest.TestCase):
+    def test_round_trip(self):
+        label_image = np.zeros((128, 2048), dtype=np.uint16)
+        label_image[10:20, 2040:] = 1
+        label_image[10:20, :8] = 1
+        label_image[30:40, 100:300] = 2
+
+        seam, values, lengths = encode_labels(label_image)
+        # the rows start after the cluster crossing the border, and the
+        # runs of zeros longer than 65535 pixels are split
+        self.assertTrue(8 <= seam < 100)
+        np.testing.assert_array_equal(values, [0, 1] * 10 + [0, 2] * 10 + [0, 0, 0])
+        self.assertEqual(lengths.sum(), label_image.size)
+        np.testing.assert_array_equal(decode_labels(seam, values, lengths, 128, 2048), label_image)
+
+        label_image = np.random.randint(0, 3, (16, 870)).astype(np.uint32)
+        np.testing.assert_array_equal(decode_labels(*encode_labels(label_image), 16, 870), label_image)
+
+        for rows, cols in ((0, 870), (16, 0)):
+            seam, values, lengths = encode_labels(np.zeros((rows, cols), dtype=np.uint16))
+            self.assertEqual((len(values), len(lengths)), (0, 0))
+            self.assertEqual(decode_labels(seam, values, lengths, rows, cols).shape, (rows, cols))
+
+    def test_archive(self):
+        label_images = [np.random.randint(0, 3, (16, 870)).astype(np.uint16), np.zeros((64, 870), dtype=np.uint32)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "labels.lbl")
+            for compression in (0, 1):
+                with LabelArchiveWriter(path, compression) as writer:
+                    for label_image in label_images:
+                        writer.write(label_image)
+                archive = LabelArchive(path)
+                self.assertEqual(len(archive), 2)
+                np.testing.assert_array_equal(archive[1], label_images[1])
+                for label_image, expected in zip(archive, label_images):
+                    self.assertEqual(label_image.dtype, expected.dtype)
+                    np.testing.assert_array_equal(label_image, expected)
+
+            # the runs are stored little-endian whatever the machine
+            label_image = np.array([[7, 7, 0, 70000]], dtype=np.uint32)
+            with LabelArchiveWriter(path, compression=0) as writer:
+                writer.write(label_image)
+                writer.write(np.zeros((0, 870), dtype=np.uint16))
+            with open(path, "rb") as f:
+                data = f.read()
+            seam, values, lengths = encode_labels(label_image)
+            payload = values.astype("<u4").tobytes() + lengths.astype("<u2").tobytes()
+            self.assertEqual(data[len(MAGIC) + RECORD.size:][:len(payload)], payload)
+            archive = LabelArchive(path)
+            np.testing.assert_array_equal(archive[0], label_image)
+            self.assertEqual(archive[1].shape, (0, 870))
+
+
+class TestClusterTracker(unittest.TestCase):
+    def test_associate(self):
+        tracks = np.random.uniform(-10, 10, (200, 3))
+        clusters = tracks + np.random.normal(0, 0.4, (200, 3))
+        pairs = sorted(
+            (np.hypot(*(tracks[j] - clusters[i])[::2]), i, j)
+            for i in range(200) for j in range(200)
+            if np.hypot(*(tracks[j] - clusters[i])[::2]) < 1.0
+        )
+        expected = np.full(200, -1)
+        for _, i, j in pairs:
+            if expected[i] < 0 and j not in expected:
+                expected[i] = j
+        np.testing.assert_array_equal(associate(tracks, clusters, 1.0), expected)
+
+    def test_tracks(self):
+        box = np.random.rand(50, 3)
+        tracker = ClusterTracker(gate=1.0, max_misses=1)
+        ids = tracker.update({1: box, 2: box + [10, 0, 0]})
+        self.assertEqual(ids, {1: 1, 2: 2})
+
+        # both move, labels swapped, a new cluster appears
+        ids = tracker.update({1: box + [10.3, 0, 0], 2: box + [0.3, 0, 0], 3: box + [5, 0, 5]})
+        self.assertEqual(ids, {1: 2, 2: 1, 3: 3})
+        np.testing.assert_allclose(tracker.velocities[:2], [[0.3, 0, 0]] * 2)
+
+        # the velocity predicts the next position of track 1 beyond the gate
+        label_image = np.zeros((1, 50), dtype=np.uint16)
+        label_image[0, :] = 1
+        segmented = SegmentedPointCloud.from_label_image(label_image, (box + [1.5, 0, 0])[None])
+        self.assertEqual(tracker.update(segmented), {1: 1})
+        self.assertEqual(tracker.update({}), {})
+        np.testing.assert_array_equal(tracker.ids, [1])
+
+        # the same with ClusterFeatures, a jump beyond the gate is a new track
+        tracker = ClusterTracker(gate=1.0)
+        for shift, expected in ((0.0, {1: 1}), (0.3, {1: 1}), (5.0, {1: 2})):
+            features = ClusterFeatures.from_label_image(label_image, (box + [shift, 0, 0])[None])
+            self.assertEqual(tracker.update(features), expected)
+
+
+class TestWarmup(unittest.TestCase):
+    def test_warmup(self):
+        h_span_params = SpanParams(radians(-180), radians(180), num_beams=32)
+        v_span_params = SpanParams(radians(-24), radians(2), num_beams=16)
+        params = ProjectionParams(h_span_params, v_span_params)
+
+        warmup(params)
+
+
 if __name__ == "__main__":
     unittest.main()